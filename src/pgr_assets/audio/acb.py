@@ -1,12 +1,17 @@
 # Heavily modified PyCriCodecs.ACB
-import io
+import concurrent.futures
+import contextlib
 import logging
 import os
 import struct
-import wave
-from typing import cast, Any, List
+from typing import BinaryIO, Dict, Iterator, List
 
-from pgr_assets.cri import AWB, HCA, UTF, UTFType, UTFTypeValues
+from pgr_assets.cri import HCA, UTF, UTFType, UTFTypeValues
+from pgr_assets.extractors.imagededupe import link_or_copy, remove_existing
+
+from .afs2 import LazyAWB, is_awb, peek
+from .ffmpegbatch import FFmpegMp3Batch
+from .hcastream import HCAStream
 
 logger = logging.getLogger("audio.acb")
 
@@ -17,21 +22,19 @@ except ImportError:  # in-process encoder is optional; fall back to ffmpeg
     lameenc = None
 
 
-def _is_awb(awb: bytes) -> bool:
-    return awb[:4] == b"AFS2"
-
-
-def _encode_mp3(wav_bytes: bytes) -> bytes:
+def _encode_mp3(stream: HCAStream, f: BinaryIO):
+    """Encode ``stream`` into ``f`` as it is decoded, a run of frames at a
+    time, so a long track never sits in memory as a whole."""
     assert lameenc is not None  # callers guard on availability
-    wf = wave.open(io.BytesIO(wav_bytes), "rb")
-    pcm = wf.readframes(wf.getnframes())
     enc = lameenc.Encoder()
     enc.set_vbr(4)  # vbr_mtrh
     enc.set_vbr_quality(2)
-    enc.set_in_sample_rate(wf.getframerate())
-    enc.set_channels(wf.getnchannels())
+    enc.set_in_sample_rate(stream.sample_rate)
+    enc.set_channels(stream.channels)
     enc.set_quality(2)  # encoder algorithm effort, independent of VBR target
-    return enc.encode(pcm) + enc.flush()
+    for pcm in stream.pcm_chunks():
+        f.write(enc.encode(pcm))
+    f.write(enc.flush())
 
 
 class ACB:
@@ -39,16 +42,16 @@ class ACB:
 
     __slots__ = ["payload", "awb"]
     payload: list
-    awb: AWB | None
+    awb: LazyAWB | None
 
-    def __init__(self, acb, awb: bytes = b"") -> None:
+    def __init__(self, acb, awb: bytes | BinaryIO = b"") -> None:
+        """``awb`` is the bank's AWB, as bytes or an open file (which must stay
+        open while extracting); without one, the AWB embedded in the ACB."""
         self.payload = UTF(acb).dictarray
         self.acb_parse(self.payload)
-        # AWB is typed BinaryIO but actually wants raw bytes (it does
-        # BytesIO(stream) internally), so pass bytes through, not a stream.
-        if not awb:
+        if not peek(awb, 1):
             awb = self.payload[0]["AwbFile"][1]
-        self.awb = AWB(cast(Any, awb)) if _is_awb(awb) else None
+        self.awb = LazyAWB(awb) if is_awb(awb) else None
 
     def acb_parse(self, payload: list) -> None:
         """Recursively parse the payload."""
@@ -167,21 +170,9 @@ class ACB:
                 waveform_ids.append(waveform_id)
         return waveform_ids
 
-    def extract(self, key: int, dirname: str = "", encode=False):
-        """Extracts audio files in an AWB/ACB without preserving filenames."""
-        if self.awb is None:
-            logger.debug("ACB has no AWB; nothing to extract")
-            return
-
-        if dirname:
-            os.makedirs(dirname, exist_ok=True)
-
-        # Have to do this because the index one is broken
-        waveforms: List[Any] = list(self.awb.get_files())
-
-        tables = self.payload[0]
-
-        for cue_name_entry in tables["CueNameTable"]:
+    def _cue_waveforms(self) -> Iterator[tuple[str, int, int]]:
+        """(output name, cue index, waveform id) of every waveform to extract."""
+        for cue_name_entry in self.payload[0]["CueNameTable"]:
             cue_name = str(cue_name_entry["CueName"][1]).lower()
             cue_idx = cue_name_entry["CueIndex"][1]
             try:
@@ -194,30 +185,106 @@ class ACB:
             # they don't overwrite each other. A plain cue keeps its bare name.
             for n, waveform_id in enumerate(waveform_ids):
                 name = cue_name if len(waveform_ids) == 1 else f"{cue_name}_{n}"
-                try:
-                    data = waveforms[waveform_id]
-                    if not data:  # placeholder cue with no audio (empty AWB slot)
-                        logger.debug(f"Skipping empty waveform for cue {name}")
-                        continue
-                    audio = HCA(
-                        data, key=key, subkey=cast(Any, self.awb.subkey)
-                    ).decode()
-
-                    if encode:
-                        mp3_path = os.path.join(dirname, name + ".mp3")
-                        if lameenc is not None:
-                            with open(mp3_path, "wb") as f:
-                                f.write(_encode_mp3(audio))
-                        else:
-                            from ffmpeg import FFmpeg
-
-                            FFmpeg().option("y").input("pipe:0").output(
-                                mp3_path, {"c:a": "libmp3lame", "q:a": 2}
-                            ).execute(audio)
-                    else:
-                        with open(os.path.join(dirname, name + ".wav"), "wb") as f:
-                            f.write(audio)
-                except IndexError:
+                yield name, cue_idx, waveform_id
+
+    def extract(self, key: int, dirname: str = "", encode=False, threads: int = 1):
+        """Extracts audio files in an AWB/ACB without preserving filenames.
+
+        With ``threads`` > 1, waveforms are decoded and encoded on that many
+        threads. lameenc and ffmpeg encode outside the GIL, so a voice bank of
+        thousands of cues uses several cores instead of pinning one. Without
+        lameenc, MP3s are encoded by ffmpeg in batches (see
+        :class:`FFmpegMp3Batch`).
+        """
+        if self.awb is None:
+            logger.debug("ACB has no AWB; nothing to extract")
+            return
+
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        # Waveforms are read as they are extracted, not all up front.
+        waveforms = self.awb
+
+        # Cues (or block segments) sharing a waveform share its output: it is
+        # decoded and encoded once, under its first name, and linked to the
+        # others. Each waveform is one task, so that never races.
+        shared: Dict[int, List[tuple[str, int]]] = {}
+        for name, cue_idx, waveform_id in self._cue_waveforms():
+            shared.setdefault(waveform_id, []).append((name, cue_idx))
+
+        batch = FFmpegMp3Batch() if encode and lameenc is None else None
+        # (output, other name for it): linked once every output is written.
+        links: List[tuple[str, str]] = []
+
+        def extract_one(waveform: tuple[int, List[tuple[str, int]]]):
+            waveform_id, names = waveform
+            try:
+                data = waveforms[waveform_id]
+            except IndexError:
+                for name, cue_idx in names:
                     logger.warning(
                         f"Failed to extract {name} with index {cue_idx}: waveform index out of range"
                     )
+                return
+            bases = [os.path.join(dirname, name) for name, _ in names]
+            path = self._extract_waveform(data, key, bases[0], encode, batch)
+            if path is None:
+                return
+            extension = os.path.splitext(path)[1]
+            for base in bases[1:]:
+                if base + extension != path:
+                    links.append((path, base + extension))
+
+        with batch if batch is not None else contextlib.nullcontext():
+            if threads > 1 and len(shared) > 1:
+                with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=threads, thread_name_prefix="extract-cue"
+                ) as pool:
+                    # Consuming the results re-raises the first failure, as the
+                    # serial loop would.
+                    list(pool.map(extract_one, shared.items()))
+            else:
+                for waveform in shared.items():
+                    extract_one(waveform)
+
+        for path, other in links:
+            link_or_copy(path, other)
+
+    def _extract_waveform(
+        self,
+        data: bytes,
+        key: int,
+        base: str,
+        encode: bool,
+        batch: FFmpegMp3Batch | None = None,
+    ) -> str | None:
+        """Decode one waveform, write it to ``base`` + .mp3 or .wav and return
+        that path (None for an empty waveform). With ``batch``, the MP3 is
+        queued on it instead, and only written once it is encoded."""
+        assert self.awb is not None
+        if not data:  # placeholder cue with no audio (empty AWB slot)
+            logger.debug(f"Skipping empty waveform for cue {os.path.basename(base)}")
+            return None
+        subkey = self.awb.subkey
+        if encode:
+            mp3_path = base + ".mp3"
+            if batch is not None:
+                batch.add(HCAStream(data, key, subkey), mp3_path)
+                return mp3_path
+
+            remove_existing(mp3_path)
+            try:
+                with open(mp3_path, "wb") as f:
+                    _encode_mp3(HCAStream(data, key, subkey), f)
+            except BaseException:
+                remove_existing(mp3_path)  # don't leave a truncated file
+                raise
+            return mp3_path
+
+        audio = HCA(data, key=key, subkey=subkey).decode()
+        wav_path = base + ".wav"
+        remove_existing(wav_path)
+        with open(wav_path, "wb") as f:
+            f.write(audio)
+        return wav_path
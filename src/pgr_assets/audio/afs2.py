@@ -0,0 +1,95 @@
+import io
+import mmap
+import struct
+import threading
+from typing import BinaryIO
+
+# magic, version, offset size, id size, file count, alignment, subkey
+_HEADER = struct.Struct("<4sBBHIHH")
+_INT_FORMATS = {1: "B", 2: "H", 4: "I", 8: "Q"}
+
+
+def peek(data: bytes | BinaryIO, size: int) -> bytes:
+    """The first ``size`` bytes of ``data``, leaving a file where it was."""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return bytes(data[:size])
+    pos = data.tell()
+    head = data.read(size)
+    data.seek(pos)
+    return head
+
+
+def is_awb(data: bytes | BinaryIO) -> bool:
+    return peek(data, 4) == b"AFS2"
+
+
+class LazyAWB:
+    """An AFS2 (AWB) archive that only parses its offset table, and reads a
+    waveform when it is indexed.
+
+    Backed by the bytes given or, for a file on disk, a read-only mapping of
+    it, so extracting a bank never holds more than the waveforms being
+    decoded. Other files are read under a lock. Safe to share between
+    threads. Waveforms are cut as PyCriCodecsEx's ``AWB.get_files`` does.
+    """
+
+    subkey: int
+    ids: list[int]
+
+    def __init__(self, source: bytes | BinaryIO):
+        self._buf: memoryview | None = None
+        self._file: BinaryIO | None = None
+        self._base = 0
+        self._lock = threading.Lock()
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self._buf = memoryview(source)
+        elif isinstance(source, (io.BufferedReader, io.FileIO)):
+            mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+            self._buf = memoryview(mapped)[source.tell() :]
+        else:
+            # e.g. a spooled download, which fileno() would move to disk
+            self._file = source
+            self._base = source.tell()
+
+        header = self._read(0, _HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError("Invalid AWB header.")
+        magic, _, offset_size, id_size, count, align, self.subkey = _HEADER.unpack(
+            header
+        )
+        if magic != b"AFS2":
+            raise ValueError("Invalid AWB header.")
+        if offset_size not in _INT_FORMATS or id_size not in _INT_FORMATS:
+            raise ValueError("Unknown int size.")
+
+        table_size = id_size * count + offset_size * (count + 1)
+        table = self._read(_HEADER.size, table_size)
+        if len(table) < table_size:
+            raise ValueError("Truncated AWB offset table.")
+        ids = struct.unpack_from(f"<{count}{_INT_FORMATS[id_size]}", table)
+        offsets = struct.unpack_from(
+            f"<{count + 1}{_INT_FORMATS[offset_size]}", table, id_size * count
+        )
+        self.ids = list(ids)
+        # Offsets are rounded up to the alignment, as are the waveforms.
+        self._offsets = [-(-o // align) * align for o in offsets]
+        header_size = -(-(_HEADER.size + table_size) // align) * align
+        # The first waveform starts at the (aligned) end of the header.
+        self._starts = [header_size] + self._offsets[1:-1]
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __getitem__(self, index: int) -> bytes:
+        if not 0 <= index < len(self._starts):
+            raise IndexError("AWB waveform index out of range")
+        start = self._starts[index]
+        return self._read(start, self._offsets[index + 1] - self._offsets[index])
+
+    def _read(self, start: int, size: int) -> bytes:
+        if self._buf is not None:
+            return bytes(self._buf[start : start + size])
+        assert self._file is not None
+        with self._lock:
+            self._file.seek(self._base + start)
+            return self._file.read(size)
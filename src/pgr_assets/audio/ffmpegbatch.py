@@ -0,0 +1,115 @@
+import logging
+import os
+import tempfile
+import threading
+import wave
+from typing import Self
+
+from ffmpeg import FFmpeg
+
+from pgr_assets.extractors.imagededupe import remove_existing
+
+from .hcastream import HCAStream
+
+logger = logging.getLogger("audio.ffmpegbatch")
+
+# Options of every MP3, as the per-cue ffmpeg fallback used them.
+MP3_OPTIONS = {"c:a": "libmp3lame", "q:a": 2}
+
+
+class FFmpegMp3Batch:
+    """Encodes MP3s with ffmpeg, for when lameenc is unavailable, many per
+    ffmpeg run instead of a process per cue.
+
+    Waveforms are decoded to WAV files in a temporary directory. Once
+    ``max_files`` of them (or ``max_bytes``) are queued, the thread that queued
+    the last one encodes the lot in a single ffmpeg run with an input and an
+    output per file. Use as a context manager: leaving it encodes whatever is
+    still queued. Safe to share between threads.
+    """
+
+    def __init__(self, max_files: int = 64, max_bytes: int = 256 << 20):
+        self._max_files = max_files
+        self._max_bytes = max_bytes
+        self._tempdir = tempfile.TemporaryDirectory(prefix="pgr-assets-mp3-")
+        self._lock = threading.Lock()
+        self._spooled = 0
+        # (wav path, mp3 path) of the waveforms waiting to be encoded
+        self._queued: list[tuple[str, str]] = []
+        self._queued_bytes = 0
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self._tempdir.cleanup()
+
+    def add(self, stream: HCAStream, mp3_path: str):
+        """Queue ``stream`` to be encoded to ``mp3_path``, encoding the queue
+        if it is full. The MP3 exists once the batch holding it is encoded."""
+        with self._lock:
+            wav_path = os.path.join(self._tempdir.name, f"{self._spooled}.wav")
+            self._spooled += 1
+        with wave.open(wav_path, "wb") as w:
+            w.setnchannels(stream.channels)
+            w.setsampwidth(2)
+            w.setframerate(stream.sample_rate)
+            w.setnframes(stream.samples)
+            for pcm in stream.pcm_chunks():
+                w.writeframesraw(pcm)
+        size = os.path.getsize(wav_path)
+
+        with self._lock:
+            self._queued.append((wav_path, mp3_path))
+            self._queued_bytes += size
+            if (
+                len(self._queued) < self._max_files
+                and self._queued_bytes < self._max_bytes
+            ):
+                return
+            batch = self._take()
+        self._encode(batch)
+
+    def flush(self):
+        """Encode everything queued so far."""
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._encode(batch)
+
+    def _take(self) -> list[tuple[str, str]]:
+        batch, self._queued, self._queued_bytes = self._queued, [], 0
+        return batch
+
+    @staticmethod
+    def command(batch: list[tuple[str, str]]) -> FFmpeg:
+        ffmpeg = FFmpeg().option("y")
+        for wav_path, _ in batch:
+            ffmpeg = ffmpeg.input(wav_path)
+        for n, (_, mp3_path) in enumerate(batch):
+            # Each output takes its own input, metadata included (ffmpeg copies
+            # the first input's by default).
+            ffmpeg = ffmpeg.output(
+                mp3_path, {"map": f"{n}:a", "map_metadata": n, **MP3_OPTIONS}
+            )
+        return ffmpeg
+
+    def _encode(self, batch: list[tuple[str, str]]):
+        for _, mp3_path in batch:
+            # Outputs may be hardlinks; ffmpeg would write through them.
+            remove_existing(mp3_path)
+        try:
+            self.command(batch).execute()
+            logger.debug(f"Encoded {len(batch)} MP3s with ffmpeg")
+        except BaseException:
+            # ffmpeg may have written some of the outputs, or part of one.
+            for _, mp3_path in batch:
+                remove_existing(mp3_path)
+            raise
+        finally:
+            for wav_path, _ in batch:
+                os.unlink(wav_path)
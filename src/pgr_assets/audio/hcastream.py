@@ -0,0 +1,128 @@
+import struct
+from typing import Any, Iterator, cast
+
+from pgr_assets.cri import HCA, HcaDecode
+
+# Samples per channel in every HCA frame.
+FRAME_SAMPLES = 1024
+
+# The file header ends with the size of the whole header, frames start there.
+_HEADER_SIZE = struct.Struct(">H")
+_HEADER_SIZE_OFFSET = 6
+# The fmt chunk follows the 8-byte file header: frame count, encoder delay and
+# encoder padding sit at these offsets.
+_FMT_COUNTS = struct.Struct(">IHH")
+_FMT_COUNTS_OFFSET = 16
+# loop chunk: start and end frame, start delay and end padding.
+_LOOP = struct.Struct(">IIHH")
+_CRC = struct.Struct(">H")
+
+
+def _crc16_table() -> list[int]:
+    table = []
+    for n in range(256):
+        crc = n << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x8005 if crc & 0x8000 else crc << 1) & 0xFFFF
+        table.append(crc)
+    return table
+
+
+_CRC16_TABLE = _crc16_table()
+
+
+def _crc16(data: bytes) -> int:
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC16_TABLE[(crc >> 8) ^ byte]
+    return crc
+
+
+def _wav_data(wav: bytes) -> tuple[int, int]:
+    """Start and end of the data chunk of a RIFF WAVE."""
+    pos = 12
+    while pos + 8 <= len(wav):
+        chunk_id = wav[pos : pos + 4]
+        (size,) = struct.unpack_from("<I", wav, pos + 4)
+        if chunk_id == b"data":
+            return pos + 8, min(pos + 8 + size, len(wav))
+        pos += 8 + size + (size & 1)
+    raise ValueError("WAV data chunk not found")
+
+
+class HCAStream:
+    """Decodes an HCA waveform to 16-bit PCM a few frames at a time.
+
+    The decoder only takes whole files, so every run of frames is decoded as
+    a file of its own: the original header with its frame count rewritten,
+    plus the frame before the run, whose output is dropped. HCA frames only
+    depend on the previous one (the MDCT overlap), so the samples match
+    decoding the whole file, and memory stays at one run however long the
+    track is.
+    """
+
+    def __init__(self, data: bytes, key: int, subkey: int = 0):
+        # HCA parses and checks the header (and would copy whatever it is
+        # given twice); decoding goes through HcaDecode.
+        (header_size,) = _HEADER_SIZE.unpack_from(data, _HEADER_SIZE_OFFSET)
+        self._header = bytes(data[:header_size])
+        hca = HCA(cast(Any, self._header), key=key, subkey=subkey)
+        info = hca.hca
+        self._data = data
+        self._key = hca.key
+        self._subkey = hca.subkey
+        self._frame_size: int = info["FrameSize"]
+        self._frame_count: int = info["FrameCount"]
+        self._delay: int = info["EncoderDelay"]
+        self._padding: int = info["EncoderPadding"]
+        self._loop = -1
+        if "LoopStart" in info:
+            # Chunk signatures are masked in encrypted headers.
+            self._loop = bytes(b & 0x7F for b in self._header).find(b"loop")
+        self.channels: int = info["ChannelCount"]
+        self.sample_rate: int = info["SampleRate"]
+
+    @property
+    def samples(self) -> int:
+        """Samples per channel in the decoded PCM."""
+        return self._frame_count * FRAME_SAMPLES - self._delay - self._padding
+
+    def _run_header(self, frames: int) -> bytes:
+        header = bytearray(self._header)
+        # Trimming is done on the whole track's samples, not the run's.
+        _FMT_COUNTS.pack_into(header, _FMT_COUNTS_OFFSET, frames, 0, 0)
+        if self._loop >= 0:
+            # The loop has to lie within the frames; the decoded samples don't
+            # depend on it.
+            _LOOP.pack_into(header, self._loop + 4, 0, frames - 1, 0, 0)
+        _CRC.pack_into(header, len(header) - 2, _crc16(header[:-2]))
+        return bytes(header)
+
+    def pcm_chunks(self, frames: int = 256) -> Iterator[bytes]:
+        """Yield the interleaved PCM, decoding ``frames`` frames at a time."""
+        frame_bytes = FRAME_SAMPLES * self.channels * 2
+        sample_bytes = self.channels * 2
+        keep_start = self._delay * sample_bytes
+        keep_end = (self._frame_count * FRAME_SAMPLES - self._padding) * sample_bytes
+        header_size = len(self._header)
+
+        for first in range(0, self._frame_count, frames):
+            last = min(first + frames, self._frame_count)
+            primer = 1 if first else 0
+            begin = header_size + (first - primer) * self._frame_size
+            end = header_size + last * self._frame_size
+            wav = HcaDecode(
+                self._run_header(last - first + primer) + self._data[begin:end],
+                header_size,
+                self._key,
+                self._subkey,
+            )
+            pcm_start, pcm_end = _wav_data(wav)
+            pcm_start += primer * frame_bytes
+
+            # Bytes of this run within the whole track's PCM.
+            offset = first * frame_bytes
+            lo = max(keep_start - offset, 0)
+            hi = min(keep_end - offset, pcm_end - pcm_start)
+            if lo < hi:
+                yield wav[pcm_start + lo : pcm_start + hi]
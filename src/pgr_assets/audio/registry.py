@@ -25,13 +25,12 @@ def get_cue_references(sources: SourceSet, game_version: tuple[int, int]):
         # client/ if share/ is absent or unreachable.
         env = UnityPy.load(sources.find_bundle("assets/temp/bytes/client/audio.ab"))
         source = "client"
-    sheet = extractors.get_text_asset(
-        env,
-        f"assets/temp/bytes/{source}/audio/cuesheet.tab.bytes",
-        allow_binary_table_convert=True,
-        game_version=game_version,
+    table = extractors.get_binary_table(
+        env, f"assets/temp/bytes/{source}/audio/cuesheet.tab.bytes", game_version
     )
-    return (line.split(",") for line in sheet.strip().splitlines(keepends=False)[1:])
+    # The sheet starts with the cue sheet id, acb and awb; nothing after them
+    # is needed, or decoded.
+    return table.iter_rows(columns=[0, 1, 2])
 
 
 class CueRegistry:
@@ -45,7 +44,7 @@ class CueRegistry:
     def init(self, sources: SourceSet):
         cue_sheets = {
             int(id): CueSheet(int(id), acb, awb)
-            for id, acb, awb, _ in get_cue_references(sources, self.game_version)
+            for id, acb, awb in get_cue_references(sources, self.game_version)
         }
 
         # Rekey the dict and use lower(acb) as key
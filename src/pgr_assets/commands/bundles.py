@@ -1,12 +1,15 @@
+import asyncio
 import concurrent.futures
 import logging
 import os
+import shutil
 import sys
-from typing import List, Optional
+from typing import List, Literal, Optional, Set
 
 from tqdm import tqdm
 
 from pgr_assets.sources import SourceSet
+from pgr_assets.sources.asyncdownload import AsyncHttpClient
 from pgr_assets.sources.sourceset import BlobNotFoundException
 from .helpers import build_source_set, BundleCommandArgs, selected_bundles
 
@@ -24,12 +27,11 @@ class State:
 
 def process(bundle: str, state: State):
     try:
-        bundle_data = state.sources.find_bundle(bundle)
         out_path = os.path.join(state.output_dir, bundle)
-        if not os.path.exists(os.path.dirname(out_path)):
-            os.makedirs(os.path.dirname(out_path))
-        with open(os.path.join(state.output_dir, bundle), "wb") as f:
-            f.write(bundle_data)
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        # Stream the (verified) blob to disk so large videos never sit in memory.
+        with state.sources.open_bundle(bundle) as src, open(out_path, "wb") as f:
+            shutil.copyfileobj(src, f)
         logger.debug(f"Downloaded {bundle}")
         return bundle
     except BlobNotFoundException as e:
@@ -54,9 +56,54 @@ def execute_in_pool(
                 logger.exception("Worker crashed during download")
 
 
+async def process_async(bundle: str, state: State, client: AsyncHttpClient):
+    try:
+        out_path = os.path.join(state.output_dir, bundle)
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        await state.sources.fetch_bundle(bundle, out_path, client)
+        logger.debug(f"Downloaded {bundle}")
+        return bundle
+    except BlobNotFoundException as e:
+        logger.error(f"Could not resolve {bundle}: {e}")
+        return None
+    except Exception:
+        logger.exception(f"Failed to download {bundle}")
+        return None
+
+
+async def execute_async(
+    bundles: List[str], state: State, max_in_flight: int, per_host: int
+):
+    client = AsyncHttpClient(per_host=per_host)
+    pending = iter(bundles)
+
+    # A fixed set of workers pulling from a shared iterator bounds the number
+    # of downloads in flight without creating a task per bundle up front.
+    async def worker(progress: tqdm):
+        for bundle in pending:
+            await process_async(bundle, state, client)
+            progress.update()
+
+    try:
+        with tqdm(total=len(bundles)) as progress:
+            workers = min(max_in_flight, len(bundles))
+            await asyncio.gather(*(worker(progress) for _ in range(workers)))
+    finally:
+        client.close()
+
+
 class BundlesCommand(BundleCommandArgs):
+    engine: Literal["threads", "async"] = "threads"  # Download engine to use
+    connections: int = 256  # Maximum downloads in flight with --engine async
+    connections_per_host: int = 64  # Maximum connections per host, --engine async
+
     def configure(self) -> None:
         super().configure()
+        self.add_argument(
+            "--engine",
+            help="Download engine to use. Both honor HTTP(S)_PROXY and NO_PROXY, "
+            "but async only supports plain http:// proxies",
+        )
         self.set_defaults(func=bundles_cmd)
 
 
@@ -65,6 +112,10 @@ def bundles_cmd(args: BundlesCommand):
 
     state = State(ss, args.output)
 
+    # Populate the index/resource maps once on the main thread so download threads
+    # only read the shared caches instead of racing to rebuild them.
+    ss.warm()
+
     # determine all tasks based on flags, use set because we don't want duplicates
     listed_bundles = selected_bundles(args, ss)
 
@@ -72,10 +123,26 @@ def bundles_cmd(args: BundlesCommand):
         logger.error("No bundles specified")
         sys.exit(1)
 
-    # Populate the index/resource maps once on the main thread so download threads
-    # only read the shared caches instead of racing to rebuild them.
-    ss.warm()
-
+    if args.engine == "async":
+        # Downloads are streamed to disk, so videos need no separate, smaller
+        # pool here: everything shares one event loop.
+        logger.info(f"Processing {len(listed_bundles)} bundles")
+        asyncio.run(
+            execute_async(
+                sorted(listed_bundles),
+                state,
+                args.connections,
+                args.connections_per_host,
+            )
+        )
+    else:
+        execute_threaded(listed_bundles, state)
+
+    if ss.blob_cache is not None:
+        ss.blob_cache.prune()
+
+
+def execute_threaded(listed_bundles: Set[str], state: State):
     non_video_bundles = [
         bundle for bundle in listed_bundles if not bundle.endswith(".usm")
     ]
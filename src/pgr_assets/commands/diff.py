@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from pgr_assets.sources import SourceSet
+from pgr_assets.sources.download import is_sha1
+
+from .helpers import BaseArgs, build_source_set
+from .sha1cache import Sha1Cache
+
+logger = logging.getLogger("pgr-assets")
+
+
+class DiffCommand(BaseArgs):
+    base: Optional[str] = None  # Snapshot file or client version to compare against
+    target: Optional[str] = None  # Snapshot or version to diff with (default: live)
+    write_snapshot: Optional[str] = None  # Save the target index to this snapshot file
+
+    def configure(self) -> None:
+        super().configure()
+        self.add_argument(
+            "base",
+            nargs="?",
+            help="Snapshot file, or client version with --primary obb",
+        )
+        self.set_defaults(func=diff_cmd)
+
+
+@dataclass
+class Snapshot:
+    """What every bundle of a game version resolves to, reduced to one
+    fingerprint per bundle: its sha1 when the index has one, its blob name
+    otherwise."""
+
+    version: Optional[str]
+    bundles: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class IndexDiff:
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+
+    def to_extract(self) -> Set[str]:
+        """Bundles whose output is new or stale in the target version."""
+        return set(self.added) | set(self.changed)
+
+
+def fingerprint(blob: str, sha1: Optional[str]) -> str:
+    return sha1.lower() if is_sha1(sha1) else f"blob:{blob}"
+
+
+def take_snapshot(ss: SourceSet, version: Optional[str] = None) -> Snapshot:
+    ss.warm()
+    assert ss.resolution is not None
+    return Snapshot(
+        version,
+        {bundle: fingerprint(blob, sha1) for bundle, (blob, sha1, _) in ss.resolution},
+    )
+
+
+def write_snapshot(file: str, snapshot: Snapshot):
+    with open(file, "w") as f:
+        json.dump({"version": snapshot.version, "bundles": snapshot.bundles}, f)
+
+
+def load_snapshot(file: str) -> Snapshot:
+    """Read a snapshot written by ``diff --write-snapshot``. The sha1 cache of
+    ``extract --cache`` is accepted too."""
+    with open(file, "rb") as f:
+        data = f.read()
+
+    if data.lstrip().startswith(b"{"):
+        snapshot = json.loads(data)
+        if isinstance(snapshot.get("bundles"), dict):
+            return Snapshot(snapshot.get("version"), snapshot["bundles"])
+
+    bundles = {
+        bundle: sha1.lower()
+        for bundle, sha1 in Sha1Cache(file).entries.items()
+        if isinstance(sha1, str)
+    }
+    if data.strip() and not bundles:
+        raise ValueError(f"{file} is not an index snapshot")
+    return Snapshot(None, bundles)
+
+
+def diff_snapshots(old: Snapshot, new: Snapshot) -> IndexDiff:
+    diff = IndexDiff()
+    for bundle in sorted(old.bundles.keys() | new.bundles.keys()):
+        before = old.bundles.get(bundle)
+        after = new.bundles.get(bundle)
+        if before is None:
+            diff.added.append(bundle)
+        elif after is None:
+            diff.removed.append(bundle)
+        elif before != after:
+            diff.changed.append(bundle)
+    return diff
+
+
+def resolve_snapshot(ref: str, args: BaseArgs) -> Snapshot:
+    """Load ``ref`` as a snapshot file if one exists at that path, otherwise
+    take a snapshot of the live index of client version ``ref``, using the
+    other source flags of ``args``.
+
+    Only an OBB primary can be rebuilt as of another version: a launcher
+    primary always serves today's index (and today's resources.assets, which
+    the >=4.3 patch key is read from), so pairing it with an older patch index
+    would make up a version that never shipped. Those have to be snapshotted
+    with ``--write-snapshot`` while they are live.
+    """
+    if os.path.exists(ref):
+        return load_snapshot(ref)
+
+    if args.preset is not None or args.primary != "obb":
+        raise ValueError(
+            f"{ref} is not a snapshot file, and a live version can only be "
+            "rebuilt with --primary obb (launcher sources only serve the "
+            "current index). Pass a snapshot saved with --write-snapshot."
+        )
+
+    logger.info(f"Loading the live index of version {ref}")
+    configured = args.version
+    args.version = ref
+    try:
+        resolved = build_source_set(args)
+    finally:
+        args.version = configured
+    return take_snapshot(resolved.sources, ref)
+
+
+def diff_cmd(args: DiffCommand):
+    if args.base is None and args.write_snapshot is None:
+        raise ValueError(
+            "Nothing to do: pass a base to diff against or --write-snapshot"
+        )
+
+    base = resolve_snapshot(args.base, args) if args.base is not None else None
+
+    if args.target is not None:
+        target = resolve_snapshot(args.target, args)
+    else:
+        resolved = build_source_set(args)
+        target = take_snapshot(resolved.sources, "%d.%d.%d" % resolved.version[:3])
+
+    if args.write_snapshot is not None:
+        write_snapshot(args.write_snapshot, target)
+        logger.info(f"Wrote snapshot of {len(target.bundles)} bundles")
+
+    if base is None:
+        return
+
+    diff = diff_snapshots(base, target)
+    rows = (
+        [(bundle, "A") for bundle in diff.added]
+        + [(bundle, "D") for bundle in diff.removed]
+        + [(bundle, "M") for bundle in diff.changed]
+    )
+    for bundle, status in sorted(rows):
+        print(f"{status}\t{bundle}")
+
+    logger.info(
+        f"{base.version or args.base} -> {target.version or args.target}: "
+        f"{len(diff.added)} added, {len(diff.removed)} removed, "
+        f"{len(diff.changed)} changed"
+    )
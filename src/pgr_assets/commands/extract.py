@@ -1,20 +1,28 @@
 import concurrent.futures
+import contextlib
 import json
 import logging
 import os
 import sys
-from typing import List, Optional, Set
+import tempfile
+from collections import Counter
+from typing import BinaryIO, Dict, Iterator, List, Literal, Optional, Set, Tuple
 
 import UnityPy
 from tqdm import tqdm
 
 from pgr_assets import extractors
 from pgr_assets.audio import ACB, CueRegistry
-from pgr_assets.sources import SourceError, SourceSet
+from pgr_assets.sources import BlobCache, SourceError, SourceSet
 from pgr_assets.sources.sourceset import BlobNotFoundException
 
+from ..extractors.imagededupe import ImageDedupe
+from ..extractors.imageprofile import ImageProfile, load_image_profile
+from ..extractors.manifest import BundleManifest, manifest_path
 from ..extractors.video_encoders import BaseVideoEncoder, HlsEncoder, WebMp4Encoder
+from .diff import diff_snapshots, resolve_snapshot, take_snapshot
 from .helpers import BundleCommandArgs, build_source_set, selected_bundles
+from .sha1cache import Sha1Cache
 
 logger = logging.getLogger("pgr-assets")
 
@@ -23,18 +31,30 @@ AUDIO_KEY = 62855594017927612
 # Worker-local handle to the shared State.
 _WORKER_STATE: Optional["State"] = None
 
+# Images encoded by this worker so far, with --dedupe-images run.
+_RUN_DEDUPE: Optional[ImageDedupe] = None
+
 
 class ExtractCommand(BundleCommandArgs):
     convert_binary_tables: bool = False  # Allows converting binary tables into CSV files (WARNING: not everything is supported)
+    image_profile: str = "default"  # Image outputs: default, webp, png or a JSON file
+    dedupe_images: Literal["off", "bundle", "run"] = "bundle"  # Link repeated images
     raw_audio: bool = False  # Store extracted audio from ACB/AWB as WAV files instead of converting them to MP3
     hls: bool = (
         False  # Generate HTTP Live Streaming variants for videos on top of mp4's
     )
 
     cache: Optional[str] = None  # Path to sha1 cache file
+    manifest_dir: Optional[str] = None  # Per-object manifests to skip unchanged objects
+    changed_since: Optional[str] = None  # Only bundles changed since snapshot/version
     write_settings: bool = False  # Write a small settings file to the output directory containing preset and version
 
     workers: int = 0  # Number of parallel workers for non-video bundles (0 = CPU count)
+    download_workers: int = 32  # Number of parallel downloads feeding the workers
+    prefetch: int = 0  # Bundles to download ahead of the workers (0 = 2x workers)
+    image_threads: int = 4  # Threads encoding the images of each bundle (1 = serial)
+    audio_threads: int = 4  # Threads encoding the cues of each ACB (1 = serial)
+    shared_index: bool = False  # Map source indexes into workers instead of copying
     fail_on_error: bool = False  # Exit with a non-zero status if any bundle fails
 
     def configure(self) -> None:
@@ -48,6 +68,11 @@ class State:
     cues: CueRegistry
     decrypt_key: str
     convert_binary_tables: bool
+    manifest_dir: Optional[str]
+    image_threads: int
+    audio_threads: int
+    image_profile: ImageProfile
+    dedupe_images: str
     encode_mp3: bool
     game_version: tuple[int, int]
     video_encoders: list[BaseVideoEncoder]
@@ -62,6 +87,11 @@ class State:
         self.output_dir = args.output
         self.decrypt_key = decrypt_key
         self.convert_binary_tables = args.convert_binary_tables
+        self.manifest_dir = args.manifest_dir
+        self.image_threads = args.image_threads
+        self.audio_threads = args.audio_threads
+        self.image_profile = load_image_profile(args.image_profile)
+        self.dedupe_images = args.dedupe_images
         self.encode_mp3 = not args.raw_audio
 
         self.video_encoders = [WebMp4Encoder()]
@@ -76,43 +106,76 @@ def process_bundle(bundle: str, state: State):
     bundle_data = state.sources.find_bundle(bundle)
     env = UnityPy.load(bundle_data)
     logger.debug(f"Extracting {bundle}")
+    manifest = None
+    if state.manifest_dir is not None:
+        manifest = BundleManifest(
+            manifest_path(state.manifest_dir, bundle),
+            state.output_dir,
+            # Anything that changes what is written for an unchanged object.
+            {
+                "game_version": list(state.game_version),
+                "convert_binary_tables": state.convert_binary_tables,
+                "image_profile": state.image_profile.describe(),
+            },
+        )
+    dedupe = None
+    if state.dedupe_images == "bundle":
+        dedupe = ImageDedupe()
+    elif state.dedupe_images == "run":
+        global _RUN_DEDUPE
+        if _RUN_DEDUPE is None:
+            _RUN_DEDUPE = ImageDedupe()
+        dedupe = _RUN_DEDUPE
     extractors.extract_bundle(
         env,
         output_dir=state.output_dir,
         game_version=state.game_version,
         allow_binary_table_convert=state.convert_binary_tables,
+        manifest=manifest,
+        image_threads=state.image_threads,
+        image_profile=state.image_profile,
+        dedupe=dedupe,
     )
+    if manifest is not None:
+        manifest.save()
 
 
-def process_audio(bundle: str, state: State):
+def resolve_audio(bundle: str, state: State) -> Tuple[str, str, Optional[str], bool]:
+    """Resolve an .acb bundle to (output base name, acb bundle, awb bundle or
+    None, whether that awb is optional)."""
     cue_sheet = state.cues.get_cue_sheet(bundle)
+    if cue_sheet is not None:
+        return cue_sheet.base_name, cue_sheet.acb, cue_sheet.awb or None, False
 
-    awb_data = b""
+    base_name = bundle.split("/", 2)[2].split(".")[0].lower()
+    return base_name, bundle, bundle.replace(".acb", ".awb"), True
 
-    if cue_sheet is not None:
-        acb_file = cue_sheet.acb
-        base_name = cue_sheet.base_name
-        acb_data = state.sources.find_bundle(cue_sheet.acb)
-        if cue_sheet.awb:
-            awb_data = state.sources.find_bundle(cue_sheet.awb)
-    else:
-        acb_file = bundle
-        base_name = bundle.split("/", 2)[2].split(".")[0].lower()
-        acb_data = state.sources.find_bundle(bundle)
-        try:
-            awb_data = state.sources.find_bundle(bundle.replace(".acb", ".awb"))
-        except SourceError:
-            # AWB is optional (the ACB may carry its waveforms inline) and its
-            # absence or an unreachable CDN shouldn't fail the ACB.
-            pass
-
-    acb = ACB(acb_data, awb_data)
-    logger.debug(f"Extracting {acb_file}")
-    acb.extract(
-        key=AUDIO_KEY,
-        dirname=os.path.join(state.output_dir, "audio", base_name),
-        encode=state.encode_mp3,
-    )
+
+def process_audio(bundle: str, state: State):
+    base_name, acb_file, awb_file, awb_optional = resolve_audio(bundle, state)
+
+    acb_data = state.sources.find_bundle(acb_file)
+    with contextlib.ExitStack() as stack:
+        # The AWB holds every waveform of the bank; it is read from the
+        # (cached) file as it is extracted, rather than loaded whole.
+        awb: bytes | BinaryIO = b""
+        if awb_file is not None:
+            try:
+                awb = stack.enter_context(state.sources.open_bundle(awb_file))
+            except SourceError:
+                # AWB is optional (the ACB may carry its waveforms inline) and
+                # its absence or an unreachable CDN shouldn't fail the ACB.
+                if not awb_optional:
+                    raise
+
+        acb = ACB(acb_data, awb)
+        logger.debug(f"Extracting {acb_file}")
+        acb.extract(
+            key=AUDIO_KEY,
+            dirname=os.path.join(state.output_dir, "audio", base_name),
+            encode=state.encode_mp3,
+            threads=state.audio_threads,
+        )
 
 
 def process_usm(bundle: str, state: State):
@@ -120,12 +183,13 @@ def process_usm(bundle: str, state: State):
         raise RuntimeError("No video encoders specified, cannot encode videos")
 
     filename = bundle.split("/", 2)[2].split(".")[0].lower()
-    data = state.sources.find_bundle(bundle)
-    usm = extractors.PGRUSM(data, key=AUDIO_KEY)
-    logger.debug(f"Extracting {filename}")
-    usm.extract_video(
-        os.path.join(state.output_dir, "video", filename), state.video_encoders
-    )
+    # Demux straight from the downloaded file; videos run to hundreds of MB.
+    with state.sources.open_bundle(bundle) as data:
+        usm = extractors.PGRUSM(data, key=AUDIO_KEY)
+        logger.debug(f"Extracting {filename}")
+        usm.extract_video(
+            os.path.join(state.output_dir, "video", filename), state.video_encoders
+        )
 
 
 def _init_worker(state: State):
@@ -158,18 +222,113 @@ def process(bundle: str) -> bool:
         return False
 
 
+def bundle_inputs(bundle: str, state: State) -> List[str]:
+    """Every bundle whose blob :func:`process` reads to extract ``bundle``."""
+    if bundle.endswith(".acb"):
+        _, acb_file, awb_file, _ = resolve_audio(bundle, state)
+        return [acb_file] if awb_file is None else [acb_file, awb_file]
+    if bundle.endswith(".awb"):
+        return []
+    return [bundle]
+
+
+def prefetch(bundle: str, state: State):
+    """I/O stage: download the blobs needed to extract ``bundle`` into the blob
+    cache. Failures are not reported here; the worker retries the download and
+    reports it with the rest of the bundle's errors.
+    """
+    for name in bundle_inputs(bundle, state):
+        try:
+            state.sources.prefetch_bundle(name)
+        except Exception as e:
+            logger.debug(f"Failed to prefetch {name}: {e}")
+
+
+def cache_keys(bundle: str, state: State) -> List[str]:
+    """The sha1s :func:`prefetch` caches the blobs of ``bundle`` under."""
+    try:
+        names = bundle_inputs(bundle, state)
+    except Exception:
+        return []  # prefetch and process report it
+    keys = [state.sources.cache_key(name) for name in names]
+    return [key for key in keys if key is not None]
+
+
+def pipeline(
+    bundles: List[str],
+    state: State,
+    executor: concurrent.futures.Executor,
+    download_workers: int,
+    depth: int,
+) -> Iterator[Tuple[str, List[str], concurrent.futures.Future]]:
+    """Run ``process`` over ``bundles`` in two stages: a thread pool downloads
+    each bundle's blobs into the blob cache, then ``executor`` extracts it from
+    there, so the workers spend their time decoding instead of waiting on the
+    network.
+
+    At most ``depth`` bundles are in flight (downloading, downloaded, or being
+    extracted) at once; that bounds how far downloads can run ahead of slow
+    workers. Yields (bundle, released sha1s, finished extract future) in
+    completion order, where the released sha1s are the cached blobs no other
+    in-flight bundle reads. Bundles can share a blob (identical content, or an
+    awb read through more than one acb), so a blob is only released once the
+    last bundle holding it is done.
+    """
+    pending = iter(bundles)
+    downloading: Dict[concurrent.futures.Future, Tuple[str, List[str]]] = {}
+    extracting: Dict[concurrent.futures.Future, Tuple[str, List[str]]] = {}
+    # In-flight bundles reading each sha1, counted from before the download so
+    # a blob can't be released while a bundle is still on its way to it.
+    refs: Counter[str] = Counter()
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=download_workers
+    ) as downloader:
+        while True:
+            while len(downloading) + len(extracting) < depth:
+                bundle = next(pending, None)
+                if bundle is None:
+                    break
+                sha1s = cache_keys(bundle, state)
+                refs.update(sha1s)
+                future = downloader.submit(prefetch, bundle, state)
+                downloading[future] = (bundle, sha1s)
+
+            if not downloading and not extracting:
+                return
+
+            done, _ = concurrent.futures.wait(
+                [*downloading, *extracting],
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            for future in done:
+                if future in downloading:
+                    bundle, sha1s = downloading.pop(future)
+                    try:
+                        future.result()
+                    except Exception:
+                        logger.exception(f"Failed to prefetch {bundle}")
+                    extracting[executor.submit(process, bundle)] = (bundle, sha1s)
+                else:
+                    bundle, sha1s = extracting.pop(future)
+                    refs.subtract(sha1s)
+                    released = [sha1 for sha1 in set(sha1s) if refs[sha1] <= 0]
+                    for sha1 in released:
+                        del refs[sha1]
+                    yield bundle, released, future
+
+
 def determine_sha1_cache_skip(file: str, bundles: Set[str], state: State) -> Set[str]:
     if not os.path.exists(file):
         return bundles
 
-    with open(file, "r") as f:
-        cached = json.load(f)
+    cached = Sha1Cache(file)
 
     wanted = set()
 
     for bundle in bundles:
         if bundle in cached:
-            if state.sources.bundle_sha1(bundle) == cached[bundle]:
+            if state.sources.bundle_sha1(bundle) == cached.get(bundle):
                 logger.debug(f"Skipping {bundle} due to cache")
                 continue
         wanted.add(bundle)
@@ -177,9 +336,20 @@ def determine_sha1_cache_skip(file: str, bundles: Set[str], state: State) -> Set
     return wanted
 
 
-def write_sha1_cache(file: str, entries: dict):
-    with open(file, "w") as f:
-        json.dump(entries, f)
+def changed_since(
+    ref: str, bundles: Set[str], args: ExtractCommand, state: State
+) -> Set[str]:
+    """Keep the bundles added or changed since ``ref`` (a snapshot file or a
+    client version, see the ``diff`` command)."""
+    base = resolve_snapshot(ref, args)
+    # Loading another version's live index applies that version's decrypt key.
+    UnityPy.set_assetbundle_decrypt_key(state.decrypt_key)
+
+    changed = diff_snapshots(base, take_snapshot(state.sources)).to_extract()
+    # An awb is extracted through its acb, so a changed awb re-extracts the acb.
+    changed.update([b[: -len(".awb")] + ".acb" for b in changed if b.endswith(".awb")])
+    logger.info(f"{len(changed)} bundles added or changed since {ref}")
+    return bundles & changed
 
 
 def execute_in_pool(
@@ -187,16 +357,15 @@ def execute_in_pool(
     state: State,
     cache: Optional[str],
     use_processes: bool,
-    max_workers: Optional[int] = None,
-    checkpoint_step: int = 100,
+    max_workers: int,
+    download_workers: int,
+    prefetch_depth: int,
+    scratch_cache: bool = False,
 ) -> int:
     fail_count = 0
 
-    cache_entries: dict = {}
-    if cache and os.path.exists(cache):
-        with open(cache, "r") as f:
-            cache_entries = json.load(f)
-    since_checkpoint = 0
+    # Every success is journaled right away, so an interrupted run loses nothing.
+    sha1_cache = Sha1Cache(cache) if cache else None
 
     if use_processes:
         # Worker processes receive the (already warmed) state once via the
@@ -210,15 +379,15 @@ def execute_in_pool(
         _WORKER_STATE = state
         executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
 
-    with executor:
-        future_to_bundle = {
-            executor.submit(process, bundle): bundle for bundle in bundles
-        }
-        for future in tqdm(
-            concurrent.futures.as_completed(future_to_bundle),
-            total=len(future_to_bundle),
-        ):
-            bundle = future_to_bundle[future]
+    with executor, sha1_cache or contextlib.nullcontext():
+        results = pipeline(
+            bundles,
+            state,
+            executor,
+            download_workers,
+            depth=max_workers + prefetch_depth,
+        )
+        for bundle, released, future in tqdm(results, total=len(bundles)):
             try:
                 ok = future.result()
             except Exception as e:
@@ -226,19 +395,18 @@ def execute_in_pool(
                 logger.exception(f"Worker crashed on {bundle}", exc_info=e)
                 ok = False
 
+            # A run-scoped cache only exists to hand blobs to the workers, so a
+            # blob goes as soon as no bundle in flight needs it.
+            if scratch_cache and state.sources.blob_cache is not None:
+                for sha1 in released:
+                    state.sources.blob_cache.remove(sha1)
+
             if ok:
-                if cache:
-                    cache_entries[bundle] = state.sources.bundle_sha1(bundle)
-                    since_checkpoint += 1
-                    if since_checkpoint >= checkpoint_step:
-                        write_sha1_cache(cache, cache_entries)
-                        since_checkpoint = 0
+                if sha1_cache is not None:
+                    sha1_cache.record(bundle, state.sources.bundle_sha1(bundle))
             else:
                 fail_count += 1
 
-    if cache:
-        write_sha1_cache(cache, cache_entries)
-
     return fail_count
 
 
@@ -264,6 +432,11 @@ def extract_cmd(args: ExtractCommand):
     ):
         state.load_cues()
 
+    # Warm the index and resource maps once so worker processes inherit (fork) or
+    # receive once (spawn) the cached lookups instead of re-fetching them per worker.
+    # This also builds the resolution table the selection and sha1 checks use.
+    ss.warm()
+
     # determine all tasks based on flags, use set because we don't want duplicates
     listed_bundles = selected_bundles(args, ss)
 
@@ -271,15 +444,25 @@ def extract_cmd(args: ExtractCommand):
         logger.error("No bundles specified")
         sys.exit(1)
 
+    if args.changed_since:
+        listed_bundles = changed_since(args.changed_since, listed_bundles, args, state)
+
     if args.cache:
         listed_bundles = determine_sha1_cache_skip(args.cache, listed_bundles, state)
 
-    # Warm the index and resource maps once so worker processes inherit (fork) or
-    # receive once (spawn) the cached lookups instead of re-fetching them per worker.
-    ss.warm()
+    # Downloads happen in a separate I/O stage (see pipeline), so the workers
+    # only decode and one per CPU keeps them all busy.
+    workers = args.workers or os.cpu_count() or 1
 
-    # Non video jobs spend a lot of time downloading so overcommit to fill the load
-    workers = args.workers or ((os.cpu_count() or 1) * 2)
+    # The download stage hands blobs to the workers through the blob cache;
+    # without a persistent one, use a scratch cache for the duration of the run.
+    scratch_dir: Optional[tempfile.TemporaryDirectory] = None
+    if ss.blob_cache is None:
+        scratch_dir = tempfile.TemporaryDirectory(prefix="pgr-assets-")
+        # Unbounded: --cache-size budgets --cache-dir, while this one only ever
+        # holds the blobs of the bundles in flight (see pipeline), which the
+        # prefetch depth already bounds. Evicting would just re-download them.
+        ss.blob_cache = BlobCache(scratch_dir.name, sys.maxsize)
 
     fail_count = 0
     ok_count = 0
@@ -289,13 +472,18 @@ def extract_cmd(args: ExtractCommand):
     ]
     if len(non_video_bundles) > 0:
         logger.info(f"Processing {len(non_video_bundles)} non-video bundles")
-        batch_failed = execute_in_pool(
-            non_video_bundles,
-            state,
-            args.cache,
-            use_processes=True,
-            max_workers=workers,
-        )
+        # Worker processes are started (and handed the state) inside the block.
+        with ss.shared_indexes() if args.shared_index else contextlib.nullcontext():
+            batch_failed = execute_in_pool(
+                non_video_bundles,
+                state,
+                args.cache,
+                use_processes=True,
+                max_workers=workers,
+                download_workers=args.download_workers,
+                prefetch_depth=args.prefetch or 2 * workers,
+                scratch_cache=scratch_dir is not None,
+            )
         ok_count += len(non_video_bundles) - batch_failed
         fail_count += batch_failed
 
@@ -312,11 +500,18 @@ def extract_cmd(args: ExtractCommand):
             args.cache,
             use_processes=False,
             max_workers=5,
-            checkpoint_step=1,
+            download_workers=args.download_workers,
+            prefetch_depth=args.prefetch or 2 * 5,
+            scratch_cache=scratch_dir is not None,
         )
         ok_count += len(video_bundles) - batch_failed
         fail_count += batch_failed
 
+    if scratch_dir is not None:
+        scratch_dir.cleanup()
+    elif ss.blob_cache is not None:
+        ss.blob_cache.prune()
+
     if args.write_settings:
         version = ss.version()
         assert version is not None
@@ -1,4 +1,5 @@
 import argparse
+import os
 from dataclasses import dataclass
 from typing import Iterable, List, Literal, Optional, Sequence, Set
 
@@ -6,7 +7,7 @@ import UnityPy
 from tap import Tap
 
 from pgr_assets.asset_paths import TEMP_BUNDLE_MARKER, TEXTURE_BUNDLE_MARKER
-from pgr_assets.sources import SourceSet
+from pgr_assets.sources import BlobCache, IndexCache, SourceSet
 from pgr_assets.versions import parse_version
 
 DECRYPTION_KEYS = [
@@ -24,6 +25,8 @@ PRESETS = {
     "china-beta": "CN_PC_BETA",
 }
 
+GIB = 1024**3
+
 
 class BaseArgs(Tap):
     preset: Optional[
@@ -55,6 +58,9 @@ class BaseArgs(Tap):
 
     decrypt_key: Optional[str] = None  # Decryption key to use for asset bundles
 
+    cache_dir: Optional[str] = None  # Persistent download and index cache for reuse
+    cache_size: float = 50  # Maximum size of the blob cache in --cache-dir, in GiB
+
     def configure(self) -> None:
         # Accept --log-level after the subcommand too; SUPPRESS stops the subparser
         # default from clobbering a value given before the subcommand.
@@ -177,6 +183,18 @@ def _apply_decrypt_key(version: tuple[int, ...], override: Optional[str]) -> str
     return key
 
 
+def _blob_cache(args: BaseArgs) -> Optional[BlobCache]:
+    if args.cache_dir is None:
+        return None
+    return BlobCache(os.path.join(args.cache_dir, "blobs"), int(args.cache_size * GIB))
+
+
+def _index_cache(args: BaseArgs) -> Optional[IndexCache]:
+    if args.cache_dir is None:
+        return None
+    return IndexCache(os.path.join(args.cache_dir, "index"))
+
+
 def build_source_set(args: BaseArgs) -> ResolvedSources:
     # Default to global when no source is specified; --primary/--patch opts out.
     if args.preset is None and args.primary is None and args.patch is None:
@@ -192,7 +210,7 @@ def build_source_set(args: BaseArgs) -> ResolvedSources:
             "Version must be specified when using an obb file as the primary source"
         )
 
-    source_set = SourceSet()
+    source_set = SourceSet(blob_cache=_blob_cache(args), index_cache=_index_cache(args))
 
     # When the version is known up front (always so for OBB), resolve and apply
     # the decrypt key *before* add_primary, since reading an OBB index bundle
@@ -7,6 +7,7 @@ from .helpers import build_source_set, filter_bundles, highlight, BaseArgs
 
 class ListCommand(BaseArgs):
     patterns: List[str]  # case-insensitive substring filters, AND-combined
+    resolution: bool = False  # Also print each bundle's blob, sha1 and hosting sources
 
     def configure(self) -> None:
         super().configure()
@@ -24,5 +25,12 @@ def list_cmd(args: ListCommand):
     # Color matches only on a TTY (like grep --color=auto), so piping stays clean.
     use_color = bool(args.patterns) and sys.stdout.isatty() and not os.environ.get("NO_COLOR")
 
+    if args.resolution:
+        ss.warm()
+        ss.dump_resolution(
+            sys.stdout, filter_bundles(ss.list_all_bundles(), args.patterns)
+        )
+        return
+
     for bundle in filter_bundles(ss.list_all_bundles(), args.patterns):
         print(highlight(bundle, args.patterns) if use_color else bundle)
@@ -4,6 +4,7 @@ from tap import Tap
 
 from pgr_assets.logging_setup import configure_logging
 from .bundles import BundlesCommand
+from .diff import DiffCommand
 from .extract import ExtractCommand
 from .list import ListCommand
 from .spines import SpinesCommand
@@ -26,6 +27,9 @@ class Args(Tap):
         )
         self.add_subparser("spines", SpinesCommand, help="Extracts all spine assets")
         self.add_subparser("bundles", BundlesCommand, help="Download bundles")
+        self.add_subparser(
+            "diff", DiffCommand, help="Compare the bundle indexes of two versions"
+        )
 
     def process_args(self):
         # Tap calls this automatically at the end of parse_args(), so --log-level
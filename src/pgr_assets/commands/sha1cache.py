@@ -0,0 +1,186 @@
+import contextlib
+import json
+import os
+import tempfile
+from typing import Dict, Iterator, Optional, Self
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, one writer at a time
+    fcntl = None
+
+# Compact once the journal holds this many superseded lines (and at least as
+# many as live entries), so rewriting it stays proportional to its growth.
+_COMPACT_MIN_GARBAGE = 1000
+
+
+class Sha1Cache:
+    """The ``extract --cache`` file: which sha1 of each bundle was last
+    extracted successfully.
+
+    It is an append-only journal of ``bundle<TAB>sha1`` lines: recording a
+    bundle appends one line (a single ``O_APPEND`` write, so concurrent
+    writers never interleave), and a run killed mid-write leaves at most a
+    torn last line, which loading ignores and the next run cuts off before
+    it appends. Later lines win. Superseded lines
+    are dropped by :meth:`compact`, which rewrites the journal atomically
+    under an exclusive lock; writers notice the replaced file and reopen it.
+
+    Caches written by older versions (a single JSON object) are read and
+    converted to the journal format on the first write.
+    """
+
+    path: str
+    entries: Dict[str, Optional[str]]
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self._lines = 0
+        self._legacy = False
+        self._fd: Optional[int] = None
+        if os.path.exists(path):
+            self._read()
+
+    def _read(self):
+        with open(self.path, "rb") as f:
+            data = f.read()
+
+        if data.lstrip().startswith(b"{"):
+            self.entries = json.loads(data)
+            self._legacy = True
+            self._lines = len(self.entries)
+            return
+
+        entries = {}
+        lines = data.split(b"\n")
+        # Without a trailing newline, the last line was torn by a crash.
+        lines.pop()
+        for line in lines:
+            bundle, sep, sha1 = line.decode("utf-8", "replace").partition("\t")
+            if sep:
+                entries[bundle] = None if sha1 == "-" else sha1
+        self.entries = entries
+        self._lines = len(lines)
+
+    def get(self, bundle: str) -> Optional[str]:
+        return self.entries.get(bundle)
+
+    def __contains__(self, bundle: str) -> bool:
+        return bundle in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def record(self, bundle: str, sha1: Optional[str]):
+        """Persist that ``bundle`` was extracted at ``sha1``."""
+        if self._legacy:
+            self.entries[bundle] = sha1
+            self.compact()
+            return
+
+        line = f"{bundle}\t{sha1 or '-'}\n".encode()
+        if self._fd is None:
+            # A run killed mid-write left a torn last line; appending to it
+            # would glue this line onto it.
+            with self._locked(shared=False):
+                self._drop_torn_line()
+        with self._locked(shared=True):
+            fd = self._open()
+            os.write(fd, line)
+        self.entries[bundle] = sha1
+        self._lines += 1
+        garbage = self._lines - len(self.entries)
+        if garbage >= _COMPACT_MIN_GARBAGE and garbage >= len(self.entries):
+            self.compact()
+
+    def compact(self):
+        """Rewrite the journal with one line per bundle, merging in whatever
+        other writers appended meanwhile."""
+        with self._locked(shared=False):
+            if not self._legacy and os.path.exists(self.path):
+                # The journal has our lines and any other writer's.
+                self._read()
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(
+                        "".join(
+                            f"{bundle}\t{sha1 or '-'}\n"
+                            for bundle, sha1 in self.entries.items()
+                        ).encode()
+                    )
+                os.replace(tmp, self.path)
+            except BaseException:
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(tmp)
+                raise
+            self._lines = len(self.entries)
+            self._legacy = False
+            self._close_fd()
+
+    def _drop_torn_line(self):
+        try:
+            with open(self.path, "r+b") as f:
+                end = f.seek(0, os.SEEK_END)
+                pos = end
+                # Cut back to just after the last newline (or to nothing).
+                while pos > 0:
+                    start = max(pos - 4096, 0)
+                    f.seek(start)
+                    newline = f.read(pos - start).rfind(b"\n")
+                    if newline >= 0:
+                        pos = start + newline + 1
+                        break
+                    pos = start
+                if pos != end:
+                    f.truncate(pos)
+        except FileNotFoundError:
+            pass  # nothing journaled yet
+
+    def _open(self) -> int:
+        # Reopen when another writer compacted (replaced) the journal.
+        if self._fd is not None:
+            try:
+                current = os.stat(self.path)
+            except FileNotFoundError:
+                current = None
+            opened = os.fstat(self._fd)
+            if current is None or (current.st_dev, current.st_ino) != (
+                opened.st_dev,
+                opened.st_ino,
+            ):
+                self._close_fd()
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return self._fd
+
+    def _close_fd(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    @contextlib.contextmanager
+    def _locked(self, shared: bool) -> Iterator[None]:
+        # Appends share the lock; compaction holds it exclusively, so no line
+        # is appended to a journal that is about to be replaced.
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def close(self):
+        self._close_fd()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
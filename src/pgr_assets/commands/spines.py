@@ -2,6 +2,7 @@ import concurrent.futures
 import hashlib
 import logging
 import os
+import shutil
 
 import UnityPy
 from tqdm.auto import tqdm
@@ -26,8 +27,8 @@ def download_env_bundle(bundle: str, env_dir: str, sources: SourceSet):
         if sha1 == sha1_expect:
             return
 
-    with open(out_file, "wb") as f:
-        f.write(sources.find_bundle(bundle))
+    with sources.open_bundle(bundle) as src, open(out_file, "wb") as f:
+        shutil.copyfileobj(src, f)
 
 
 def download_env(env_dir: str, sources: SourceSet):
@@ -0,0 +1,57 @@
+from decimal import Decimal
+
+
+class Fix:
+    """An exact fixnum, ``mantissa * 10 ** -scale``, as stored by new-style
+    (3.3+) tables.
+
+    Decoding a table builds thousands of these, so unlike a Decimal it only
+    keeps the two integers. It prints like the Decimal it stands for (which
+    is what ends up in the CSV), and compares and hashes equal to it.
+    """
+
+    __slots__ = ("mantissa", "scale")
+
+    mantissa: int
+    scale: int
+
+    def __init__(self, mantissa: int, scale: int):
+        self.mantissa = mantissa
+        self.scale = scale
+
+    def to_decimal(self) -> Decimal:
+        return Decimal(self.mantissa).scaleb(-self.scale)
+
+    def __str__(self) -> str:
+        # Decimal.__str__ (to-scientific-string) for an exponent of -scale.
+        sign = "-" if self.mantissa < 0 else ""
+        digits = str(abs(self.mantissa))
+        left_digits = len(digits) - self.scale
+        if left_digits > -6:
+            dot = left_digits
+            exponent = ""
+        else:
+            dot = 1
+            exponent = f"E{left_digits - 1:+d}"
+
+        if dot <= 0:
+            return f"{sign}0.{'0' * -dot}{digits}{exponent}"
+        if dot >= len(digits):
+            return f"{sign}{digits}{exponent}"
+        return f"{sign}{digits[:dot]}.{digits[dot:]}{exponent}"
+
+    def __repr__(self) -> str:
+        return f"Fix('{self}')"
+
+    def __float__(self) -> float:
+        return float(self.to_decimal())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Fix):
+            other = other.to_decimal()
+        if isinstance(other, (Decimal, int)):
+            return self.to_decimal() == other
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.to_decimal())
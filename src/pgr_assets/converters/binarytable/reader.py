@@ -1,13 +1,28 @@
 import os
+import re
 import struct
 from decimal import Decimal
-from typing import BinaryIO, Callable, Optional
+from functools import lru_cache, partial
+from typing import Any, BinaryIO, Callable, Dict, List, Optional
 
 from .exceptions import BinaryTableError
+from .fixnum import Fix
 
 MAX_I32 = 2_147_483_647
 FLOAT_TO_INT = 10_000
 
+# Regular expressions matching one encoded value, so runs of fixed-shape values
+# can be skipped in a single match.
+_LEB128 = rb"[\x80-\xff]*[\x00-\x7f]"
+_CSTRING = rb"[^\x00]*\x00"
+# A zero fixnum is just its LEB128; any other has a sign/scale byte after it.
+_FIXNUM = rb"(?:\x80*\x00|[\x80-\xff]*[\x00-\x7f][\x00-\xff])"
+
+# For splitting a run matched by the patterns above into its values.
+_LEB128_VALUES = re.compile(_LEB128)
+# (zero, LEB128 magnitude, sign/scale byte) per fixnum.
+_FIXNUM_VALUES = re.compile(rb"(\x80*\x00)|([\x80-\xff]*[\x00-\x7f])([\x00-\xff])")
+
 
 class Reader:
     buffer: bytes
@@ -36,52 +51,81 @@ class Reader:
         return self.buffer[start:end]
 
     def read_by_column_type(self, type: int):
+        return self.reader_for(type)()
+
+    def skip_by_column_type(self, type: int) -> Any:
+        """Move past a value of the column type without decoding it, returning
+        its length for list and vector types."""
+        return self.skipper_for(type)()
+
+    def reader_for(self, type: int) -> Callable[[], Any]:
+        """The read method of a column type, to call once per value."""
+        return self._method_for(type, _READ_METHODS)
+
+    def skipper_for(self, type: int) -> Callable[[], Any]:
+        """The method skipping values of a column type (see
+        :meth:`skip_by_column_type`)."""
+        if type in _DICT_METHODS:
+            _, skip_key, skip_value = _DICT_METHODS[type]
+            return partial(
+                self._skip_dict, getattr(self, skip_key), getattr(self, skip_value)
+            )
+        return self._method_for(type, _SKIP_METHODS)
+
+    def dict_keys_reader_for(self, type: int) -> Callable[[], List]:
+        """For a dict column type, a method returning the keys of a value and
+        skipping its values."""
+        read_key, _, skip_value = _DICT_METHODS[type]
+        return partial(
+            self._read_dict_keys, getattr(self, read_key), getattr(self, skip_value)
+        )
+
+    def skip_pattern(self, type: int, pooled: bool) -> bytes | None:
+        """A regular expression matching one value of the column type, or None
+        for types whose length is not fixed by their encoding (lists, dicts)."""
+        string = self._string_pattern(pooled)
+        fix = self._fix_pattern(pooled)
         match type:
             case 1:
-                return self.read_bool()
+                return rb"[\x00-\xff]"
             case 2:
-                return self.read_string()
+                return string
             case 3:
-                return self.read_fix()
-            case 4:
-                return self.read_list_string()
-            case 5:
-                return self.read_list_bool()
-            case 6:
-                return self.read_list_int()
-            case 7:
-                return self.read_list_float()
-            case 8:
-                return self.read_list_fix()
-            case 9:
-                return self.read_dict_string_string()
-            case 10:
-                return self.read_dict_int_int()
-            case 11:
-                return self.read_dict_int_string()
-            case 12:
-                return self.read_dict_string_int()
-            case 13:
-                return self.read_dict_int_float()
-            case 14:
-                return self.read_int()
-            case 15:
-                return self.read_float()
-            case 16:
-                return self.read_fix2()
-            case 17:
-                return self.read_fix3()
-            case 18:
-                return self.read_fix_quaternion()
-            case 19:
-                return self.read_list_fix2()
-            case 20:
-                return self.read_list_fix3()
-            case 21:
-                return self.read_list_fix_quaternion()
-            case _:
+                return fix
+            case 14 | 15:
+                return _LEB128
+            case 16 | 17 | 18:
+                return b"(?:%s){%d}" % (fix, type - 14)
+        return None
+
+    def _string_pattern(self, pooled: bool) -> bytes:
+        return _LEB128 if pooled else _CSTRING
+
+    def _fix_pattern(self, pooled: bool) -> bytes:
+        return _FIXNUM if self.new_fixnum else self._string_pattern(pooled)
+
+    def _skip_run(self, pattern: bytes, count: int) -> int:
+        # Move past ``count`` values matching ``pattern``, returning where
+        # they started.
+        start = self.pos
+        if count <= 0:
+            return start
+        match = _run_of(pattern, count).match(self.buffer, start)
+        if match is None:
+            raise BinaryTableError(f"Truncated list of {count} values")
+        self.pos = match.end()
+        return start
+
+    def _method_for(self, type: int, methods: Dict[int, str]) -> Callable:
+        name = methods.get(type)
+        if name is None:
+
+            def unknown():
                 raise BinaryTableError(f"Unknown column type: {type}")
 
+            return unknown
+        return getattr(self, name)
+
     def read_u8(self):
         pos = self.pos
         self.pos = pos + 1
@@ -95,6 +139,11 @@ class Reader:
     def read_leb128(self):
         buffer = self.buffer
         pos = self.pos
+        byte = buffer[pos]
+        if byte < 0x80:
+            # Single-byte values are by far the most common.
+            self.pos = pos + 1
+            return byte
         result = 0
         shift = 0
         while True:
@@ -107,6 +156,33 @@ class Reader:
         self.pos = pos
         return result
 
+    def skip_u8(self):
+        self.pos += 1
+
+    def _read_leb128s(self, count: int) -> List[int]:
+        """``count`` consecutive LEB128 values, decoded in bulk."""
+        if count <= 0:
+            return []
+        buffer = self.buffer
+        start = self.pos
+        run = buffer[start : start + count]
+        if len(run) == count and run.isascii():
+            # Every value is a single byte.
+            self.pos = start + count
+            return list(run)
+        start = self._skip_run(_LEB128, count)
+        return [
+            _leb128_value(value)
+            for value in _LEB128_VALUES.findall(buffer, start, self.pos)
+        ]
+
+    def skip_leb128(self):
+        buffer = self.buffer
+        pos = self.pos
+        while buffer[pos] & 0x80:
+            pos += 1
+        self.pos = pos + 1
+
     def read_bool(self):
         return self.read_u8() == 1
 
@@ -124,6 +200,12 @@ class Reader:
         self.pos = end + 1
         return buffer[start:end].decode("utf-8")
 
+    def skip_string(self):
+        if self.use_string_pool:
+            self.skip_leb128()
+        else:
+            self.pos = self.buffer.index(0, self.pos) + 1
+
     def read_int(self):
         x = self.read_leb128()
         # Bounds to signed i32 range
@@ -138,19 +220,44 @@ class Reader:
 
     def read_list_string(self):
         count = self.read_int()
-        return [self.read_string() for _ in range(count)]
+        if self.use_string_pool or count <= 0:
+            return [self.read_string() for _ in range(count)]
+        start = self._skip_run(_CSTRING, count)
+        values = self.buffer[start : self.pos - 1].split(b"\x00")
+        return [value.decode("utf-8") for value in values]
+
+    def skip_list_string(self):
+        count = self.read_int()
+        self._skip_run(self._string_pattern(self.use_string_pool), count)
+        return count
+
+    def skip_list_bool(self):
+        count = self.read_int()
+        self.pos += count
+        return count
+
+    def skip_list_leb128(self):
+        count = self.read_int()
+        self._skip_run(_LEB128, count)
+        return count
 
     def read_list_bool(self):
         count = self.read_int()
-        return [self.read_bool() for _ in range(count)]
+        if count <= 0:
+            return []
+        values = self.read_bytes(count)
+        if len(values) < count:
+            raise BinaryTableError(f"Truncated list of {count} values")
+        return [value == 1 for value in values]
 
     def read_list_int(self):
-        count = self.read_int()
-        return [self.read_int() for _ in range(count)]
+        return [_to_i32(x) for x in self._read_leb128s(self.read_int())]
 
     def read_list_float(self):
-        count = self.read_int()
-        return [self.read_float() for _ in range(count)]
+        return [
+            _to_i32(x) / FLOAT_TO_INT if x else 0.0
+            for x in self._read_leb128s(self.read_int())
+        ]
 
     def _read_dict(self, key_fn, value_fn):
         count = self.read_int()
@@ -161,6 +268,18 @@ class Reader:
             d[key] = value
         return d
 
+    def _read_dict_keys(self, read_key, skip_value) -> List:
+        keys = []
+        for _ in range(self.read_int()):
+            keys.append(read_key())
+            skip_value()
+        return keys
+
+    def _skip_dict(self, skip_key, skip_value):
+        for _ in range(self.read_int()):
+            skip_key()
+            skip_value()
+
     def read_dict_string_string(self):
         return self._read_dict(self.read_string, self.read_string)
 
@@ -189,7 +308,7 @@ class Reader:
         # Option 2: new style
         # uLEB128 encoded number followed by an u8
         # the u8 indicates sign
-        num = Decimal(self.read_leb128())
+        num = self.read_leb128()
         if num == 0:
             return 0
 
@@ -197,35 +316,92 @@ class Reader:
         flip_sign = bool(shift & 0x80)
         shift = shift & (0x80 - 1)
 
-        num = num.scaleb(-1 * shift)
-        if flip_sign:
-            return -num
-        return num
+        return Fix(-num if flip_sign else num, shift)
+
+    def skip_fix(self):
+        if not self.new_fixnum:
+            self.skip_string()
+        elif self.read_leb128() != 0:
+            self.pos += 1  # sign and scale
 
     def read_list_fix(self):
+        return self._read_fixes(self.read_int())
+
+    def _read_fixes(self, count: int) -> List:
+        """``count`` consecutive fixnums, decoded in bulk (new style only)."""
+        if not self.new_fixnum:
+            return [self.read_fix() for _ in range(count)]
+        if count <= 0:
+            return []
+        start = self._skip_run(_FIXNUM, count)
+        values = []
+        append = values.append
+        for zero, num, shift in _FIXNUM_VALUES.findall(self.buffer, start, self.pos):
+            if zero:
+                append(0)
+                continue
+            # As in read_fix.
+            value = _leb128_value(num)
+            append(Fix(-value if shift[0] & 0x80 else value, shift[0] & 0x7F))
+        return values
+
+    def skip_list_fix(self):
         count = self.read_int()
-        return [self.read_fix() for _ in range(count)]
+        self._skip_fixes(count)
+        return count
+
+    def _skip_fixes(self, count):
+        self._skip_run(self._fix_pattern(self.use_string_pool), count)
+
+    def skip_fix2(self):
+        self._skip_fixes(2)
+        return 2
+
+    def skip_fix3(self):
+        self._skip_fixes(3)
+        return 3
+
+    def skip_fix_quaternion(self):
+        self._skip_fixes(4)
+        return 4
 
     def read_fix2(self):
-        return [self.read_fix(), self.read_fix()]
+        return self._read_fixes(2)
 
     def read_fix3(self):
-        return [self.read_fix(), self.read_fix(), self.read_fix()]
+        return self._read_fixes(3)
 
     def read_fix_quaternion(self):
-        return [self.read_fix(), self.read_fix(), self.read_fix(), self.read_fix()]
+        return self._read_fixes(4)
 
-    def read_list_fix2(self):
+    def _read_fix_vectors(self, arity: int) -> List[List]:
         count = self.read_int()
-        return [self.read_fix2() for _ in range(count)]
+        values = self._read_fixes(count * arity)
+        return [values[i : i + arity] for i in range(0, len(values), arity)]
+
+    def read_list_fix2(self):
+        return self._read_fix_vectors(2)
 
     def read_list_fix3(self):
-        count = self.read_int()
-        return [self.read_fix3() for _ in range(count)]
+        return self._read_fix_vectors(3)
 
     def read_list_fix_quaternion(self):
+        return self._read_fix_vectors(4)
+
+    def skip_list_fix2(self):
+        count = self.read_int()
+        self._skip_fixes(count * 2)
+        return count
+
+    def skip_list_fix3(self):
+        count = self.read_int()
+        self._skip_fixes(count * 3)
+        return count
+
+    def skip_list_fix_quaternion(self):
         count = self.read_int()
-        return [self.read_fix_quaternion() for _ in range(count)]
+        self._skip_fixes(count * 4)
+        return count
 
     def peek_byte(self):
         return self.buffer[self.pos]
@@ -245,3 +421,74 @@ class Reader:
 
     def get_position(self):
         return self.pos
+
+
+def _to_i32(x: int) -> int:
+    # As in Reader.read_int.
+    return x if x <= MAX_I32 else -(((~x) & MAX_I32) + 1)
+
+
+def _leb128_value(encoded: bytes) -> int:
+    result = 0
+    for byte in reversed(encoded):
+        result = result << 7 | byte & 0x7F
+    return result
+
+
+@lru_cache(maxsize=256)
+def _run_of(pattern: bytes, count: int) -> re.Pattern:
+    return re.compile(b"(?:%s){%d}" % (pattern, count))
+
+
+# Reader methods by column type.
+_READ_METHODS = {
+    1: "read_bool",
+    2: "read_string",
+    3: "read_fix",
+    4: "read_list_string",
+    5: "read_list_bool",
+    6: "read_list_int",
+    7: "read_list_float",
+    8: "read_list_fix",
+    9: "read_dict_string_string",
+    10: "read_dict_int_int",
+    11: "read_dict_int_string",
+    12: "read_dict_string_int",
+    13: "read_dict_int_float",
+    14: "read_int",
+    15: "read_float",
+    16: "read_fix2",
+    17: "read_fix3",
+    18: "read_fix_quaternion",
+    19: "read_list_fix2",
+    20: "read_list_fix3",
+    21: "read_list_fix_quaternion",
+}
+
+_SKIP_METHODS = {
+    1: "skip_u8",
+    2: "skip_string",
+    3: "skip_fix",
+    4: "skip_list_string",
+    5: "skip_list_bool",
+    6: "skip_list_leb128",
+    7: "skip_list_leb128",
+    8: "skip_list_fix",
+    14: "skip_leb128",
+    15: "skip_leb128",
+    16: "skip_fix2",
+    17: "skip_fix3",
+    18: "skip_fix_quaternion",
+    19: "skip_list_fix2",
+    20: "skip_list_fix3",
+    21: "skip_list_fix_quaternion",
+}
+
+# Dict column types: how to read a key, skip a key and skip a value.
+_DICT_METHODS = {
+    9: ("read_string", "skip_string", "skip_string"),
+    10: ("read_int", "skip_leb128", "skip_leb128"),
+    11: ("read_int", "skip_leb128", "skip_string"),
+    12: ("read_string", "skip_string", "skip_leb128"),
+    13: ("read_int", "skip_leb128", "skip_leb128"),
+}
@@ -1,7 +1,10 @@
 import csv
+import re
 import struct
+from array import array
 from dataclasses import dataclass
-from typing import BinaryIO, List, IO, Dict, cast
+from functools import cached_property
+from typing import BinaryIO, Iterator, List, IO, Dict, Sequence, Tuple, cast
 
 from .exceptions import BinaryTableError
 from .reader import Reader
@@ -36,6 +39,15 @@ class Column:
 
 
 class BinaryTable:
+    """A parsed binary table.
+
+    Construction reads the header and walks the content once, without
+    decoding values, to find where each row starts and the shape (longest
+    list, dict keys) of every column. Rows are decoded on demand, either all
+    of them (:attr:`rows`) or streamed and limited to some columns
+    (:meth:`iter_rows`, :meth:`to_csv`).
+    """
+
     reader: Reader
 
     info_length: int
@@ -55,7 +67,8 @@ class BinaryTable:
     pool_offset_info_array: List[int]
     pool_content_start_pos: int
 
-    rows: List
+    # Reader position of every row's first value.
+    row_offsets: "array[int]"
 
     # Per-column bookkeeping categories, precomputed once from the column type so
     # the per-cell row loop avoids repeated method-call dispatch.
@@ -79,13 +92,43 @@ class BinaryTable:
         if self.enable_string_pool:
             self._read_string_pool_info()
         self._precompute_column_info()
-        self._read_content()
+        self._index_rows()
 
     def _precompute_column_info(self):
         self._pool_flags = [
             self._is_string_pool_column(j + 1) for j in range(len(self.columns))
         ]
         self._column_kinds = [self._column_kind(c) for c in self.columns]
+        self._readers = [self.reader.reader_for(c.type) for c in self.columns]
+        self._skippers = [self.reader.skipper_for(c.type) for c in self.columns]
+        # For the shape of dict columns, only their keys are decoded.
+        self._dict_keys_readers = {
+            j: self.reader.dict_keys_reader_for(c.type)
+            for j, c in enumerate(self.columns)
+            if c.is_dict_type()
+        }
+        self._index_plan = self._plan_index()
+        self._every_column = list(range(len(self.columns)))
+
+    def _plan_index(self) -> List[Tuple[re.Pattern | None, int, int]]:
+        # Consecutive fixed-shape columns are skipped by one regex match, as
+        # (pattern, first, end) steps; other columns get (None, j, j + 1).
+        plan = []
+        run_start, run = 0, b""
+        for j, column in enumerate(self.columns):
+            pattern = self.reader.skip_pattern(column.type, self._pool_flags[j])
+            if pattern is not None:
+                if not run:
+                    run_start = j
+                run += pattern
+                continue
+            if run:
+                plan.append((re.compile(run), run_start, j))
+                run = b""
+            plan.append((None, j, j + 1))
+        if run:
+            plan.append((re.compile(run), run_start, len(self.columns)))
+        return plan
 
     @classmethod
     def _column_kind(cls, column: Column) -> int:
@@ -226,51 +269,118 @@ class BinaryTable:
         self.reader.seek(current_pos)
         return string_value
 
-    def _read_content(self):
+    def _index_rows(self):
+        self.row_offsets = array("Q")
         if self.content_trunk_length == 0 or self.row_count == 0:
-            self.rows = []
             return
 
-        self.reader.seek(
+        reader = self.reader
+        buffer = reader.buffer
+        reader.seek(
             4 + self.info_length + self.primary_key_length + self.row_trunk_length
         )
-        self.rows = [self._row(i) for i in range(self.row_count)]
+        for row_index in range(self.row_count):
+            self.row_offsets.append(reader.pos)
+            for pattern, first, end in self._index_plan:
+                if pattern is not None:
+                    match = pattern.match(buffer, reader.pos)
+                    if match is not None:
+                        reader.pos = match.end()
+                        continue
+                # Also reached when a run does not match, to report the column.
+                for j in range(first, end):
+                    self._index_value(row_index, j)
+
+        for column in self.columns:
+            # Fixed-arity vectors, when skipped by pattern.
+            if 16 <= column.type <= 18:
+                column.list_length = max(column.list_length, column.type - 14)
+
+    def _index_value(self, row_index: int, j: int):
+        # Skip one value, keeping track of the column's shape.
+        column = self.columns[j]
+        kind = self._column_kinds[j]
+        self.reader.use_string_pool = self._pool_flags[j]
+        try:
+            if kind == self._KIND_SCALAR:
+                self._skippers[j]()
+            elif kind == self._KIND_LIST:
+                n = cast(int, self._skippers[j]())
+                if n > column.list_length:
+                    column.list_length = n
+            else:
+                keys = self._dict_keys_readers[j]()
+                if kind == self._KIND_INT_DICT:
+                    if keys:
+                        column.list_length = max(column.list_length, *keys)
+                else:
+                    for key in keys:
+                        column.add_dict_key(key)
+        except Exception as e:
+            raise BinaryTableError(
+                f"Error reading column {column.name} at row {row_index}"
+            ) from e
+
+    def column_indices(self, columns: Sequence[int | str] | None = None) -> List[int]:
+        """Indices of ``columns``, given by name or index (all if None)."""
+        if columns is None:
+            return list(range(len(self.columns)))
+        names = {column.name: j for j, column in enumerate(self.columns)}
+        indices = []
+        for column in columns:
+            if isinstance(column, str):
+                if column not in names:
+                    raise BinaryTableError(f"Unknown column: {column}")
+                indices.append(names[column])
+            elif 0 <= column < len(self.columns):
+                indices.append(column)
+            else:
+                raise BinaryTableError(f"Column index out of range: {column}")
+        return indices
 
-    def _row(self, row_index: int):
+    def iter_rows(self, columns: Sequence[int | str] | None = None) -> Iterator[List]:
+        """Decode the rows one at a time, each a list of the values of
+        ``columns`` (by name or index, in that order; all if None)."""
+        indices = self.column_indices(columns)
+        for row_index in range(len(self.row_offsets)):
+            yield self._row(row_index, indices)
+
+    def row(self, row_index: int, columns: Sequence[int | str] | None = None) -> List:
+        return self._row(row_index, self.column_indices(columns))
+
+    @cached_property
+    def rows(self) -> List[List]:
+        """Every row, decoded."""
+        return list(self.iter_rows())
+
+    def _row(self, row_index: int, indices: List[int]) -> List:
         reader = self.reader
-        read_by_column_type = reader.read_by_column_type
         pool_flags = self._pool_flags
-        column_kinds = self._column_kinds
-        row = []
-        append = row.append
-        for j, column in enumerate(self.columns):
+        readers = self._readers
+        skippers = self._skippers
+        every_column = indices == self._every_column
+        wanted = None if every_column else set(indices)
+        values = []
+        append = values.append
+        reader.seek(self.row_offsets[row_index])
+        # Values after the last wanted column are never read.
+        for j in range(max(indices, default=-1) + 1):
             reader.use_string_pool = pool_flags[j]
             try:
-                value = read_by_column_type(column.type)
+                if wanted is None or j in wanted:
+                    append(readers[j]())
+                else:
+                    skippers[j]()
+                    append(None)
             except Exception as e:
                 raise BinaryTableError(
-                    f"Error reading column {column.name} at row {row_index}"
+                    f"Error reading column {self.columns[j].name} at row {row_index}"
                 ) from e
+        return values if every_column else [values[j] for j in indices]
 
-            append(value)
-
-            kind = column_kinds[j]
-            if kind == self._KIND_LIST:
-                n = len(cast(list, value))
-                if n > column.list_length:
-                    column.list_length = n
-            elif kind == self._KIND_INT_DICT:
-                dict_value = cast(dict, value)
-                if dict_value:
-                    column.list_length = max(column.list_length, *dict_value.keys())
-            elif kind == self._KIND_STR_DICT:
-                for key in cast(dict, value):
-                    column.add_dict_key(key)
-
-        return row
-
-    def csv_headers(self):
-        for column in self.columns:
+    def csv_headers(self, columns: Sequence[int | str] | None = None):
+        for j in self.column_indices(columns):
+            column = self.columns[j]
             if column.list_length > 0:
                 for i in range(column.list_length):
                     yield f"{column.name}[{i}]"
@@ -280,9 +390,14 @@ class BinaryTable:
             else:
                 yield column.name
 
-    def csv_row(self, row: List):
-        for key, column in enumerate(self.columns):
-            value = row[key]
+    def csv_row(self, row: List, columns: Sequence[int | str] | None = None):
+        """The CSV cells of ``row``, which holds the values of ``columns`` (as
+        returned by :meth:`iter_rows`)."""
+        return self._csv_cells(row, self.column_indices(columns))
+
+    def _csv_cells(self, row: List, indices: List[int]):
+        for value, j in zip(row, indices):
+            column = self.columns[j]
             # Int dicts are lists if we squint hard enough
             if column.is_int_keyed_dict():
                 for i in range(column.list_length):
@@ -302,8 +417,11 @@ class BinaryTable:
             else:
                 yield value
 
-    def to_csv(self, file: IO):
+    def to_csv(self, file: IO, columns: Sequence[int | str] | None = None):
+        """Write the table (or only ``columns``) as CSV, decoding one row at a
+        time."""
+        indices = self.column_indices(columns)
         writer = csv.writer(file)
-        writer.writerow(self.csv_headers())
-        for row in self.rows:
-            writer.writerow(self.csv_row(row))
+        writer.writerow(self.csv_headers(indices))
+        for row in self.iter_rows(indices):
+            writer.writerow(self._csv_cells(row, indices))
@@ -9,13 +9,14 @@ their existing result.
 """
 
 import PyCriCodecsEx.utf as _utf
+from CriCodecsEx import HcaDecode
 from PyCriCodecsEx.awb import AWB
 from PyCriCodecsEx.chunk import UTFType, UTFTypeValues
 from PyCriCodecsEx.hca import HCA
 from PyCriCodecsEx.usm import USM
 from PyCriCodecsEx.utf import UTF
 
-__all__ = ["UTF", "USM", "AWB", "HCA", "UTFType", "UTFTypeValues"]
+__all__ = ["UTF", "USM", "AWB", "HCA", "HcaDecode", "UTFType", "UTFTypeValues"]
 
 _ORIGINAL_FALLBACK = ("shift-jis", "utf-16")
 _PATCHED_FALLBACK = ("shift-jis", "utf-16", "gbk")
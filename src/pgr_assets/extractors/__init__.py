@@ -1,5 +1,11 @@
 from .spine.extractor import extract_spine
-from .bundle import extract_bundle, get_text_asset
+from .bundle import extract_bundle, get_binary_table, get_text_asset
 from .usm import PGRUSM
 
-__all__ = ["extract_spine", "extract_bundle", "get_text_asset", "PGRUSM"]
+__all__ = [
+    "extract_spine",
+    "extract_bundle",
+    "get_binary_table",
+    "get_text_asset",
+    "PGRUSM",
+]
@@ -1,25 +1,70 @@
+import concurrent.futures
+import io
 import logging
 import os
-from typing import Any, cast
+from typing import Any, Dict, List, Optional, Tuple, cast
 
 import UnityPy
 from PIL import Image
 from UnityPy.classes import Sprite, TextAsset, Texture2D
 from UnityPy.enums import ClassIDType
 
-from pgr_assets.asset_paths import ROLECHARACTER_IMAGE_MARKER
 from pgr_assets.converters.binarytable.exceptions import BinaryTableError
+from pgr_assets.converters.binarytable.table import BinaryTable
 
-from .helpers import rewrite_text_asset
+from .helpers import rewrite_text_asset, save_text_asset
+from .imagededupe import ImageDedupe
+from .imageprofile import DEFAULT_IMAGE_PROFILE, ImageProfile
+from .manifest import BundleManifest
 
 logger = logging.getLogger("pgr-assets.extractors.bundle")
 
+_EXTRACTED_TYPES = ("Texture2D", "Sprite", "TextAsset")
+
 
 def extract_bundle(
     env: UnityPy.Environment,
     output_dir: str,
     game_version: tuple[int, int],
     allow_binary_table_convert=False,
+    manifest: Optional[BundleManifest] = None,
+    image_threads: int = 1,
+    image_profile: ImageProfile = DEFAULT_IMAGE_PROFILE,
+    dedupe: Optional[ImageDedupe] = None,
+):
+    """Extract every container entry of ``env`` below ``output_dir``. With a
+    ``manifest``, entries whose data is unchanged since it was written are
+    skipped, and the manifest is updated with what this run extracted. With
+    ``image_threads`` > 1, images are encoded on that many threads. With
+    ``dedupe``, images identical to ones already encoded are linked."""
+    encoder = None
+    if image_threads > 1:
+        encoder = _ImageEncoder(image_threads, image_profile, dedupe, manifest)
+    try:
+        _extract_entries(
+            env,
+            output_dir,
+            game_version,
+            allow_binary_table_convert,
+            manifest,
+            image_profile,
+            dedupe,
+            encoder,
+        )
+    finally:
+        if encoder is not None:
+            encoder.close()
+
+
+def _extract_entries(
+    env: UnityPy.Environment,
+    output_dir: str,
+    game_version: tuple[int, int],
+    allow_binary_table_convert: bool,
+    manifest: Optional[BundleManifest],
+    image_profile: ImageProfile,
+    dedupe: Optional[ImageDedupe],
+    encoder: Optional["_ImageEncoder"],
 ):
     for path, obj in env.container.items():
         dest = os.path.join(output_dir, *path.split("/"))
@@ -28,40 +73,135 @@ def extract_bundle(
         os.makedirs(os.path.dirname(dest), exist_ok=True)
 
         try:
+            digest = None
+            if manifest is not None:
+                if path.endswith(".ttf"):
+                    digest = manifest.digest(_font(obj))
+                elif obj.type.name in _EXTRACTED_TYPES:
+                    digest = manifest.digest(obj)
+                if digest is not None and manifest.unchanged(path, digest):
+                    logger.debug(f"Skipping unchanged {path}")
+                    continue
+
+            files: List[str] = []
             if path.endswith(".ttf"):
-                font = next(
-                    o
-                    for o in cast(Any, obj).assets_file.objects.values()
-                    if o.type == ClassIDType.Font
-                )
                 with open(dest, "wb") as f:
-                    f.write(bytes(font.read().m_FontData))
+                    f.write(bytes(_font(obj).read().m_FontData))
+                files = [dest]
                 logger.debug(f"Extracted font {path}")
             elif obj.type.name in ["Texture2D", "Sprite"]:
                 data = cast(Texture2D | Sprite, obj.read())
-                save_image(data.image, dest)
-                logger.debug(f"Extracted {path}")
+                alias = linked = None
+                if dedupe is not None and obj.type.name == "Texture2D":
+                    # Identical texture data: link without even decoding.
+                    alias = dedupe.texture_key(cast(Texture2D, data))
+                    linked = image_profile.link_existing(alias, dest, dedupe)
+                if linked is not None:
+                    files = linked
+                    logger.debug(f"Linked duplicate {path}")
+                elif encoder is not None:
+                    # Decoding reads from the bundle, which isn't thread-safe,
+                    # so only the encoding moves to the pool.
+                    encoder.submit(path, digest, data.image, dest, alias)
+                    continue
+                else:
+                    files = save_image(data.image, dest, image_profile, dedupe, alias)
+                    logger.debug(f"Extracted {path}")
             elif obj.type.name == "TextAsset":
                 text = cast(TextAsset, obj.read())
-                dest, data = rewrite_text_asset(
+                dest = save_text_asset(
                     dest,
                     text.m_Script.encode("utf-8", "surrogateescape"),
                     game_version,
                     allow_binary_table_convert=allow_binary_table_convert,
                 )
-                # path can change a bit
-                os.makedirs(os.path.dirname(dest), exist_ok=True)
-                with open(dest, "wb") as f:
-                    f.write(data)
+                files = [dest]
                 logger.debug(f"Extracted {path}")
-            # else:
-            #     logger.warning(f"Unsupported type {obj.type.name} for {path}")
+
+            if manifest is not None and digest is not None:
+                manifest.record(path, digest, files)
         except (BinaryTableError, UnicodeDecodeError) as e:
             logger.warning(f"Skipping {path}: {e}")
         except Exception:
             logger.exception(f"Unexpected failure extracting {path}")
 
 
+class _ImageEncoder:
+    """Runs :func:`save_image` for one bundle on a bounded thread pool.
+
+    Pillow releases the GIL while encoding, so a bundle of hundreds of
+    sprites uses several cores instead of pinning one. At most two images per
+    thread wait decoded in memory, and images with the same destination are
+    encoded one after the other.
+    """
+
+    def __init__(
+        self,
+        threads: int,
+        profile: ImageProfile,
+        dedupe: Optional[ImageDedupe],
+        manifest: Optional[BundleManifest],
+    ):
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix="save-image"
+        )
+        self._limit = 2 * threads
+        self._profile = profile
+        self._dedupe = dedupe
+        self._manifest = manifest
+        self._pending: Dict[concurrent.futures.Future, Tuple[str, Optional[str]]] = {}
+        self._dests: Dict[str, concurrent.futures.Future] = {}
+
+    def submit(
+        self,
+        path: str,
+        digest: Optional[str],
+        img: Image.Image,
+        dest: str,
+        alias: Optional[str] = None,
+    ):
+        base = os.path.splitext(dest)[0]
+        earlier = self._dests.get(base)
+        if earlier is not None and earlier in self._pending:
+            self._collect([earlier])
+        while len(self._pending) >= self._limit:
+            self._collect(self._pending, concurrent.futures.FIRST_COMPLETED)
+
+        future = self._pool.submit(
+            save_image, img, dest, self._profile, self._dedupe, alias
+        )
+        self._pending[future] = (path, digest)
+        self._dests[base] = future
+
+    def _collect(self, futures, return_when=concurrent.futures.ALL_COMPLETED):
+        done, _ = concurrent.futures.wait(futures, return_when=return_when)
+        for future in done:
+            path, digest = self._pending.pop(future)
+            try:
+                files = future.result()
+            except Exception:
+                logger.exception(f"Unexpected failure extracting {path}")
+                continue
+            logger.debug(f"Extracted {path}")
+            if self._manifest is not None and digest is not None:
+                self._manifest.record(path, digest, files)
+
+    def close(self):
+        try:
+            self._collect(list(self._pending))
+        finally:
+            self._pool.shutdown()
+
+
+def _font(obj) -> Any:
+    # A .ttf entry points at the bundle's asset; the font data is its Font object.
+    return next(
+        o
+        for o in cast(Any, obj).assets_file.objects.values()
+        if o.type == ClassIDType.Font
+    )
+
+
 def get_text_asset(
     env: UnityPy.Environment,
     path: str,
@@ -79,13 +219,25 @@ def get_text_asset(
     return data.decode("utf-8")
 
 
-def save_image(img: Image.Image, dest: str):
-    # correct extension
-    dest, ext = os.path.splitext(dest)
-    img.save(dest + ".png")
-    img.save(dest + ".webp", lossless=False, quality=80)
+def get_binary_table(
+    env: UnityPy.Environment, path: str, game_version: tuple[int, int]
+) -> BinaryTable:
+    """The binary table at ``path``, unconverted, to read only the rows or
+    columns needed."""
+    obj = env.container[path]
+    text = cast(TextAsset, obj.read())
+    data = text.m_Script.encode("utf-8", "surrogateescape")
+    return BinaryTable(io.BytesIO(data), game_version)
+
 
-    if ROLECHARACTER_IMAGE_MARKER in dest.replace(os.sep, "/"):
-        thumb = img.copy()
-        thumb.thumbnail((256, 256))
-        thumb.save(dest + ".256.webp", lossless=False, quality=80)
+def save_image(
+    img: Image.Image,
+    dest: str,
+    profile: ImageProfile = DEFAULT_IMAGE_PROFILE,
+    dedupe: Optional[ImageDedupe] = None,
+    alias: Optional[str] = None,
+) -> List[str]:
+    """Encode ``img`` next to ``dest`` (whose extension is replaced) as the
+    outputs of ``profile`` and return the paths written. See
+    :meth:`ImageProfile.save` for ``dedupe`` and ``alias``."""
+    return profile.save(img, dest, dedupe, alias)
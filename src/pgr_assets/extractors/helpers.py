@@ -8,8 +8,7 @@ from pgr_assets.converters.binarytable.exceptions import BinaryTableError
 from pgr_assets.converters.binarytable.table import BinaryTable
 
 
-def decrypt(content, offset=None, count=None):
-    x_crypto_key = bytearray([
+_X_CRYPTO_KEY = bytes([
         103, 40, 227, 236, 173, 175, 148, 243, 66, 252, 58, 22, 68, 192, 159, 15, 187, 15, 15, 29, 209, 209, 212, 66,
          104, 16, 252, 194, 227, 14, 116, 112, 196, 221, 5, 1, 4, 173, 165, 69, 45, 193, 95, 10, 67, 38, 167, 239, 96,
          184, 133, 75, 152, 196, 36, 121, 251, 7, 73, 82, 219, 25, 118, 70, 153, 232, 120, 120, 147, 10, 88, 106, 214,
@@ -22,6 +21,16 @@ def decrypt(content, offset=None, count=None):
          80, 47, 4, 105, 59, 227, 220, 180, 231, 176, 187, 205, 203, 148, 121, 98, 90, 87, 131, 245, 3, 63, 239, 57,
          117, 102, 134, 40, 172, 60, 128, 108, 102, 216, 247, 133, 102
     ])  # fmt: skip
+
+# _ROTATE[n] rotates a byte left by n bits, as a bytes.translate table.
+_ROTATE = [bytes((b << n | b >> 8 - n) & 0xFF for b in range(256)) for n in range(8)]
+
+
+def _xor(a: bytes, b: bytes) -> bytes:
+    return (int.from_bytes(a) ^ int.from_bytes(b)).to_bytes(len(a))
+
+
+def decrypt(content, offset=None, count=None):
     content = bytearray(content)
     if offset is None:
         offset = 0
@@ -29,25 +38,32 @@ def decrypt(content, offset=None, count=None):
         count = len(content)
     if len(content) < offset + count:
         raise ValueError("Invalid offset+count")
-
-    # One specific byte from the key is chosen to xor with everything? Why?
-    num = count % len(x_crypto_key)
-    for i in reversed(range(count)):
-        # i loops backwards, calculate actual index based on offset param
-        num2 = i + offset
-        # num3 is actual byte
-        num3 = content[num2]
-        # Ok... (next byte or 0 if out of bounds) + number of bytes % 8, why?
-        num4 = ((content[num2 + 1] if i + 1 < count else 0) + count) % 8
-        num3 = num3 >> 8 - num4 | num3 << num4
-        num3 ^= x_crypto_key[i % len(x_crypto_key)]
-
-        if num2 > offset:
-            num3 ^= content[num2 - 1]
-
-        num3 ^= x_crypto_key[num]
-        content[num2] = num3 & 0xFF
-
+    if count == 0:
+        return content
+
+    # Walking backwards from the last byte, each byte is rotated left by
+    # (the next, already decrypted byte + count) % 8, then xored with the key
+    # (cycled), the previous, still encrypted byte and one fixed key byte. Only
+    # the rotation depends on an earlier result, so everything else is done
+    # over the whole payload at once, for all 8 possible rotations.
+    data = bytes(content[offset : offset + count])
+    key = len(_X_CRYPTO_KEY)
+    stream = (_X_CRYPTO_KEY * (count // key + 1))[:count]
+    fixed = bytes([_X_CRYPTO_KEY[count % key]]) * count
+    mask = _xor(_xor(stream, b"\0" + data[:-1]), fixed)
+    # Reversed, in the order bytes are decrypted.
+    rotated = [_xor(data.translate(table), mask)[::-1] for table in _ROTATE]
+
+    rotation = bytes((b + count) % 8 for b in range(256))
+    out = bytearray()
+    n = count % 8
+    for candidates in zip(*rotated):
+        b = candidates[n]
+        out.append(b)
+        n = rotation[b]
+
+    out.reverse()
+    content[offset : offset + count] = out
     return content
 
 
@@ -70,23 +86,58 @@ def _looks_like_binary_table(table: BinaryTable) -> bool:
     )
 
 
-def try_convert_to_csv(
+def _read_binary_table(
     data: bytes | bytearray, game_version: tuple[int, int]
-) -> bytearray | None:
-    """Convert a binary-table payload to CSV, or return None if it isn't one."""
+) -> BinaryTable | None:
     try:
         table = BinaryTable(io.BytesIO(data), game_version)
     except (ValueError, IndexError, struct.error, BinaryTableError):
         return None
+    return table if _looks_like_binary_table(table) else None
 
-    if not _looks_like_binary_table(table):
+
+def try_convert_to_csv(
+    data: bytes | bytearray, game_version: tuple[int, int]
+) -> bytearray | None:
+    """Convert a binary-table payload to CSV, or return None if it isn't one."""
+    table = _read_binary_table(data, game_version)
+    if table is None:
         return None
 
     output = io.StringIO(newline="")
-    table.to_csv(output)
+    try:
+        # Values are only decoded while writing, so that can fail too.
+        table.to_csv(output)
+    except (ValueError, IndexError, struct.error, BinaryTableError):
+        return None
     return bytearray(output.getvalue().encode())
 
 
+def write_binary_table_csv(
+    data: bytes | bytearray, game_version: tuple[int, int], dest: str
+) -> bool:
+    """Write a binary-table payload to ``dest`` as CSV, one row at a time, so
+    memory use doesn't grow with the table. False, and nothing is left at
+    ``dest`` (nor a directory created for it), if it isn't a table."""
+    table = _read_binary_table(data, game_version)
+    if table is None:
+        return False
+
+    parent = os.path.dirname(dest)
+    created = bool(parent) and not os.path.isdir(parent)
+    if created:
+        os.makedirs(parent, exist_ok=True)
+    try:
+        with open(dest, "w", encoding="utf-8", newline="") as f:
+            table.to_csv(f)
+    except (ValueError, IndexError, struct.error, BinaryTableError):
+        os.unlink(dest)
+        if created:
+            os.rmdir(parent)
+        return False
+    return True
+
+
 def _binary_table_csv_path(path: str) -> str:
     # Tables come as both foo.tab.bytes and foo.bytes.
     for suffix in (".tab.bytes", ".bytes"):
@@ -139,3 +190,24 @@ def rewrite_text_asset(
             return path, decrypt(data)
 
     return path, data
+
+
+def save_text_asset(
+    path: str,
+    data: bytes | bytearray,
+    game_version: tuple[int, int],
+    allow_binary_table_convert=False,
+) -> str:
+    """Write a TextAsset payload as :func:`rewrite_text_asset` rewrites it and
+    return the path written. Binary tables are streamed to their CSV."""
+    if allow_binary_table_convert and TEMP_BYTES_MARKER in path.replace(os.sep, "/"):
+        csv_path = _binary_table_csv_path(path)
+        if write_binary_table_csv(data, game_version, csv_path):
+            return csv_path
+
+    path, data = rewrite_text_asset(path, data, game_version)
+    # path can change a bit
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
@@ -0,0 +1,103 @@
+import contextlib
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from PIL import Image
+from UnityPy.classes import Texture2D
+
+
+class ImageDedupe:
+    """Encoded image outputs by content, so an image that was already encoded
+    (another sprite cut from the same region, a texture duplicated under other
+    names or in other bundles) is hardlinked instead of encoded again.
+
+    Outputs are keyed by a digest of the decoded pixels, and for textures also
+    of their encoded data, which allows linking without decoding at all. Only
+    finished files are registered, links too, and a path that is written again
+    stops standing for its old content. Safe to share between threads.
+    """
+
+    def __init__(self, max_entries: int = 100_000):
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+        # key -> {output suffix: paths with that content}
+        self._outputs: "OrderedDict[str, Dict[str, List[str]]]" = OrderedDict()
+        # path -> the keys it is registered under
+        self._owners: Dict[str, List[str]] = {}
+
+    @staticmethod
+    def pixel_key(img: Image.Image) -> str:
+        h = hashlib.sha1(f"{img.mode}:{img.width}x{img.height}:".encode())
+        h.update(img.tobytes())
+        return "px:" + h.hexdigest()
+
+    @staticmethod
+    def texture_key(texture: Texture2D) -> str:
+        h = hashlib.sha1(
+            f"{texture.m_TextureFormat}:{texture.m_Width}x{texture.m_Height}:".encode()
+        )
+        h.update(texture.get_image_data())
+        return "tex:" + h.hexdigest()
+
+    def lookup(self, key: str, suffix: str) -> Optional[str]:
+        with self._lock:
+            outputs = self._outputs.get(key)
+            paths = list(outputs.get(suffix, ())) if outputs is not None else []
+        for path in paths:
+            if os.path.exists(path):
+                return path
+        return None
+
+    def add(self, keys: Iterable[Optional[str]], suffix: str, path: str):
+        """Register ``path``, just written or linked, as the ``suffix`` output
+        of content known by any of ``keys`` (None entries are ignored)."""
+        with self._lock:
+            # Whatever the path held before is gone.
+            for old_key in self._owners.pop(path, ()):
+                outputs = self._outputs.get(old_key)
+                if outputs is not None and path in outputs.get(suffix, ()):
+                    outputs[suffix].remove(path)
+
+            owners = []
+            for key in keys:
+                if key is None:
+                    continue
+                self._outputs.setdefault(key, {}).setdefault(suffix, []).append(path)
+                self._outputs.move_to_end(key)
+                owners.append(key)
+            self._owners[path] = owners
+
+            while len(self._outputs) > self._max_entries:
+                evicted_key, evicted = self._outputs.popitem(last=False)
+                for paths in evicted.values():
+                    for old in paths:
+                        owners = self._owners.get(old)
+                        if owners is not None and evicted_key in owners:
+                            owners.remove(evicted_key)
+                            if not owners:
+                                del self._owners[old]
+
+    def add_link(self, existing: str, suffix: str, path: str):
+        """Register ``path``, just linked from ``existing``, under the same
+        keys, so it still stands for them should ``existing`` be rewritten."""
+        with self._lock:
+            keys = list(self._owners.get(existing, ()))
+        self.add(keys, suffix, path)
+
+
+def remove_existing(path: str):
+    # Outputs may be hardlinks; writing through one would change every copy.
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)
+
+
+def link_or_copy(src: str, dst: str):
+    remove_existing(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
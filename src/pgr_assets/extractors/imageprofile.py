@@ -0,0 +1,192 @@
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from pgr_assets.asset_paths import ROLECHARACTER_IMAGE_MARKER
+
+from .imagededupe import ImageDedupe, link_or_copy, remove_existing
+
+# Pillow save options a profile may set, per output.
+_SAVE_OPTIONS = ("quality", "lossless", "method", "compress_level", "optimize")
+
+
+@dataclass(frozen=True)
+class ImageOutput:
+    """One file written for every extracted image."""
+
+    format: str  # Pillow format name, e.g. "png" or "webp"
+    suffix: str  # replaces the image's extension, e.g. ".webp" or ".256.webp"
+    options: Dict[str, Any] = field(default_factory=dict)  # passed to Image.save
+    thumbnail: Optional[int] = None  # bound on width and height, if downscaled
+    # Only written for images whose path contains one of these (all if empty).
+    paths: Tuple[str, ...] = ()
+
+    def applies_to(self, dest: str) -> bool:
+        if not self.paths:
+            return True
+        dest = dest.replace(os.sep, "/")
+        return any(marker in dest for marker in self.paths)
+
+
+@dataclass(frozen=True)
+class ImageProfile:
+    name: str
+    outputs: Tuple[ImageOutput, ...]
+
+    def save(
+        self,
+        img: Image.Image,
+        dest: str,
+        dedupe: Optional[ImageDedupe] = None,
+        alias: Optional[str] = None,
+    ) -> List[str]:
+        """Write every output of ``img`` for ``dest`` (whose extension is
+        replaced) and return the paths written.
+
+        With ``dedupe``, outputs already encoded from identical pixels are
+        linked instead, and the new ones are registered (under ``alias`` too,
+        if given, see :meth:`link_existing`).
+        """
+        base, _ = os.path.splitext(dest)
+        key = dedupe.pixel_key(img) if dedupe is not None else ""
+        files = []
+        thumbnails: Dict[int, Image.Image] = {}
+        for output in self.outputs:
+            if not output.applies_to(base):
+                continue
+            path = base + output.suffix
+            files.append(path)
+            if dedupe is not None:
+                existing = dedupe.lookup(key, output.suffix)
+                if existing is not None:
+                    if existing != path:
+                        link_or_copy(existing, path)
+                        dedupe.add_link(existing, output.suffix, path)
+                    continue
+
+            image = img
+            if output.thumbnail is not None:
+                image = thumbnails.get(output.thumbnail)
+                if image is None:
+                    image = img.copy()
+                    image.thumbnail((output.thumbnail, output.thumbnail))
+                    thumbnails[output.thumbnail] = image
+            remove_existing(path)
+            image.save(path, format=output.format, **output.options)
+            if dedupe is not None:
+                dedupe.add((key, alias), output.suffix, path)
+        return files
+
+    def link_existing(
+        self, key: str, dest: str, dedupe: ImageDedupe
+    ) -> List[str] | None:
+        """Link every output for ``dest`` from outputs registered under
+        ``key``, without needing the image. None (and nothing is linked) unless
+        all of them are available."""
+        base, _ = os.path.splitext(dest)
+        links = []
+        for output in self.outputs:
+            if output.applies_to(base):
+                existing = dedupe.lookup(key, output.suffix)
+                if existing is None:
+                    return None
+                links.append((existing, output.suffix, base + output.suffix))
+        for existing, suffix, path in links:
+            if existing != path:
+                link_or_copy(existing, path)
+                dedupe.add_link(existing, suffix, path)
+        return [path for _, _, path in links]
+
+    def describe(self) -> Dict[str, Any]:
+        """The outputs as JSON data (lists, not tuples), e.g. for recording
+        what produced a file."""
+        return json.loads(json.dumps({"outputs": asdict(self)["outputs"]}))
+
+
+_ROLECHARACTER_THUMBNAIL = ImageOutput(
+    "webp",
+    ".256.webp",
+    {"lossless": False, "quality": 80},
+    thumbnail=256,
+    paths=(ROLECHARACTER_IMAGE_MARKER,),
+)
+
+BUILTIN_PROFILES = {
+    # PNG plus a lossy WebP of every image, and 256px role character thumbnails.
+    "default": ImageProfile(
+        "default",
+        (
+            ImageOutput("png", ".png"),
+            ImageOutput("webp", ".webp", {"lossless": False, "quality": 80}),
+            _ROLECHARACTER_THUMBNAIL,
+        ),
+    ),
+    # The same without the PNGs, which are the slowest encode by far.
+    "webp": ImageProfile(
+        "webp",
+        (
+            ImageOutput("webp", ".webp", {"lossless": False, "quality": 80}),
+            _ROLECHARACTER_THUMBNAIL,
+        ),
+    ),
+    "png": ImageProfile("png", (ImageOutput("png", ".png"),)),
+}
+
+DEFAULT_IMAGE_PROFILE = BUILTIN_PROFILES["default"]
+
+
+def _parse_output(entry: Any) -> ImageOutput:
+    if not isinstance(entry, dict) or not isinstance(entry.get("format"), str):
+        raise ValueError(f"Image output needs a format: {entry!r}")
+    entry = dict(entry)
+    fmt = entry.pop("format").lower()
+    thumbnail = entry.pop("thumbnail", None)
+    if thumbnail is not None and (not isinstance(thumbnail, int) or thumbnail <= 0):
+        raise ValueError(f"Invalid thumbnail size {thumbnail!r}")
+    default_suffix = f".{thumbnail}.{fmt}" if thumbnail else f".{fmt}"
+    suffix = entry.pop("suffix", default_suffix)
+    paths = entry.pop("paths", [])
+    if not isinstance(paths, list) or not all(isinstance(p, str) for p in paths):
+        raise ValueError(f"Image output paths must be a list of strings: {paths!r}")
+
+    unknown = set(entry) - set(_SAVE_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown image output options: {', '.join(sorted(unknown))}")
+    return ImageOutput(fmt, suffix, entry, thumbnail, tuple(paths))
+
+
+def load_image_profile(name: str) -> ImageProfile:
+    """A built-in profile by name, or one read from a JSON file of the form::
+
+        {"outputs": [
+            {"format": "webp", "quality": 90, "method": 6},
+            {"format": "webp", "quality": 75, "thumbnail": 512,
+             "paths": ["/image/rolecharacter/"]}
+        ]}
+
+    Each output takes a Pillow ``format`` and optionally ``quality``,
+    ``lossless``, ``method`` (WebP effort), ``compress_level`` (PNG),
+    ``optimize``, a ``thumbnail`` size, the ``paths`` it is limited to and the
+    ``suffix`` replacing the image's extension (default ``.<format>``, or
+    ``.<size>.<format>`` for thumbnails).
+    """
+    if name in BUILTIN_PROFILES:
+        return BUILTIN_PROFILES[name]
+    if not os.path.isfile(name):
+        raise ValueError(
+            f"Unknown image profile {name} (not one of "
+            f"{', '.join(BUILTIN_PROFILES)} nor a profile file)"
+        )
+
+    with open(name, "r") as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or not isinstance(data.get("outputs"), list):
+        raise ValueError(f"{name}: an image profile needs a list of outputs")
+    outputs = tuple(_parse_output(entry) for entry in data["outputs"])
+    suffixes = [output.suffix for output in outputs]
+    if len(set(suffixes)) != len(suffixes):
+        raise ValueError(f"{name}: image outputs must have distinct suffixes")
+    return ImageProfile(os.path.basename(name), outputs)
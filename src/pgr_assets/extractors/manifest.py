@@ -0,0 +1,146 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Dict, List, cast
+
+from UnityPy.classes import Sprite, Texture2D
+from UnityPy.enums import ClassIDType
+from UnityPy.files import ObjectReader
+from UnityPy.helpers.ResourceReader import get_resource_data
+
+logger = logging.getLogger("pgr-assets.extractors.manifest")
+
+# Bumped whenever what is hashed, or what the extractors write for an object,
+# changes, so manifests of older runs are ignored.
+_FORMAT = 1
+
+
+class BundleManifest:
+    """What the previous extraction of one bundle produced: for every container
+    path, a digest of the object's raw data and the files written for it.
+
+    :func:`extract_bundle` skips objects whose digest is unchanged and whose
+    files are all still there, so a bundle that changed in a single texture only
+    re-encodes that texture. Outcomes also depend on the extraction settings;
+    a manifest written with different ``settings`` is ignored.
+    """
+
+    path: str
+    output_dir: str
+
+    def __init__(self, path: str, output_dir: str, settings: Dict[str, Any]):
+        self.path = path
+        self.output_dir = output_dir
+        self.settings = settings
+        self._previous = self._load()
+        self._objects: Dict[str, Dict[str, Any]] = {}
+        # Digests of textures, which sprites of the same bundle share.
+        self._textures: Dict[int, str] = {}
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {self.path}: {e}")
+            return {}
+        if (
+            not isinstance(data, dict)
+            or data.get("format") != _FORMAT
+            or data.get("settings") != self.settings
+        ):
+            return {}
+        return data.get("objects", {})
+
+    def digest(self, obj: ObjectReader) -> str:
+        """Digest of everything the output of ``obj`` is derived from."""
+        if obj.type == ClassIDType.Texture2D:
+            return self._texture_digest(obj)
+
+        h = hashlib.sha1(obj.get_raw_data())
+        if obj.type == ClassIDType.Sprite:
+            # A sprite is cut from a texture (via an atlas when packed): hash
+            # the textures it can be cut from along with it.
+            sprite = cast(Sprite, obj.read())
+            if sprite.m_SpriteAtlas or sprite.m_AtlasTags:
+                textures = [
+                    o
+                    for o in obj.assets_file.objects.values()
+                    if o.type == ClassIDType.Texture2D
+                ]
+            else:
+                textures = [
+                    pptr.deref()
+                    for pptr in (sprite.m_RD.texture, sprite.m_RD.alphaTexture)
+                    if pptr is not None and pptr.path_id != 0
+                ]
+            for texture in textures:
+                h.update(self._texture_digest(texture).encode())
+        return h.hexdigest()
+
+    def _texture_digest(self, obj: ObjectReader) -> str:
+        digest = self._textures.get(obj.path_id)
+        if digest is None:
+            h = hashlib.sha1(obj.get_raw_data())
+            # Pixels usually live in the bundle's .resS, outside the object.
+            stream = cast(Texture2D, obj.read()).m_StreamData
+            if stream is not None and stream.path and stream.size:
+                h.update(
+                    get_resource_data(
+                        stream.path, obj.assets_file, stream.offset, stream.size
+                    )
+                )
+            digest = self._textures[obj.path_id] = h.hexdigest()
+        return digest
+
+    def unchanged(self, path: str, digest: str) -> bool:
+        """True (and the previous entry is kept) when ``path`` was extracted
+        from identical data before and its files still exist."""
+        entry = self._previous.get(path)
+        if entry is None or entry.get("digest") != digest:
+            return False
+        if not all(
+            os.path.exists(os.path.join(self.output_dir, file))
+            for file in entry.get("files", ())
+        ):
+            return False
+        self._objects[path] = entry
+        return True
+
+    def record(self, path: str, digest: str, files: List[str]):
+        self._objects[path] = {
+            "digest": digest,
+            "files": [os.path.relpath(file, self.output_dir) for file in files],
+        }
+
+    def save(self):
+        """Write the manifest of this extraction. Objects that failed (or are no
+        longer in the bundle) are left out, so the next run retries them."""
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(
+                    {
+                        "format": _FORMAT,
+                        "settings": self.settings,
+                        "objects": self._objects,
+                    },
+                    f,
+                )
+            os.replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+
+
+def manifest_path(manifest_dir: str, bundle: str) -> str:
+    return os.path.join(manifest_dir, *bundle.split("/")) + ".json"
@@ -1,10 +1,14 @@
 import logging
 
 from .source import Source
+from .blobcache import BlobCache
+from .indexcache import IndexCache
 from .exceptions import (
     SourceError,
     BlobNotFoundException,
     BlobDownloadError,
+    BlobIntegrityError,
+    BlobRangeError,
     SourceIndexError,
     UnknownSourceError,
 )
@@ -17,9 +21,13 @@ logger = logging.getLogger("pgr-assets.sources")
 
 __all__ = [
     "Source",
+    "BlobCache",
+    "IndexCache",
     "SourceError",
     "BlobNotFoundException",
     "BlobDownloadError",
+    "BlobIntegrityError",
+    "BlobRangeError",
     "SourceIndexError",
     "UnknownSourceError",
     "PcStarterSource",
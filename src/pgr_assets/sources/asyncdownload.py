@@ -0,0 +1,346 @@
+import asyncio
+import base64
+import logging
+import socket
+import ssl
+import urllib.request
+from typing import BinaryIO, Dict, List, Tuple
+from urllib.parse import SplitResult, unquote, urljoin, urlsplit
+
+from .download import CHUNK_SIZE, resume_skip
+from .exceptions import BlobDownloadError
+
+logger = logging.getLogger("pgr-assets.sources.asyncdownload")
+
+# Mirrors the requests session in session.py: connect/read timeouts, and a few
+# retries with backoff on transient 5xx answers from the CDN.
+_CONNECT_TIMEOUT = 10
+_READ_TIMEOUT = 60
+_RETRY_STATUSES = frozenset((500, 502, 503, 504))
+_RETRIES = 3
+_RETRY_BACKOFF = 0.5
+_MAX_REDIRECTS = 5
+_REDIRECT_STATUSES = frozenset((301, 302, 303, 307, 308))
+
+# Errors that cut a transfer short; like download.RESUMABLE_ERRORS, these are
+# resumed with a Range request rather than failing the download.
+ASYNC_RESUMABLE_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    asyncio.IncompleteReadError,
+    ssl.SSLError,
+    socket.gaierror,
+)
+
+_Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+def _proxy_authorization(proxy: SplitResult) -> str | None:
+    if proxy.username is None:
+        return None
+    credentials = f"{unquote(proxy.username)}:{unquote(proxy.password or '')}"
+    return "Basic " + base64.b64encode(credentials.encode()).decode("ascii")
+
+
+async def _read_head(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str]]:
+    """Read a response's status line and headers."""
+    async with asyncio.timeout(_READ_TIMEOUT):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed before response")
+        status = int(status_line.split(None, 2)[1])
+
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionResetError("Connection closed in headers")
+            if line in (b"\r\n", b"\n"):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+    return status, headers
+
+
+class _HostPool:
+    """Keep-alive connections to one (scheme, host, port), at most ``limit`` of
+    them busy at a time. With a ``proxy``, connections go through it: https
+    is tunnelled with CONNECT, and http requests are sent to the proxy."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        ssl_context: ssl.SSLContext | None,
+        limit: int,
+        proxy: SplitResult | None = None,
+    ):
+        self.host = host
+        self.port = port
+        self.proxy = proxy
+        self.proxy_authorization = _proxy_authorization(proxy) if proxy else None
+        self._ssl = ssl_context
+        self._slots = asyncio.Semaphore(limit)
+        self._idle: List[_Connection] = []
+
+    async def acquire(self) -> Tuple[_Connection, bool]:
+        """Wait for a free slot and return a connection, plus whether it is a
+        reused keep-alive one (which the server may have closed meanwhile)."""
+        await self._slots.acquire()
+        try:
+            while self._idle:
+                reader, writer = self._idle.pop()
+                if not reader.at_eof() and not writer.is_closing():
+                    return (reader, writer), True
+                writer.close()
+            async with asyncio.timeout(_CONNECT_TIMEOUT):
+                conn = await self._connect()
+            return conn, False
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def _connect(self) -> _Connection:
+        if self.proxy is None:
+            return await asyncio.open_connection(
+                self.host,
+                self.port,
+                ssl=self._ssl,
+                server_hostname=self.host if self._ssl else None,
+            )
+
+        assert self.proxy.hostname is not None
+        reader, writer = await asyncio.open_connection(
+            self.proxy.hostname, self.proxy.port or 80
+        )
+        if self._ssl is None:
+            return reader, writer
+        try:
+            lines = [
+                f"CONNECT {self.host}:{self.port} HTTP/1.1",
+                f"Host: {self.host}:{self.port}",
+            ]
+            if self.proxy_authorization is not None:
+                lines.append(f"Proxy-Authorization: {self.proxy_authorization}")
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+            await writer.drain()
+            status, _ = await _read_head(reader)
+            if status != 200:
+                raise BlobDownloadError(
+                    f"Proxy {self.proxy.hostname} refused to tunnel to "
+                    f"{self.host}:{self.port} - {status}"
+                )
+            await writer.start_tls(self._ssl, server_hostname=self.host)
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+
+    def release(self, conn: _Connection, reusable: bool):
+        if reusable:
+            self._idle.append(conn)
+        else:
+            conn[1].close()
+        self._slots.release()
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+class AsyncHttpClient:
+    """Minimal HTTP/1.1 GET client on asyncio streams, for bulk blob downloads.
+
+    A coroutine per download costs far less than a thread, so the number of
+    requests in flight is bounded only by the caller; the client itself caps
+    the connections to each host at ``per_host`` and reuses them (keep-alive).
+    Bodies are streamed to the given file in :data:`CHUNK_SIZE` pieces, never
+    held in memory.
+
+    Only what the CDNs need is supported: plain GETs, ``Content-Length`` and
+    chunked bodies, redirects, and ``Range`` resumption. Like the requests
+    session, it goes through the ``HTTP(S)_PROXY`` proxies except for the
+    ``NO_PROXY`` hosts (``proxies`` overrides what is read from the
+    environment); only plain http:// proxies are supported.
+    """
+
+    per_host: int
+
+    def __init__(self, per_host: int = 32, proxies: Dict[str, str] | None = None):
+        self.per_host = per_host
+        self._pools: Dict[Tuple[str, str, int], _HostPool] = {}
+        self._ssl = ssl.create_default_context()
+        self._proxies = urllib.request.getproxies() if proxies is None else proxies
+
+    def _proxy(self, scheme: str, host: str) -> SplitResult | None:
+        url = self._proxies.get(scheme) or self._proxies.get("all")
+        if not url or urllib.request.proxy_bypass_environment(host, self._proxies):
+            return None
+        proxy = urlsplit(url if "://" in url else "http://" + url)
+        if proxy.scheme != "http" or not proxy.hostname:
+            raise BlobDownloadError(
+                f"Unsupported proxy {url} for the async engine (only http:// "
+                "proxies are), use --engine threads"
+            )
+        return proxy
+
+    def _pool(self, scheme: str, host: str, port: int) -> _HostPool:
+        key = (scheme, host, port)
+        pool = self._pools.get(key)
+        if pool is None:
+            ssl_context = self._ssl if scheme == "https" else None
+            proxy = self._proxy(scheme, host)
+            pool = _HostPool(host, port, ssl_context, self.per_host, proxy)
+            self._pools[key] = pool
+        return pool
+
+    async def download(self, url: str, out: BinaryIO, what: str, offset: int = 0):
+        """Stream the body of ``url`` into ``out``; the async counterpart of
+        :func:`copy_response`, including resuming at ``offset``."""
+        redirects = 0
+        retries = 0
+        while True:
+            parts = urlsplit(url)
+            if parts.scheme not in ("http", "https") or not parts.hostname:
+                raise BlobDownloadError(f"Failed to download {what} - bad url {url}")
+            port = parts.port or (443 if parts.scheme == "https" else 80)
+            pool = self._pool(parts.scheme, parts.hostname, port)
+            path = parts.path or "/"
+            if parts.query:
+                path += "?" + parts.query
+            host = parts.netloc.rpartition("@")[2]
+            proxy_authorization = None
+            if pool.proxy is not None and parts.scheme == "http":
+                # A plain http request to a proxy names the whole URL.
+                path = f"http://{host}{path}"
+                proxy_authorization = pool.proxy_authorization
+
+            conn, reused = await pool.acquire()
+            reusable = False
+            delay = 0.0
+            try:
+                try:
+                    status, headers = await self._send(
+                        conn, host, path, offset, proxy_authorization
+                    )
+                except ASYNC_RESUMABLE_ERRORS:
+                    if not reused:
+                        raise
+                    # The server closed an idle keep-alive connection; that's
+                    # not a failed transfer, just retry on a fresh connection.
+                    continue
+
+                if status in _REDIRECT_STATUSES and "location" in headers:
+                    redirects += 1
+                    if redirects > _MAX_REDIRECTS:
+                        raise BlobDownloadError(
+                            f"Failed to download {what} - too many redirects"
+                        )
+                    url = urljoin(url, headers["location"])
+                    continue
+                if status in _RETRY_STATUSES and retries < _RETRIES:
+                    delay = _RETRY_BACKOFF * 2**retries
+                    retries += 1
+                    logger.debug(f"Got {status} for {what}, retrying in {delay}s")
+                else:
+                    skip = resume_skip(
+                        status, headers.get("content-range", ""), offset, what
+                    )
+                    reusable = await self._read_body(conn[0], headers, out, skip)
+                    return
+            finally:
+                pool.release(conn, reusable)
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    async def _send(
+        conn: _Connection,
+        host: str,
+        path: str,
+        offset: int,
+        proxy_authorization: str | None = None,
+    ) -> Tuple[int, Dict[str, str]]:
+        reader, writer = conn
+        lines = [
+            f"GET {path} HTTP/1.1",
+            f"Host: {host}",
+            "User-Agent: pgr-assets",
+            "Accept-Encoding: identity",
+            "Connection: keep-alive",
+        ]
+        if offset:
+            lines.append(f"Range: bytes={offset}-")
+        if proxy_authorization is not None:
+            lines.append(f"Proxy-Authorization: {proxy_authorization}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+        async with asyncio.timeout(_READ_TIMEOUT):
+            await writer.drain()
+        return await _read_head(reader)
+
+    @staticmethod
+    async def _read_body(
+        reader: asyncio.StreamReader, headers: Dict[str, str], out: BinaryIO, skip: int
+    ) -> bool:
+        """Copy the response body into ``out``, dropping the first ``skip``
+        bytes. Returns whether the connection can be reused afterwards."""
+
+        def write(chunk: bytes):
+            nonlocal skip
+            if skip:
+                if len(chunk) <= skip:
+                    skip -= len(chunk)
+                    return
+                chunk = chunk[skip:]
+                skip = 0
+            # A buffered write of at most one chunk; it lands in the page cache,
+            # so doing it on the event loop is cheaper than a thread hop.
+            out.write(chunk)
+
+        async def copy(remaining: int):
+            while remaining:
+                async with asyncio.timeout(_READ_TIMEOUT):
+                    chunk = await reader.read(min(remaining, CHUNK_SIZE))
+                if not chunk:
+                    raise asyncio.IncompleteReadError(b"", remaining)
+                write(chunk)
+                remaining -= len(chunk)
+
+        keep_alive = headers.get("connection", "").lower() != "close"
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            while True:
+                async with asyncio.timeout(_READ_TIMEOUT):
+                    size_line = await reader.readline()
+                if not size_line:
+                    raise asyncio.IncompleteReadError(b"", None)
+                size = int(size_line.split(b";", 1)[0], 16)
+                if size == 0:
+                    break
+                await copy(size)
+                async with asyncio.timeout(_READ_TIMEOUT):
+                    await reader.readexactly(2)
+            # Trailers, up to the terminating blank line.
+            async with asyncio.timeout(_READ_TIMEOUT):
+                while (line := await reader.readline()) not in (b"\r\n", b"\n"):
+                    if not line:
+                        raise asyncio.IncompleteReadError(b"", None)
+            return keep_alive
+
+        if "content-length" in headers:
+            await copy(int(headers["content-length"]))
+            return keep_alive
+
+        # No framing: the body runs until the server closes the connection.
+        while True:
+            async with asyncio.timeout(_READ_TIMEOUT):
+                chunk = await reader.read(CHUNK_SIZE)
+            if not chunk:
+                return False
+            write(chunk)
+
+    def close(self):
+        for pool in self._pools.values():
+            pool.close()
+        self._pools.clear()
@@ -0,0 +1,207 @@
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from typing import BinaryIO, Tuple, cast
+
+from .download import is_sha1
+
+logger = logging.getLogger("pgr-assets.sources.blobcache")
+
+# A process prunes the cache itself after writing this fraction of the budget,
+# so a long run can't overshoot the limit by more than a few blobs per worker.
+_PRUNE_INTERVAL = 1 / 16
+# Pruning evicts down to this fraction of the budget, so a full cache doesn't
+# rescan the whole directory on every subsequent write.
+_LOW_WATER_MARK = 0.9
+# Temp files (and parked partial downloads) older than this are abandoned.
+_STALE_TEMP_SECONDS = 24 * 60 * 60
+
+
+class BlobCache:
+    """On-disk, content-addressed store of downloaded blobs keyed by index sha1.
+
+    Blobs live at ``<root>/<sha1[:2]>/<sha1>``. Writes go to a private temp file
+    that is atomically renamed into place, and a sha1 always names the same
+    bytes, so any number of processes can read, write and evict concurrently
+    without locking: the worst outcome of a race is a redundant download.
+
+    Eviction is least-recently-used by mtime, which :meth:`get` refreshes on
+    every hit (atime is unreliable on ``noatime``/``relatime`` mounts).
+    """
+
+    root: str
+    max_size: int
+
+    def __init__(self, root: str, max_size: int):
+        self.root = root
+        self.max_size = max_size
+        self._written = 0
+
+    def path(self, sha1: str) -> str:
+        return os.path.join(self.root, sha1[:2], sha1)
+
+    def open(self, sha1: str) -> BinaryIO | None:
+        """Open the cached blob for ``sha1`` for reading, or None on a miss."""
+        if not is_sha1(sha1):
+            return None
+        path = self.path(sha1)
+        try:
+            f = open(path, "rb")  # noqa: SIM115 - the caller owns and closes it
+        except FileNotFoundError:
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # evicted by another process in the meantime; our handle stays valid
+        return f
+
+    def get(self, sha1: str) -> bytes | None:
+        """Return the cached blob for ``sha1``, or None on a miss."""
+        f = self.open(sha1)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def partial_path(self, sha1: str) -> str:
+        return self.path(sha1) + ".part"
+
+    def create_temp(self, sha1: str) -> Tuple[BinaryIO, str]:
+        """Create a private temp file next to ``sha1``'s final location.
+
+        If an interrupted download of ``sha1`` was parked (see :meth:`park`),
+        it is adopted as the temp file so the download can resume where it
+        left off. Adoption is an atomic rename, so when several processes race
+        for the same partial exactly one gets it and the rest start afresh.
+
+        Returns the open (read/write) file, positioned at its end, and its path,
+        to be handed to :meth:`commit` once the content has been verified, or
+        to :meth:`park` / :meth:`discard`.
+        """
+        path = self.path(sha1)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(
+            dir=os.path.dirname(path), prefix=f".{sha1}.", suffix=".tmp"
+        )
+        os.close(fd)
+        try:
+            os.replace(self.partial_path(sha1), tmp)
+        except FileNotFoundError:
+            pass
+
+        f = open(tmp, "r+b")  # noqa: SIM115 - handed on to commit/park/discard
+        f.seek(0, os.SEEK_END)
+        return cast(BinaryIO, f), tmp
+
+    def commit(self, sha1: str, f: BinaryIO, tmp: str) -> BinaryIO:
+        """Atomically publish a verified temp file as ``sha1``'s blob.
+
+        Returns ``f`` rewound to the start, ready to be read back.
+        """
+        f.flush()
+        size = f.tell()
+        os.replace(tmp, self.path(sha1))
+        f.seek(0)
+
+        self._written += size
+        if self._written >= self.max_size * _PRUNE_INTERVAL:
+            self.prune()
+        return f
+
+    def park(self, sha1: str, f: BinaryIO, tmp: str):
+        """Keep an interrupted download around for a later :meth:`create_temp`
+        to resume, instead of throwing the transferred bytes away."""
+        f.close()
+        if os.path.getsize(tmp) == 0:
+            _unlink_quietly(tmp)
+            return
+        os.replace(tmp, self.partial_path(sha1))
+
+    @staticmethod
+    def discard(f: BinaryIO, tmp: str):
+        f.close()
+        _unlink_quietly(tmp)
+
+    def put(self, sha1: str, data: bytes) -> bool:
+        """Store ``data`` under ``sha1``. Data that doesn't hash to ``sha1`` is
+        rejected (and not stored), so a bad transfer can't poison the cache."""
+        if not is_sha1(sha1):
+            return False
+        sha1 = sha1.lower()
+        if hashlib.sha1(data).hexdigest() != sha1:
+            logger.warning(f"Not caching blob: content does not match sha1 {sha1}")
+            return False
+
+        f, tmp = self.create_temp(sha1)
+        try:
+            f.write(data)
+            self.commit(sha1, f, tmp).close()
+        except BaseException:
+            self.discard(f, tmp)
+            raise
+        return True
+
+    def remove(self, sha1: str):
+        """Drop ``sha1``'s blob, e.g. once a run-scoped cache is done with it."""
+        if is_sha1(sha1):
+            _unlink_quietly(self.path(sha1))
+
+    def prune(self) -> int:
+        """Evict least recently used blobs until the cache fits its budget.
+
+        Returns the number of blobs removed. Safe to run from several processes
+        at once; files that vanish mid-scan are simply skipped.
+        """
+        self._written = 0
+        entries: list[tuple[float, int, str]] = []
+        total = 0
+        now = time.time()
+
+        try:
+            shards = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return 0
+
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.name.endswith((".tmp", ".part")):
+                    if now - st.st_mtime > _STALE_TEMP_SECONDS:
+                        _unlink_quietly(entry.path)
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+
+        if total <= self.max_size:
+            return 0
+
+        entries.sort()
+        target = self.max_size * _LOW_WATER_MARK
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            _unlink_quietly(path)
+            total -= size
+            removed += 1
+
+        logger.debug(f"Evicted {removed} blobs from {self.root}")
+        return removed
+
+    def __str__(self):
+        return f"BlobCache({self.root})"
+
+
+def _unlink_quietly(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
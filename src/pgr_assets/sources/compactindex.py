@@ -0,0 +1,291 @@
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+from collections.abc import ItemsView, ValuesView
+from typing import Any, Iterator, Mapping, Tuple, cast
+
+from .download import is_sha1
+from .exceptions import SourceIndexError
+
+IndexEntry = Tuple[str, str | None, int | None]
+
+_MAGIC = b"PGRI"
+_VERSION = 1
+# magic, version, entry count, prefix count, hash table slots
+_HEADER = struct.Struct("<4sIIII")
+# heap offset, length
+_PREFIX = struct.Struct("<II")
+# prefix id, name offset, name length, blob offset, blob length, flags, size, sha1
+_RECORD = struct.Struct("<IIIIIIq20s")
+
+# How a record's sha1 field is to be read.
+_SHA1_BINARY = 0  # the 20 raw digest bytes of a lowercase hex sha1
+_SHA1_NONE = 1  # the index has no sha1 for the bundle
+_SHA1_HEAP = 2  # anything else, verbatim in the heap (offset, length packed in)
+_HEAP_REF = struct.Struct("<II")
+
+# Hash table slot: 1 + the index of a record, 0 for an empty slot. The table is
+# open-addressed on crc32 of the bundle name, which unlike hash() is the same
+# in every process, so a buffer can be built once and shared.
+_SLOT = struct.Struct("<I")
+
+
+class CompactIndex(Mapping[str, IndexEntry]):
+    """Read-only ``bundle -> (blob, sha1, size)`` mapping packed into a single
+    contiguous buffer.
+
+    An index holds tens of thousands of bundles; as a dict of tuples of
+    strings that's hundreds of bytes per entry, and every worker process that
+    receives it pays for unpickling all of those objects. Here each entry is
+    one fixed-size record: bundle directories are interned in a prefix table,
+    names live in a shared string heap, and the sha1 is kept as its 20 raw
+    bytes. Records are sorted by bundle name (for ordered iteration) and found
+    through a hash table of record numbers, and pickling (or caching, see
+    :attr:`buffer`) copies a single bytes object.
+
+    Buffer layout: header, prefix table, records, hash table, string heap.
+    """
+
+    __slots__ = (
+        "_buf",
+        "_shared_path",
+        "_owns_shared",
+        "_view",
+        "_count",
+        "_records_at",
+        "_table_at",
+        "_mask",
+        "_heap_at",
+        "_prefixes",
+    )
+
+    def __init__(self, buf: bytes | memoryview):
+        try:
+            magic, version, count, prefix_count, slots = _HEADER.unpack_from(buf)
+        except struct.error:
+            raise SourceIndexError("Compact index buffer is truncated") from None
+        if magic != _MAGIC or version != _VERSION:
+            raise SourceIndexError("Not a compact index buffer (or an old format)")
+
+        self._buf = buf
+        self._shared_path: str | None = None
+        self._owns_shared = False
+        self._view = memoryview(buf)
+        self._count = count
+        self._records_at = _HEADER.size + prefix_count * _PREFIX.size
+        self._table_at = self._records_at + count * _RECORD.size
+        self._mask = slots - 1
+        self._heap_at = self._table_at + slots * _SLOT.size
+        if len(buf) < self._heap_at:
+            raise SourceIndexError("Compact index buffer is truncated")
+        self._prefixes = [
+            bytes(
+                self._heap(*_PREFIX.unpack_from(buf, _HEADER.size + i * _PREFIX.size))
+            )
+            for i in range(prefix_count)
+        ]
+
+    @classmethod
+    def build(cls, index: Mapping[Any, Any]) -> "CompactIndex":
+        """Pack a parsed index (``bundle -> [blob, sha1, size]``, as loaded
+        from the msgpack index bundles)."""
+        heap = bytearray()
+        prefix_ids: dict[bytes, int] = {}
+        prefix_table: list[tuple[int, int]] = []
+        rows = []
+
+        def put(data: bytes) -> int:
+            offset = len(heap)
+            heap.extend(data)
+            return offset
+
+        for bundle, value in index.items():
+            try:
+                blob, sha1, size = value
+            except (TypeError, ValueError):
+                raise SourceIndexError(f"Malformed index entry for {bundle}") from None
+            if not isinstance(bundle, str) or not isinstance(blob, str):
+                raise SourceIndexError(f"Malformed index entry for {bundle}")
+
+            name = bundle.encode()
+            slash = name.rfind(b"/") + 1
+            prefix = name[:slash]
+            prefix_id = prefix_ids.get(prefix)
+            if prefix_id is None:
+                prefix_id = prefix_ids[prefix] = len(prefix_table)
+                prefix_table.append((put(prefix), len(prefix)))
+            rows.append((name, prefix_id, name[slash:], blob.encode(), sha1, size))
+
+        rows.sort(key=lambda row: row[0])
+
+        records = bytearray()
+        for _, prefix_id, name, blob, sha1, size in rows:
+            if sha1 is None:
+                flags, digest = _SHA1_NONE, b""
+            elif is_sha1(sha1) and sha1 == sha1.lower():
+                flags, digest = _SHA1_BINARY, bytes.fromhex(sha1)
+            else:
+                text = str(sha1).encode()
+                flags, digest = _SHA1_HEAP, _HEAP_REF.pack(put(text), len(text))
+            records += _RECORD.pack(
+                prefix_id,
+                put(name),
+                len(name),
+                put(blob),
+                len(blob),
+                flags,
+                -1 if size is None else size,
+                digest,
+            )
+
+        # At most half full, so probe sequences stay short.
+        slots = 1
+        while slots < 2 * len(rows):
+            slots *= 2
+        table = [0] * slots
+        for i, row in enumerate(rows):
+            slot = zlib.crc32(row[0]) & (slots - 1)
+            while table[slot]:
+                slot = (slot + 1) & (slots - 1)
+            table[slot] = i + 1
+
+        header = _HEADER.pack(_MAGIC, _VERSION, len(rows), len(prefix_table), slots)
+        prefixes = b"".join(_PREFIX.pack(*entry) for entry in prefix_table)
+        return cls(
+            b"".join(
+                (header, prefixes, records, struct.pack(f"<{slots}I", *table), heap)
+            )
+        )
+
+    @property
+    def buffer(self) -> bytes | memoryview:
+        """The packed representation; ``CompactIndex(buffer)`` restores it."""
+        return self._buf
+
+    def _heap(self, offset: int, length: int) -> memoryview:
+        start = self._heap_at + offset
+        return self._view[start : start + length]
+
+    def _record(self, i: int) -> tuple:
+        return _RECORD.unpack_from(self._buf, self._records_at + i * _RECORD.size)
+
+    def _name(self, i: int) -> bytes:
+        prefix_id, name_off, name_len = _RECORD.unpack_from(
+            self._buf, self._records_at + i * _RECORD.size
+        )[:3]
+        return self._prefixes[prefix_id] + self._heap(name_off, name_len)
+
+    def locate(self, bundle: object) -> int:
+        """The position of ``bundle`` in iteration (sorted) order, or -1."""
+        if not isinstance(bundle, str):
+            return -1
+        name = bundle.encode()
+        slot = zlib.crc32(name) & self._mask
+        while True:
+            (entry,) = _SLOT.unpack_from(self._buf, self._table_at + slot * 4)
+            if not entry:
+                return -1
+            if self._name(entry - 1) == name:
+                return entry - 1
+            slot = (slot + 1) & self._mask
+
+    def _entry(self, record: tuple) -> IndexEntry:
+        _, _, _, blob_off, blob_len, flags, size, digest = record
+        if flags == _SHA1_BINARY:
+            sha1 = digest.hex()
+        elif flags == _SHA1_HEAP:
+            sha1 = str(self._heap(*_HEAP_REF.unpack_from(digest)), "utf-8")
+        else:
+            sha1 = None
+        blob = str(self._heap(blob_off, blob_len), "utf-8")
+        return blob, sha1, None if size < 0 else size
+
+    def entry_at(self, i: int) -> IndexEntry:
+        """The entry at position ``i`` (see :meth:`locate`)."""
+        return self._entry(self._record(i))
+
+    def __getitem__(self, bundle: str) -> IndexEntry:
+        i = self.locate(bundle)
+        if i < 0:
+            raise KeyError(bundle)
+        return self._entry(self._record(i))
+
+    def __contains__(self, bundle: object) -> bool:
+        return self.locate(bundle) >= 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._count):
+            yield str(self._name(i), "utf-8")
+
+    def items(self) -> ItemsView[str, IndexEntry]:
+        return _CompactItems(self)
+
+    def values(self) -> ValuesView[IndexEntry]:
+        return _CompactValues(self)
+
+    def _iter_items(self) -> Iterator[Tuple[str, IndexEntry]]:
+        for i in range(self._count):
+            record = self._record(i)
+            name = self._prefixes[record[0]] + self._heap(record[1], record[2])
+            yield str(name, "utf-8"), self._entry(record)
+
+    def share(self):
+        """Publish the buffer as a file that other processes map read-only.
+
+        Until :meth:`unshare`, pickling the index (e.g. as part of the state
+        handed to worker processes) sends only the file's path: every worker
+        maps the same pages, so neither startup time nor memory grows with
+        the number of workers. The file is put on ``/dev/shm`` when available,
+        so it never touches a disk.
+        """
+        if self._shared_path is not None:
+            return
+        directory = "/dev/shm" if os.access("/dev/shm", os.W_OK) else None
+        fd, path = tempfile.mkstemp(prefix="pgr-index-", dir=directory)
+        with os.fdopen(fd, "wb") as f:
+            f.write(self._buf)
+        self._shared_path = path
+        self._owns_shared = True
+
+    def unshare(self):
+        """Remove the file published by :meth:`share`. Processes that already
+        mapped it keep working; later pickles copy the buffer again."""
+        path, owned = self._shared_path, self._owns_shared
+        self._shared_path, self._owns_shared = None, False
+        if path is not None and owned:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    @classmethod
+    def _attach(cls, path: str) -> "CompactIndex":
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        index = cls(memoryview(mapped))
+        index._shared_path = path
+        return index
+
+    def __reduce__(self):
+        if self._shared_path is not None:
+            return CompactIndex._attach, (self._shared_path,)
+        return CompactIndex, (bytes(self._buf),)
+
+    def __repr__(self):
+        return f"CompactIndex({self._count} bundles, {len(self._buf)} bytes)"
+
+
+class _CompactItems(ItemsView):
+    # Walk the records in order instead of one binary search per key.
+    def __iter__(self):
+        return cast(CompactIndex, self._mapping)._iter_items()
+
+
+class _CompactValues(ValuesView):
+    def __iter__(self):
+        return (entry for _, entry in cast(CompactIndex, self._mapping)._iter_items())
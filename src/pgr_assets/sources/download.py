@@ -0,0 +1,112 @@
+import hashlib
+import os
+import re
+from typing import BinaryIO, Dict
+
+import requests
+from requests import Response
+
+from .exceptions import BlobDownloadError, BlobRangeError
+
+# Size of the chunks pulled off the socket. Large enough to keep per-chunk
+# overhead negligible, small enough that a worker never holds much of a blob.
+CHUNK_SIZE = 1 << 20
+
+# Downloads without a blob cache are spooled in memory up to this size and
+# spill to an anonymous temp file beyond it, bounding per-worker RSS.
+SPOOL_MAX_SIZE = 16 << 20
+
+# Errors that cut a transfer short mid-body; these are resumed with a Range
+# request instead of failing (or restarting) the whole download.
+RESUMABLE_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.Timeout,
+)
+
+_SHA1_RE = re.compile(r"^[0-9a-fA-F]{40}$")
+
+
+def is_sha1(value: str | None) -> bool:
+    """True for a hex sha1 digest, the form index entries carry."""
+    return value is not None and _SHA1_RE.match(value) is not None
+
+
+class HashingWriter:
+    """Write-only file wrapper that sha1-hashes everything passing through it,
+    so a blob is verified on the fly instead of re-read after the download."""
+
+    def __init__(self, out: BinaryIO):
+        self.out = out
+        self.sha1 = hashlib.sha1()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.sha1.update(data)
+        self.size += len(data)
+        return self.out.write(data)
+
+    def hexdigest(self) -> str:
+        return self.sha1.hexdigest()
+
+    def absorb_existing(self) -> None:
+        """Account for data already in ``out`` (a resumed partial download):
+        hash it from the start, leaving ``out`` positioned at its end."""
+        self.out.seek(0)
+        while chunk := self.out.read(CHUNK_SIZE):
+            self.sha1.update(chunk)
+            self.size += len(chunk)
+        self.out.seek(0, os.SEEK_END)
+
+    def restart(self) -> None:
+        """Throw away everything written so far, to download from scratch."""
+        self.out.seek(0)
+        self.out.truncate()
+        self.sha1 = hashlib.sha1()
+        self.size = 0
+
+
+def range_headers(offset: int) -> Dict[str, str] | None:
+    return {"Range": f"bytes={offset}-"} if offset else None
+
+
+def resume_skip(status_code: int, content_range: str, offset: int, what: str) -> int:
+    """Check the status of a response to a GET resumed at ``offset`` (0 for a
+    plain GET), returning how many leading body bytes ``out`` already holds.
+
+    A server that ignores the ``Range`` header answers 200 with the full body,
+    in which case the first ``offset`` bytes are to be skipped over. One that
+    refuses it (416, e.g. when ``offset`` is past the end) or answers with
+    another range raises :class:`BlobRangeError`: the bytes held can't be
+    continued, and the download has to start over.
+    """
+    if offset and status_code == 416:
+        raise BlobRangeError(f"Failed to resume {what} at {offset} - {status_code}")
+    if offset and status_code == 206:
+        if not content_range.startswith(f"bytes {offset}-"):
+            raise BlobRangeError(
+                f"Failed to resume {what} at {offset} - got range {content_range!r}"
+            )
+        return 0
+    if status_code == 200:
+        return offset
+    raise BlobDownloadError(f"Failed to download {what} - {status_code}")
+
+
+def copy_response(resp: Response, out: BinaryIO, what: str, offset: int = 0) -> None:
+    """Stream a ``stream=True`` response body into ``out`` chunk by chunk.
+
+    ``offset`` is the start of the ``Range`` that was requested (see
+    :func:`resume_skip`).
+    """
+    skip = resume_skip(
+        resp.status_code, resp.headers.get("Content-Range", ""), offset, what
+    )
+    for chunk in resp.iter_content(CHUNK_SIZE):
+        if skip:
+            if len(chunk) <= skip:
+                skip -= len(chunk)
+                continue
+            chunk = chunk[skip:]
+            skip = 0
+        out.write(chunk)
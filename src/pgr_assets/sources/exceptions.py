@@ -18,6 +18,15 @@ class BlobDownloadError(SourceError):
     """A blob was located but could not be downloaded (e.g. non-200 response)."""
 
 
+class BlobIntegrityError(BlobDownloadError):
+    """A blob was downloaded but doesn't match its index sha1 (e.g. truncated)."""
+
+
+class BlobRangeError(BlobDownloadError):
+    """A resumed download's Range was refused (416) or answered with another
+    range, so the partial download can't be continued and must restart."""
+
+
 class SourceIndexError(SourceError):
     """A source's index/config bundle was missing or could not be parsed."""
 
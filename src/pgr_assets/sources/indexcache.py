@@ -0,0 +1,127 @@
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Any, Callable
+
+import msgpack
+import requests
+from requests import Response
+
+from .exceptions import BlobDownloadError
+from .session import get_session
+
+logger = logging.getLogger("pgr-assets.sources.indexcache")
+
+# Bumped whenever the shape of a cached entry (or of what the parsers return)
+# changes, so stale entries are simply refetched.
+_FORMAT = 2
+
+
+class IndexCache:
+    """On-disk cache of parsed index documents (index bundles, resource lists),
+    keyed by the URL they were downloaded from.
+
+    Each entry keeps the parsed data msgpack'd next to the response's ``ETag``
+    and ``Last-Modified`` validators. A lookup revalidates with a conditional
+    GET, so an unchanged index costs a 304 and a msgpack load instead of a
+    download, a UnityPy parse and a msgpack decode of the index bundle.
+    Documents served without validators are not cached.
+    """
+
+    root: str
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, url: str) -> str:
+        return os.path.join(self.root, hashlib.sha1(url.encode()).hexdigest())
+
+    def get(
+        self,
+        url: str,
+        parse: Callable[[bytes], Any],
+        request: Callable[..., Response] | None = None,
+    ) -> Any:
+        """Return ``parse(body)`` for ``url``, from the cache when the server
+        confirms the document is unchanged.
+
+        ``request`` performs the GET (defaulting to the shared session), for
+        sources that need to e.g. sign the URL; it must accept ``headers``.
+        """
+        if request is None:
+            request = get_session().get
+
+        entry = self._load(url)
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            resp = request(url, headers=headers)
+        except requests.exceptions.RequestException as e:
+            if entry is None:
+                raise
+            logger.warning(f"Could not revalidate {url} ({e}), using cached copy")
+            return entry["data"]
+
+        if resp.status_code == 304 and entry is not None:
+            logger.debug(f"Index {url} unchanged, using cached copy")
+            return entry["data"]
+        if resp.status_code != 200:
+            raise BlobDownloadError(f"Failed to download {url} - {resp.status_code}")
+
+        data = parse(resp.content)
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+        if etag or last_modified:
+            self._store(
+                url,
+                {
+                    "format": _FORMAT,
+                    "url": url,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "data": data,
+                },
+            )
+        return data
+
+    def _load(self, url: str) -> dict | None:
+        try:
+            with open(self.path(url), "rb") as f:
+                entry = msgpack.unpackb(f.read(), strict_map_key=False)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable index cache entry for {url}: {e}")
+            return None
+
+        if (
+            not isinstance(entry, dict)
+            or entry.get("format") != _FORMAT
+            or entry.get("url") != url
+        ):
+            return None
+        return entry
+
+    def _store(self, url: str, entry: dict):
+        path = self.path(url)
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(msgpack.packb(entry))
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def __str__(self):
+        return f"IndexCache({self.root})"
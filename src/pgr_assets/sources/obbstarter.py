@@ -1,10 +1,11 @@
-from typing import Union, Dict, Iterable, Tuple
+from typing import Union, Dict, Iterable, Iterator, Tuple
 from zipfile import ZipFile
 
 import UnityPy
 
 from . import Source
 from ._index import read_textasset_bytes, loads_index
+from .compactindex import CompactIndex
 from .exceptions import SourceIndexError
 
 
@@ -20,7 +21,7 @@ def _obb_resource_map(filenames) -> Dict[str, str]:
 class ObbSource(Source):
     _obb_path: str
     _filename: str
-    _index: dict
+    _index: CompactIndex
     _resources: Dict[str, str]
 
     def __init__(self, obb: str):
@@ -51,7 +52,7 @@ class ObbSource(Source):
     def version(self) -> Union[Tuple[int, ...], None]:
         return None
 
-    def index(self) -> dict:
+    def index(self) -> CompactIndex:
         return self._index
 
     def load_index(self, obb: ZipFile):
@@ -61,13 +62,20 @@ class ObbSource(Source):
         if "assets/buildtemp/index.bytes" not in env.container:
             raise SourceIndexError("Invalid OBB index bundle")
 
-        self._index = loads_index(
-            read_textasset_bytes(env, "assets/buildtemp/index.bytes")
-        )[0]
+        self._index = CompactIndex.build(
+            loads_index(read_textasset_bytes(env, "assets/buildtemp/index.bytes"))[0]
+        )
 
     def resources(self) -> Dict[str, str]:
         return self._resources
 
+    def index_entries(self) -> Iterator[Tuple[str, str, str | None]]:
+        for bundle, (blob, sha1, _) in self.index().items():
+            yield bundle, blob, sha1
+
+    def loaded_indexes(self) -> Iterable[CompactIndex]:
+        return (self.index(),)
+
     def bundle_names(self) -> Iterable[str]:
         return self.index().keys()
 
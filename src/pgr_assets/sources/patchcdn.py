@@ -6,7 +6,7 @@ import string
 from dataclasses import dataclass, replace
 from datetime import datetime, timedelta
 from enum import Enum
-from typing import Union, Dict, Tuple, Iterable, Optional
+from typing import BinaryIO, Union, Dict, Tuple, Iterable, Iterator, Optional
 from urllib.parse import urlparse
 
 import UnityPy
@@ -15,7 +15,10 @@ from pgr_assets.versions import PATCH_KEY_SCHEME_MIN_VERSION, parse_version
 
 from . import Source
 from ._index import read_textasset_bytes, loads_index
+from .compactindex import CompactIndex
+from .download import copy_response, range_headers
 from .exceptions import BlobDownloadError, SourceIndexError
+from .indexcache import IndexCache
 from .session import get_session
 
 SIGN_ALPHABET = string.ascii_letters + string.digits
@@ -146,16 +149,42 @@ class PatchCdn(Enum):
     )
 
 
+def _parse_index(bundle: bytes) -> CompactIndex:
+    # Index is an asset bundle, containing the msgpack'd index
+    env = UnityPy.load(bundle)
+
+    if "assets/temp/index.bytes" in env.container:
+        index = loads_index(read_textasset_bytes(env, "assets/temp/index.bytes"))[0]
+    elif "assets/buildtemp/index.bytes" in env.container:
+        partial_indices = loads_index(
+            read_textasset_bytes(env, "assets/buildtemp/index.bytes")
+        )
+        index = partial_indices[0]
+        for v in partial_indices[1].values():
+            index.update(v)
+    else:
+        raise SourceIndexError("Failed to find index in patch index bundle")
+    return CompactIndex.build(index)
+
+
 class PatchCdnSource(Source):
     _logger = logging.getLogger("PatchCdnSource")
     _cdn_name: str
     _cdn: PatchCdnData
-    _index: Dict[str, Tuple[str, str, int]] | None = None
+    _index: CompactIndex | None = None
     _resources: Dict[str, str] | None = None
     _sign_key: str | None = None
-
-    def __init__(self, cdn: PatchCdn, version: str, key: Optional[str] = None):
+    _index_cache: IndexCache | None
+
+    def __init__(
+        self,
+        cdn: PatchCdn,
+        version: str,
+        key: Optional[str] = None,
+        index_cache: IndexCache | None = None,
+    ):
         self._cdn_name = cdn.name
+        self._index_cache = index_cache
         self._cdn = replace(cdn.value, key=key) if key else cdn.value
 
         if self._cdn.sign:
@@ -174,9 +203,9 @@ class PatchCdnSource(Source):
     def has_blob(self, blob: str) -> bool:
         return blob in self.resources()
 
-    def _request(self, url: str):
+    def _signed_url(self, url: str) -> str:
         if not self._cdn.sign:
-            return get_session().get(url)
+            return url
 
         # Do the new CN Beta signature
         expiration = int((datetime.now() + timedelta(minutes=30)).timestamp())
@@ -186,7 +215,10 @@ class PatchCdnSource(Source):
         signature += hashlib.md5(
             f"{path}-{signature}{self._sign_key}".encode()
         ).hexdigest()
-        return get_session().get(url + "?sign=" + signature)
+        return url + "?sign=" + signature
+
+    def _request(self, url: str, **kwargs):
+        return get_session().get(self._signed_url(url), **kwargs)
 
     def get_blob(self, blob: str) -> bytes:
         url = self.resources()[blob]
@@ -198,6 +230,15 @@ class PatchCdnSource(Source):
             )
         return resp.content
 
+    def write_blob(self, blob: str, out: BinaryIO, offset: int = 0) -> None:
+        url = self.resources()[blob]
+        self._logger.debug(f"Streaming blob {blob} ({url})")
+        with self._request(url, stream=True, headers=range_headers(offset)) as resp:
+            copy_response(resp, out, f"blob {blob}", offset)
+
+    def blob_url(self, blob: str) -> Union[str, None]:
+        return self._signed_url(self.resources()[blob])
+
     def bundle_to_blob(self, bundle: str) -> Union[str, None]:
         try:
             return self.index()[bundle][0]
@@ -220,29 +261,24 @@ class PatchCdnSource(Source):
         self._resources = resources
         return resources
 
-    def index(self) -> Dict[str, Tuple[str, str, int]]:
+    def index(self) -> CompactIndex:
         if self._index is not None:
             return self._index
 
-        # Index is an asset bundle, containing the msgpack'd index
-        bundle = self._request(f"{self._cdn_url}index")
-        if bundle.status_code != 200:
-            raise BlobDownloadError(
-                f"Failed to download patch index - {bundle.status_code}"
-            )
-        env = UnityPy.load(bundle.content)
-
-        if "assets/temp/index.bytes" in env.container:
-            index = loads_index(read_textasset_bytes(env, "assets/temp/index.bytes"))[0]
-        elif "assets/buildtemp/index.bytes" in env.container:
-            partial_indices = loads_index(
-                read_textasset_bytes(env, "assets/buildtemp/index.bytes")
+        url = f"{self._cdn_url}index"
+        if self._index_cache is not None:
+            index = CompactIndex(
+                self._index_cache.get(
+                    url, lambda b: _parse_index(b).buffer, request=self._request
+                )
             )
-            index = partial_indices[0]
-            for v in partial_indices[1].values():
-                index.update(v)
         else:
-            raise SourceIndexError("Failed to find index in patch index bundle")
+            bundle = self._request(url)
+            if bundle.status_code != 200:
+                raise BlobDownloadError(
+                    f"Failed to download patch index - {bundle.status_code}"
+                )
+            index = _parse_index(bundle.content)
 
         self._index = index
         return index
@@ -250,6 +286,13 @@ class PatchCdnSource(Source):
     def version(self) -> Union[Tuple[int, ...], None]:
         return parse_version(self._version)
 
+    def index_entries(self) -> Iterator[Tuple[str, str, str | None]]:
+        for bundle, (blob, sha1, _) in self.index().items():
+            yield bundle, blob, sha1
+
+    def loaded_indexes(self) -> Iterable[CompactIndex]:
+        return (self.index(),)
+
     def bundle_names(self) -> Iterable[str]:
         return self.index().keys()
 
@@ -1,5 +1,6 @@
+import json
 import logging
-from typing import Union, Tuple
+from typing import BinaryIO, Iterable, Iterator, Union, Tuple
 
 import UnityPy
 
@@ -7,7 +8,10 @@ from pgr_assets.versions import parse_version
 
 from . import Source
 from ._index import read_textasset_bytes, loads_index
+from .compactindex import CompactIndex
+from .download import copy_response, range_headers
 from .exceptions import BlobDownloadError, SourceIndexError
+from .indexcache import IndexCache
 from .session import get_session
 from dataclasses import dataclass
 from enum import Enum
@@ -64,17 +68,35 @@ class PcStarterCdn(Enum):
     )
 
 
+def _parse_index(bundle: bytes) -> CompactIndex:
+    env = UnityPy.load(bundle)
+
+    if "assets/temp/index.bytes" not in env.container:
+        raise SourceIndexError("Failed to find index in patch index bundle")
+
+    return CompactIndex.build(
+        loads_index(read_textasset_bytes(env, "assets/temp/index.bytes"))[0]
+    )
+
+
 class PcStarterSource(Source):
     _logger = logging.getLogger("PcStarterSource")
     _cdn_index: dict | None = None
-    _matrix_index: dict | None = None
+    _matrix_index: CompactIndex | None = None
     _resources: dict | None = None
     _section: str
-
-    def __init__(self, cdn: PcStarterCdn, prerelease: bool):
+    _index_cache: IndexCache | None
+
+    def __init__(
+        self,
+        cdn: PcStarterCdn,
+        prerelease: bool,
+        index_cache: IndexCache | None = None,
+    ):
         self._cdn_name = cdn.name
         self._cdn = cdn.value
         self._section = "predownload" if prerelease else "default"
+        self._index_cache = index_cache
 
     def cdn_index(self):
         if self._cdn_index is not None:
@@ -84,16 +106,18 @@ class PcStarterSource(Source):
         self._cdn_index = self._get_json(self._cdn.index_url())
         return self._cdn_index
 
-    def matrix_index(self) -> dict:
+    def matrix_index(self) -> CompactIndex:
         if self._matrix_index is not None:
             return self._matrix_index
 
-        env = UnityPy.load(self.get_blob("index"))
-
-        if "assets/temp/index.bytes" not in env.container:
-            raise SourceIndexError("Failed to find index in patch index bundle")
-
-        index = loads_index(read_textasset_bytes(env, "assets/temp/index.bytes"))[0]
+        if self._index_cache is not None:
+            index = CompactIndex(
+                self._index_cache.get(
+                    self.resources()["index"], lambda b: _parse_index(b).buffer
+                )
+            )
+        else:
+            index = _parse_index(self.get_blob("index"))
         self._matrix_index = index
         return index
 
@@ -110,6 +134,15 @@ class PcStarterSource(Source):
             )
         return resp.content
 
+    def write_blob(self, blob: str, out: BinaryIO, offset: int = 0) -> None:
+        url = self.resources()[blob]
+        self._logger.debug(f"Streaming blob {blob} ({url})")
+        with get_session().get(url, stream=True, headers=range_headers(offset)) as resp:
+            copy_response(resp, out, f"blob {blob}", offset)
+
+    def blob_url(self, blob: str) -> Union[str, None]:
+        return self.resources()[blob]
+
     def version(self) -> Union[Tuple[int, ...], None]:
         return parse_version(self.cdn_index()[self._section]["version"])
 
@@ -144,7 +177,7 @@ class PcStarterSource(Source):
         blob_base = self.blob_cdn_url()
 
         resource_index = self._get_json(
-            blob_base + self.cdn_index()[self._section]["resources"]
+            blob_base + self.cdn_index()[self._section]["resources"], self._index_cache
         )
         resources = {}
         for resource in resource_index["resource"]:
@@ -157,11 +190,21 @@ class PcStarterSource(Source):
         self._resources = resources
         return resources
 
+    def index_entries(self) -> Iterator[Tuple[str, str, str | None]]:
+        for bundle, (blob, sha1, _) in self.matrix_index().items():
+            yield bundle, blob, sha1
+
+    def loaded_indexes(self) -> Iterable[CompactIndex]:
+        return (self.matrix_index(),)
+
     def bundle_names(self):
         return self.matrix_index().keys()
 
     @staticmethod
-    def _get_json(url: str) -> dict:
+    def _get_json(url: str, index_cache: IndexCache | None = None) -> dict:
+        if index_cache is not None:
+            return index_cache.get(url, json.loads)
+
         resp = get_session().get(url)
         if resp.status_code != 200:
             raise BlobDownloadError(
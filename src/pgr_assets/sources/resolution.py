@@ -0,0 +1,106 @@
+from array import array
+from typing import Iterable, Iterator, NamedTuple, Sequence, TextIO, Tuple
+
+from .compactindex import CompactIndex
+from .source import Source
+
+
+class Resolution(NamedTuple):
+    blob: str
+    sha1: str | None
+    # Positions (in SourceSet.sources) of the sources hosting the blob, in the
+    # order downloads try them.
+    hosts: Tuple[int, ...]
+
+
+class ResolutionTable:
+    """How every bundle of a :class:`SourceSet` resolves, computed once.
+
+    Resolving a bundle otherwise walks the sources three times (blob, sha1,
+    then who hosts the blob). Here the merged outcome lives in a
+    :class:`CompactIndex` (so it stays as small, and as cheap to hand to
+    worker processes, as the source indexes it replaces) plus a parallel array
+    of host bitmasks, and a lookup is a single hash probe.
+    """
+
+    entries: CompactIndex
+
+    def __init__(self, entries: CompactIndex, hosts: array):
+        self.entries = entries
+        self._hosts = hosts
+        self._host_tuples: dict[int, Tuple[int, ...]] = {}
+
+    @classmethod
+    def build(cls, sources: Sequence[Source]) -> "ResolutionTable":
+        # Same precedence as the walks in SourceSet: the blob and sha1 come from
+        # the last source that knows the bundle (the patch over the primary).
+        merged: dict[str, list] = {}
+        for source in sources:
+            for bundle, blob, sha1 in source.index_entries():
+                if blob is None:
+                    continue
+                entry = merged.get(bundle)
+                if entry is None:
+                    merged[bundle] = [blob, sha1, None]
+                    continue
+                entry[0] = blob
+                if sha1 is not None:
+                    entry[1] = sha1
+
+        masks: dict[str, int] = {}
+        for blob, _, _ in merged.values():
+            if blob not in masks:
+                masks[blob] = sum(
+                    1 << i for i, source in enumerate(sources) if source.has_blob(blob)
+                )
+
+        entries = CompactIndex.build(merged)
+        hosts = array("I", (masks[blob] for blob, _, _ in entries.values()))
+        return cls(entries, hosts)
+
+    def get(self, bundle: str) -> Resolution | None:
+        i = self.entries.locate(bundle)
+        if i < 0:
+            return None
+        blob, sha1, _ = self.entries.entry_at(i)
+        return Resolution(blob, sha1, self._host_positions(self._hosts[i]))
+
+    def _host_positions(self, mask: int) -> Tuple[int, ...]:
+        positions = self._host_tuples.get(mask)
+        if positions is None:
+            positions = tuple(i for i in range(mask.bit_length()) if mask >> i & 1)
+            self._host_tuples[mask] = positions
+        return positions
+
+    def __iter__(self) -> Iterator[Tuple[str, Resolution]]:
+        for i, (bundle, (blob, sha1, _)) in enumerate(self.entries.items()):
+            yield bundle, Resolution(blob, sha1, self._host_positions(self._hosts[i]))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def dump(
+        self,
+        out: TextIO,
+        sources: Sequence[Source],
+        bundles: Iterable[str] | None = None,
+    ):
+        """Write the table (or the given bundles' rows) as tab-separated lines
+        of bundle, blob, sha1 and the hosting sources, for debugging resolution
+        problems."""
+        if bundles is None:
+            rows: Iterable[Tuple[str, Resolution | None]] = self
+        else:
+            rows = ((bundle, self.get(bundle)) for bundle in bundles)
+        for bundle, resolution in rows:
+            if resolution is None:
+                continue
+            blob, sha1, hosts = resolution
+            names = ",".join(str(sources[i]) for i in hosts) or "-"
+            out.write(f"{bundle}\t{blob}\t{sha1 or '-'}\t{names}\n")
+
+    def __getstate__(self):
+        return self.entries, self._hosts
+
+    def __setstate__(self, state):
+        self.__init__(*state)
@@ -1,4 +1,6 @@
-from typing import Union, Dict, Iterable, Tuple
+from typing import BinaryIO, Union, Dict, Iterable, Iterator, Tuple
+
+from .compactindex import CompactIndex
 
 
 class Source(object):
@@ -10,6 +12,17 @@ class Source(object):
         """Returns the blob at the given path as binary data"""
         raise NotImplementedError()
 
+    def write_blob(self, blob: str, out: BinaryIO, offset: int = 0) -> None:
+        """Writes the blob at the given path into out, starting at byte offset
+        (to resume a partial download). Sources that download override this to
+        stream instead of buffering the whole blob"""
+        out.write(self.get_blob(blob)[offset:])
+
+    def blob_url(self, blob: str) -> Union[str, None]:
+        """Returns the URL the blob can be fetched from with a plain GET, or None
+        if it isn't served over HTTP (it is then read with write_blob)"""
+        return None
+
     def bundle_sha1(self, bundle: str) -> Union[str, None]:
         """Returns the sha1 of the given blob"""
         raise NotImplementedError()
@@ -29,3 +42,12 @@ class Source(object):
     def bundle_names(self) -> Iterable[str]:
         """Returns all bundle names"""
         raise NotImplementedError()
+
+    def index_entries(self) -> Iterator[Tuple[str, Union[str, None], Union[str, None]]]:
+        """Yields (bundle, blob, sha1) for all bundles"""
+        for bundle in self.bundle_names():
+            yield bundle, self.bundle_to_blob(bundle), self.bundle_sha1(bundle)
+
+    def loaded_indexes(self) -> Iterable[CompactIndex]:
+        """Returns the indexes backing bundle lookups (loading them if needed)"""
+        return ()
@@ -1,12 +1,25 @@
+import asyncio
+import contextlib
 import logging
-from typing import Union, Tuple
+import os
+import shutil
+import tempfile
+import time
+from typing import BinaryIO, Iterable, Iterator, NoReturn, TextIO, Union, Tuple, cast
 
 from pgr_assets.versions import PATCH_KEY_SCHEME_MIN_VERSION, parse_version
 
 from . import PatchCdn, PatchCdnSource, ObbSource, PcStarterSource, PcStarterCdn, Source
+from .asyncdownload import ASYNC_RESUMABLE_ERRORS, AsyncHttpClient
+from .blobcache import BlobCache
+from .indexcache import IndexCache
+from .resolution import ResolutionTable
+from .download import RESUMABLE_ERRORS, SPOOL_MAX_SIZE, HashingWriter, is_sha1
 from .exceptions import (
     BlobDownloadError,
+    BlobIntegrityError,
     BlobNotFoundException,
+    BlobRangeError,
     SourceError,
     UnknownSourceError,
 )
@@ -14,20 +27,35 @@ from .xbuildconfig import extract_build_key
 
 logger = logging.getLogger("sourceset")
 
+# Consecutive interrupted transfers (without progress) tolerated per blob and
+# source, and the base of the exponential backoff between them, in seconds.
+_RESUME_ATTEMPTS = 5
+_RESUME_BACKOFF = 0.5
+
 # Re-exported for callers that import it from this module historically.
 __all__ = ["SourceSet", "BlobNotFoundException"]
 
 
 class SourceSet:
-    def __init__(self):
+    def __init__(
+        self,
+        blob_cache: BlobCache | None = None,
+        index_cache: IndexCache | None = None,
+    ):
         self.sources: list[Source] = []
+        self.blob_cache = blob_cache
+        self.index_cache = index_cache
+        # Built by warm(), once all sources are added.
+        self.resolution: ResolutionTable | None = None
 
     def add_primary(self, primary_type: str, obb: Union[str, None], prerelease: bool):
         if primary_type == "obb":
             assert obb is not None, "obb path required when primary is 'obb'"
             impl = ObbSource(obb)
         elif primary_type in PcStarterCdn.__members__:
-            impl = PcStarterSource(PcStarterCdn[primary_type], prerelease)
+            impl = PcStarterSource(
+                PcStarterCdn[primary_type], prerelease, index_cache=self.index_cache
+            )
         else:
             raise UnknownSourceError(f"Unknown primary type {primary_type}")
 
@@ -55,10 +83,12 @@ class SourceSet:
 
         key = None
         if parse_version(version) >= PATCH_KEY_SCHEME_MIN_VERSION:
-            key = extract_build_key(self._resources_assets_bytes())
+            key = self._patch_key()
             logger.debug("Extracted patch key from resources.assets")
 
-        impl = PatchCdnSource(PatchCdn[patch_type], version, key=key)
+        impl = PatchCdnSource(
+            PatchCdn[patch_type], version, key=key, index_cache=self.index_cache
+        )
 
         impl_version = impl.version()
         logger.debug(f"Patch source {patch_type} version {impl_version}")
@@ -75,6 +105,19 @@ class SourceSet:
                 return version
         return None
 
+    def _patch_key(self) -> str:
+        # resources.assets runs to tens of MB and only yields a 16 char key, so
+        # with an index cache the key is what gets cached (and revalidated).
+        if self.index_cache is not None:
+            for source in self.sources:
+                if not source.has_blob("resources.assets"):
+                    continue
+                url = source.blob_url("resources.assets")
+                if url is not None:
+                    return self.index_cache.get(url, extract_build_key)
+                break
+        return extract_build_key(self._resources_assets_bytes())
+
     def _resources_assets_bytes(self) -> bytes:
         for source in self.sources:
             if source.has_blob("resources.assets"):
@@ -84,50 +127,301 @@ class SourceSet:
         )
 
     def list_all_bundles(self):
+        if self.resolution is not None:
+            return set(self.resolution.entries)
         return set(
             bundle for source in self.sources for bundle in source.bundle_names()
         )
 
     def warm(self):
+        """Load every source's index and resource map, then precompute how each
+        bundle resolves (see :class:`ResolutionTable`). Run it once, before
+        fanning out to threads or worker processes, so they share the result."""
         for source in self.sources:
             source.bundle_names()
             source.resources()
+        if self.resolution is None:
+            self.resolution = ResolutionTable.build(self.sources)
+            logger.debug(f"Resolution table built for {len(self.resolution)} bundles")
+
+    def dump_resolution(self, out: TextIO, bundles: Iterable[str] | None = None):
+        """Write how every (or each given) bundle resolves, see
+        :meth:`ResolutionTable.dump`."""
+        self.warm()
+        assert self.resolution is not None
+        self.resolution.dump(out, self.sources, bundles)
+
+    @contextlib.contextmanager
+    def shared_indexes(self) -> Iterator[None]:
+        """Within the block, pickling this set (e.g. into worker processes)
+        hands over the source indexes as read-only shared mappings instead of
+        copies. See :meth:`CompactIndex.share`."""
+        indexes = [
+            index for source in self.sources for index in source.loaded_indexes()
+        ]
+        if self.resolution is not None:
+            indexes.append(self.resolution.entries)
+        try:
+            for index in indexes:
+                index.share()
+            yield
+        finally:
+            for index in indexes:
+                index.unshare()
 
     def bundle_to_blob(self, bundle):
+        if self.resolution is not None:
+            resolution = self.resolution.get(bundle)
+            return resolution.blob if resolution is not None else None
+        return self._walk_bundle_to_blob(bundle)
+
+    def bundle_sha1(self, bundle):
+        if self.resolution is not None:
+            resolution = self.resolution.get(bundle)
+            return resolution.sha1 if resolution is not None else None
+        return self._walk_bundle_sha1(bundle)
+
+    def _walk_bundle_to_blob(self, bundle):
         for source in reversed(self.sources):
             blob = source.bundle_to_blob(bundle)
             if blob is not None:
                 return blob
         return None
 
-    def bundle_sha1(self, bundle):
+    def _walk_bundle_sha1(self, bundle):
         for source in reversed(self.sources):
             sha1 = source.bundle_sha1(bundle)
             if sha1 is not None:
                 return sha1
         return None
 
-    def find_bundle(self, bundle):
-        blob = self.bundle_to_blob(bundle)
-        # First we try to resolve bundle -> blob, but use the last source that has it
-        if blob is None:
-            raise BlobNotFoundException(f"Failed to resolve bundle {bundle}")
+    def find_bundle(self, bundle) -> bytes:
+        with self.open_bundle(bundle) as f:
+            return f.read()
+
+    def open_bundle(self, bundle) -> BinaryIO:
+        """Like :meth:`find_bundle`, but return the blob as a readable file
+        positioned at its start, so large blobs never have to be held in memory.
+        The caller is responsible for closing it."""
+        blob, sha1, cache, hosts = self._resolve(bundle)
+
+        # A blob cached under the index sha1 is byte-identical to what the CDN
+        # would serve, so it never needs to be revalidated.
+        if cache is not None:
+            f = cache.open(cast(str, sha1))
+            if f is not None:
+                logger.debug(f"Blob {blob} served from {cache}")
+                return f
+
+        return self._download_blob(blob, sha1, cache, hosts)
+
+    def prefetch_bundle(self, bundle) -> str | None:
+        """Make sure the blob for ``bundle`` is in the blob cache, so a later
+        :meth:`open_bundle` (in any process sharing the cache) is served from
+        disk. Returns the blob's sha1, or None if it can't be cached because
+        there is no cache or the index carries no sha1 for it."""
+        blob, sha1, cache, hosts = self._resolve(bundle)
+        if cache is None:
+            return None
+        f = cache.open(cast(str, sha1))
+        if f is None:
+            f = self._download_blob(blob, sha1, cache, hosts)
+        f.close()
+        return sha1
+
+    def cache_key(self, bundle) -> str | None:
+        """The sha1 :meth:`prefetch_bundle` caches ``bundle``'s blob under, or
+        None if it wouldn't be cached (or the bundle doesn't resolve)."""
+        try:
+            _, sha1, cache, _ = self._resolve(bundle)
+        except BlobNotFoundException:
+            return None
+        return sha1 if cache is not None else None
+
+    async def fetch_bundle(self, bundle, dest: str, client: AsyncHttpClient):
+        """Async counterpart of :meth:`open_bundle` for bulk downloads: write the
+        verified blob for ``bundle`` to the file ``dest``.
+
+        Sources that serve blobs over HTTP are streamed with ``client``, so any
+        number of fetches can share one event loop; other sources (OBB) run
+        their blocking :meth:`Source.write_blob` on a worker thread.
+        """
+        blob, sha1, cache, hosts = self._resolve(bundle)
+        if cache is not None:
+            f = cache.open(cast(str, sha1))
+            if f is not None:
+                logger.debug(f"Blob {blob} served from {cache}")
+            else:
+                f = await self._download_blob_async(
+                    blob, sha1, cache, hosts, dest, client
+                )
+            if f is not None:
+                await asyncio.to_thread(_copy_to, f, dest)
+            return
+
+        await self._download_blob_async(blob, sha1, None, hosts, dest, client)
+
+    def _resolve(
+        self, bundle
+    ) -> Tuple[str, str | None, BlobCache | None, Iterable[Source]]:
+        """Resolve a bundle to its blob, its (lowercased) sha1 if the index has
+        a usable one, the blob cache to use for it, and the sources to try
+        downloading the blob from, in order."""
+        resolution = self.resolution.get(bundle) if self.resolution else None
+        if resolution is not None:
+            blob, sha1 = resolution.blob, resolution.sha1
+            hosts: Iterable[Source] = [self.sources[i] for i in resolution.hosts]
+        else:
+            blob = self._walk_bundle_to_blob(bundle)
+            # Resolve bundle -> blob through the last source that has it
+            if blob is None:
+                raise BlobNotFoundException(f"Failed to resolve bundle {bundle}")
+            sha1 = self._walk_bundle_sha1(bundle)
+            hosts = (source for source in self.sources if source.has_blob(blob))
 
         logger.debug(f"Bundle {bundle} -> blob {blob}")
 
-        # Then find the first source that has the blob
+        sha1 = sha1.lower() if is_sha1(sha1) else None
+        return blob, sha1, self.blob_cache if sha1 is not None else None, hosts
+
+    @staticmethod
+    def _resume_partial(blob: str, sha1: str | None, writer: HashingWriter) -> bool:
+        """Take over the bytes a parked partial download left in ``writer``'s
+        file. Returns whether they already are the whole blob: a run stopped
+        between the last byte and the commit parks a complete download, which
+        a ``Range`` request past its end would only get a 416 for."""
+        if not writer.out.tell():
+            return False
+        logger.debug(f"Resuming blob {blob} from {writer.out.tell()} bytes")
+        writer.absorb_existing()
+        return sha1 is not None and writer.hexdigest() == sha1
+
+    @staticmethod
+    def _retry_delay(
+        source: Source,
+        blob: str,
+        writer: HashingWriter,
+        offset: int,
+        failures: int,
+        error: Exception,
+    ) -> Tuple[int, float | None]:
+        """Decide how to go on after the transfer of ``blob`` started at
+        ``offset`` failed with a resumable ``error``. Returns the updated count
+        of consecutive failures and the seconds to wait before retrying from
+        ``writer.size``, or None for the delay to give up."""
+        # Only consecutive failures that made no progress count, so a flaky
+        # edge that keeps dropping large transfers still finishes.
+        failures = failures + 1 if writer.size == offset else 1
+        if failures >= _RESUME_ATTEMPTS:
+            return failures, None
+        if isinstance(error, BlobRangeError):
+            # The server won't continue from our bytes; start over instead.
+            logger.warning(
+                f"Download of blob {blob} from {source} can't be resumed at "
+                f"{offset} bytes ({error}), restarting"
+            )
+            writer.restart()
+            return failures, 0.0
+        logger.warning(
+            f"Download of blob {blob} from {source} interrupted after "
+            f"{writer.size} bytes ({error}), resuming"
+        )
+        return failures, _RESUME_BACKOFF * 2 ** (failures - 1)
+
+    @staticmethod
+    def _stream_blob(source: Source, blob: str, writer: HashingWriter):
+        """Stream a blob into ``writer``, resuming with a ``Range`` request from
+        the bytes already written whenever the transfer is cut short."""
+        failures = 0
+        while True:
+            offset = writer.size
+            try:
+                source.write_blob(blob, cast(BinaryIO, writer), offset)
+                return
+            except (*RESUMABLE_ERRORS, BlobRangeError) as e:
+                failures, delay = SourceSet._retry_delay(
+                    source, blob, writer, offset, failures, e
+                )
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    def _download_blob(
+        self,
+        blob: str,
+        sha1: str | None,
+        cache: BlobCache | None,
+        hosts: Iterable[Source],
+    ) -> BinaryIO:
+        # Try the sources hosting the blob in order until one succeeds
         found_in_source = False
         last_error: Exception | None = None
-        for source in self.sources:
-            if source.has_blob(blob):
-                found_in_source = True
-                logger.debug(f"Downloading blob {blob} from {source}")
-                try:
-                    return source.get_blob(blob)
-                except Exception as e:
-                    last_error = e
-                    logger.error(f"Failed to get blob {blob} from {source}: {e}")
+        for source in hosts:
+            found_in_source = True
+            logger.debug(f"Downloading blob {blob} from {source}")
+
+            # Stream straight into the cache when there is one, so a verified
+            # download is published with a rename rather than a second copy.
+            tmp: str | None = None
+            if cache is not None:
+                out, tmp = cache.create_temp(cast(str, sha1))
+            else:
+                # Returned to the caller, who closes it.
+                out = tempfile.SpooledTemporaryFile(SPOOL_MAX_SIZE)  # noqa: SIM115
+
+            writer = HashingWriter(cast(BinaryIO, out))
+            try:
+                if not self._resume_partial(blob, sha1, writer):
+                    self._stream_blob(source, blob, writer)
+                self._verify(blob, sha1, writer)
+            except BaseException as e:
+                self._abandon(cache, sha1, cast(BinaryIO, out), tmp, e)
+                if not isinstance(e, Exception):
+                    raise
+                last_error = e
+                logger.error(f"Failed to get blob {blob} from {source}: {e}")
+                continue
+
+            if cache is not None and tmp is not None:
+                return cache.commit(cast(str, sha1), cast(BinaryIO, out), tmp)
+            out.seek(0)
+            return cast(BinaryIO, out)
 
+        self._raise_unavailable(blob, found_in_source, last_error)
+
+    @staticmethod
+    def _abandon(
+        cache: BlobCache | None,
+        sha1: str | None,
+        out: BinaryIO,
+        tmp: str | None,
+        error: BaseException,
+    ):
+        """Dispose of the temp file of a failed download. With a cache, what was
+        transferred is parked for the next attempt to resume, unless the bytes
+        themselves are known to be bad."""
+        if cache is not None and tmp is not None:
+            if isinstance(error, BlobIntegrityError):
+                cache.discard(out, tmp)
+            else:
+                cache.park(cast(str, sha1), out, tmp)
+        elif tmp is not None:
+            BlobCache.discard(out, tmp)
+        else:
+            out.close()
+
+    @staticmethod
+    def _verify(blob: str, sha1: str | None, writer: HashingWriter):
+        if sha1 is not None and writer.hexdigest() != sha1:
+            raise BlobIntegrityError(
+                f"Blob {blob} is corrupt: got {writer.size} bytes with sha1 "
+                f"{writer.hexdigest()}, expected {sha1}"
+            )
+
+    @staticmethod
+    def _raise_unavailable(
+        blob: str, found_in_source: bool, last_error: Exception | None
+    ) -> NoReturn:
         # Distinguish "hosted somewhere but every download failed" from "no source
         # hosts it at all" so callers (and logs) can tell a network/CDN problem
         # apart from a genuinely missing blob.
@@ -136,3 +430,87 @@ class SourceSet:
                 f"Blob {blob} is hosted but could not be downloaded from any source"
             ) from last_error
         raise BlobNotFoundException(f"Failed to resolve blob {blob}")
+
+    @staticmethod
+    async def _stream_blob_async(
+        source: Source, blob: str, writer: HashingWriter, client: AsyncHttpClient
+    ):
+        """:meth:`_stream_blob`, fetching over ``client`` where possible."""
+        url = source.blob_url(blob)
+        failures = 0
+        while True:
+            offset = writer.size
+            try:
+                if url is None:
+                    await asyncio.to_thread(
+                        source.write_blob, blob, cast(BinaryIO, writer), offset
+                    )
+                else:
+                    await client.download(
+                        url, cast(BinaryIO, writer), f"blob {blob}", offset
+                    )
+                return
+            except (*RESUMABLE_ERRORS, *ASYNC_RESUMABLE_ERRORS, BlobRangeError) as e:
+                failures, delay = SourceSet._retry_delay(
+                    source, blob, writer, offset, failures, e
+                )
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    async def _download_blob_async(
+        self,
+        blob: str,
+        sha1: str | None,
+        cache: BlobCache | None,
+        hosts: Iterable[Source],
+        dest: str,
+        client: AsyncHttpClient,
+    ) -> BinaryIO | None:
+        """:meth:`_download_blob` for :meth:`fetch_bundle`. With a cache the
+        blob is committed to it and returned open; without one it is written
+        straight to ``dest`` (published by rename once verified) and None is
+        returned."""
+        found_in_source = False
+        last_error: Exception | None = None
+        for source in hosts:
+            found_in_source = True
+            logger.debug(f"Downloading blob {blob} from {source}")
+
+            if cache is not None:
+                out, tmp = cache.create_temp(cast(str, sha1))
+            else:
+                out, tmp = _create_temp_next_to(dest)
+
+            writer = HashingWriter(out)
+            try:
+                if not self._resume_partial(blob, sha1, writer):
+                    await self._stream_blob_async(source, blob, writer, client)
+                self._verify(blob, sha1, writer)
+            except BaseException as e:
+                self._abandon(cache, sha1, out, tmp, e)
+                if not isinstance(e, Exception):
+                    raise
+                last_error = e
+                logger.error(f"Failed to get blob {blob} from {source}: {e}")
+                continue
+
+            if cache is not None:
+                return cache.commit(cast(str, sha1), out, tmp)
+            out.close()
+            os.replace(tmp, dest)
+            return None
+
+        self._raise_unavailable(blob, found_in_source, last_error)
+
+
+def _create_temp_next_to(dest: str) -> Tuple[BinaryIO, str]:
+    fd, tmp = tempfile.mkstemp(
+        dir=os.path.dirname(dest) or ".", prefix=".", suffix=".tmp"
+    )
+    return cast(BinaryIO, os.fdopen(fd, "r+b")), tmp
+
+
+def _copy_to(src: BinaryIO, dest: str):
+    with src, open(dest, "wb") as f:
+        shutil.copyfileobj(src, f)
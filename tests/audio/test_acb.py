@@ -1,6 +1,11 @@
+import os
+import tempfile
+import threading
 import unittest
 from pathlib import Path
+from unittest import mock
 
+from pgr_assets.audio import acb as acb_mod
 from pgr_assets.audio.acb import ACB
 
 FIXTURE = Path(__file__).parent / "fixtures" / "mo_modelm.acb"
@@ -69,5 +74,127 @@ class AcbFixtureTest(unittest.TestCase):
             self.assertEqual([idx], self.acb.get_waveform_ids_for_cue_idx(idx))
 
 
+class FakeHCA:
+    """Stands in for the HCA decoder: "decodes" a waveform to itself."""
+
+    decodes = 0
+    lock = threading.Lock()
+
+    def __init__(self, data, key, subkey):
+        self.data = bytes(data)
+
+    def decode(self) -> bytes:
+        with FakeHCA.lock:
+            FakeHCA.decodes += 1
+        return b"RIFF" + self.data
+
+
+class FakeAWB(list):
+    """The waveforms of an AWB, as ACB.extract indexes them."""
+
+    subkey = 0
+
+
+class FakeACB(ACB):
+    """An ACB whose cues map straight to waveform ids, over an in-memory AWB."""
+
+    __slots__ = ["cues"]
+
+    def __init__(self, cues: dict, waveforms: list):
+        self.cues = list(cues.values())
+        self.payload = [
+            {
+                "CueNameTable": [
+                    {"CueName": (None, name), "CueIndex": (None, idx)}
+                    for idx, name in enumerate(cues)
+                ]
+            }
+        ]
+        self.awb = FakeAWB(waveforms)
+
+    def get_waveform_ids_for_cue_idx(self, idx: int) -> list[int]:
+        return self.cues[idx]
+
+
+@mock.patch.object(acb_mod, "HCA", FakeHCA)
+class ExtractTest(unittest.TestCase):
+    CUES = {f"Cue{n}": [n] for n in range(20)} | {"Block": [20, 21], "Gone": [99]}
+    WAVEFORMS = [f"wave{n}".encode() for n in range(22)]
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        FakeHCA.decodes = 0
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _extract(self, threads: int) -> dict:
+        out = os.path.join(self._tmp.name, str(threads))
+        with self.assertLogs("audio.acb", "WARNING"):
+            FakeACB(self.CUES, self.WAVEFORMS).extract(0, out, threads=threads)
+        files = {}
+        for name in os.listdir(out):
+            with open(os.path.join(out, name), "rb") as f:
+                files[name] = f.read()
+        return files
+
+    def test_writes_one_file_per_waveform(self):
+        files = self._extract(threads=1)
+        self.assertEqual(22, len(files))
+        self.assertEqual(b"RIFFwave3", files["cue3.wav"])
+        self.assertEqual(b"RIFFwave21", files["block_1.wav"])
+
+    def test_threads_write_the_same_files(self):
+        self.assertEqual(self._extract(threads=1), self._extract(threads=4))
+
+    def test_shared_waveform_is_decoded_once_and_linked(self):
+        cues = {"A": [0], "B": [1], "Again": [0], "Block": [1, 0]}
+        out = self._tmp.name
+        FakeACB(cues, self.WAVEFORMS).extract(0, out, threads=2)
+        self.assertEqual(2, FakeHCA.decodes)
+        self.assertEqual(
+            ["a.wav", "again.wav", "b.wav", "block_0.wav", "block_1.wav"],
+            sorted(os.listdir(out)),
+        )
+        path = os.path.join(out, "{}.wav").format
+        self.assertTrue(os.path.samefile(path("a"), path("again")))
+        self.assertTrue(os.path.samefile(path("a"), path("block_1")))
+        self.assertTrue(os.path.samefile(path("b"), path("block_0")))
+
+        # Extracting again with different waveforms doesn't write through
+        # the links into the other cues' files.
+        cues = {"A": [0], "Again": [2]}
+        FakeACB(cues, self.WAVEFORMS).extract(0, out)
+        with open(path("block_1"), "rb") as f:
+            self.assertEqual(b"RIFFwave0", f.read())
+        with open(path("again"), "rb") as f:
+            self.assertEqual(b"RIFFwave2", f.read())
+
+    def test_ffmpeg_fallback_links_after_the_batch_is_encoded(self):
+        class FakeBatch:
+            def __enter__(self):
+                self.queued = []
+                return self
+
+            def __exit__(self, *exc):
+                for data, path in self.queued:
+                    with open(path, "wb") as f:
+                        f.write(data)
+
+            def add(self, stream, mp3_path):
+                self.queued.append((stream, mp3_path))
+
+        out = self._tmp.name
+        with (
+            mock.patch.object(acb_mod, "lameenc", None),
+            mock.patch.object(acb_mod, "FFmpegMp3Batch", FakeBatch),
+            mock.patch.object(acb_mod, "HCAStream", lambda data, key, subkey: data),
+        ):
+            FakeACB({"A": [0], "B": [0]}, self.WAVEFORMS).extract(0, out, encode=True)
+        self.assertEqual(["a.mp3", "b.mp3"], sorted(os.listdir(out)))
+        with open(os.path.join(out, "b.mp3"), "rb") as f:
+            self.assertEqual(b"wave0", f.read())
+
+
 if __name__ == "__main__":
     unittest.main()
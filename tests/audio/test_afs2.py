@@ -0,0 +1,55 @@
+import io
+import os
+import tempfile
+import unittest
+
+from PyCriCodecsEx.awb import AWB, AWBBuilder
+
+from pgr_assets.audio.afs2 import LazyAWB, is_awb, peek
+
+WAVEFORMS = [bytes([n]) * (n * 37 % 200 + 1) for n in range(1, 12)] + [b""]
+DATA = AWBBuilder(WAVEFORMS, subkey=0x1234).build()
+
+
+class LazyAWBTest(unittest.TestCase):
+    def _check(self, awb: LazyAWB):
+        self.assertEqual(list(AWB(DATA).get_files()), [awb[i] for i in range(len(awb))])
+        self.assertEqual(0x1234, awb.subkey)
+        self.assertEqual(list(range(len(WAVEFORMS))), awb.ids)
+        with self.assertRaises(IndexError):
+            awb[len(WAVEFORMS)]
+
+    def test_bytes(self):
+        self._check(LazyAWB(DATA))
+
+    def test_file_on_disk_is_mapped(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bank.awb")
+            with open(path, "wb") as f:
+                f.write(DATA)
+            with open(path, "rb") as f:
+                awb = LazyAWB(f)
+                self.assertIsNotNone(awb._buf)
+                self._check(awb)
+
+    def test_other_files_are_read(self):
+        f = io.BytesIO(b"junk" + DATA)
+        f.seek(4)
+        awb = LazyAWB(f)
+        self.assertIsNone(awb._buf)
+        self._check(awb)
+
+    def test_not_an_awb(self):
+        with self.assertRaises(ValueError):
+            LazyAWB(b"RIFF" + DATA[4:])
+
+    def test_peek_leaves_files_in_place(self):
+        f = io.BytesIO(DATA)
+        self.assertTrue(is_awb(f))
+        self.assertEqual(0, f.tell())
+        self.assertEqual(b"", peek(io.BytesIO(), 1))
+        self.assertFalse(is_awb(b""))
+
+
+if __name__ == "__main__":
+    unittest.main()
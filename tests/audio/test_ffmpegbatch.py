@@ -0,0 +1,130 @@
+import io
+import math
+import os
+import struct
+import tempfile
+import unittest
+import wave
+from unittest import mock
+
+from ffmpeg import FFmpeg
+
+from pgr_assets.audio import ffmpegbatch
+from pgr_assets.audio.ffmpegbatch import FFmpegMp3Batch
+from pgr_assets.audio.hcastream import HCAStream
+from pgr_assets.cri import HCA
+
+
+def _hca(samples: int, pitch: float) -> bytes:
+    values = [int(8000 * math.sin(i * pitch)) for i in range(samples)]
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(22050)
+        w.writeframes(struct.pack(f"<{samples}h", *values))
+    return HCA(buf.getvalue()).encode()
+
+
+class FakeFFmpeg:
+    """Records each run and "encodes" by copying the mapped input's PCM."""
+
+    runs: list = []
+
+    def __init__(self):
+        self.inputs = []
+        self.outputs = []
+
+    def option(self, key, value=None):
+        return self
+
+    def input(self, url, options=None):
+        self.inputs.append(url)
+        return self
+
+    def output(self, url, options=None):
+        self.outputs.append((url, options))
+        return self
+
+    def execute(self):
+        FakeFFmpeg.runs.append(len(self.outputs))
+        for url, options in self.outputs:
+            source = self.inputs[int(options["map"].split(":")[0])]
+            with wave.open(source, "rb") as w, open(url, "wb") as f:
+                f.write(w.readframes(w.getnframes()))
+
+
+class FailingFFmpeg(FakeFFmpeg):
+    """Writes part of the first output, then fails."""
+
+    def execute(self):
+        with open(self.outputs[0][0], "wb") as f:
+            f.write(b"ID3")
+        raise RuntimeError("ffmpeg died")
+
+
+@mock.patch.object(ffmpegbatch, "FFmpeg", FakeFFmpeg)
+class FFmpegMp3BatchTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        FakeFFmpeg.runs = []
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self._tmp.name, name)
+
+    def test_encodes_in_batches(self):
+        hcas = [_hca(3000 + 500 * n, 0.01 * (n + 1)) for n in range(5)]
+        with FFmpegMp3Batch(max_files=2) as batch:
+            for n, hca in enumerate(hcas):
+                batch.add(HCAStream(hca, 0), self._path(f"{n}.mp3"))
+            # Two full batches went out as they filled; one file waits.
+            self.assertEqual([2, 2], FakeFFmpeg.runs)
+            self.assertFalse(os.path.exists(self._path("4.mp3")))
+        self.assertEqual([2, 2, 1], FakeFFmpeg.runs)
+
+        for n, hca in enumerate(hcas):
+            with open(self._path(f"{n}.mp3"), "rb") as f:
+                self.assertEqual(b"".join(HCAStream(hca, 0).pcm_chunks()), f.read())
+
+    def test_byte_limit_flushes(self):
+        with FFmpegMp3Batch(max_bytes=1) as batch:
+            batch.add(HCAStream(_hca(3000, 0.02), 0), self._path("a.mp3"))
+            self.assertEqual([1], FakeFFmpeg.runs)
+
+    def test_failed_batch_leaves_no_outputs(self):
+        with mock.patch.object(ffmpegbatch, "FFmpeg", FailingFFmpeg):
+            with self.assertRaises(RuntimeError):
+                with FFmpegMp3Batch() as batch:
+                    for n in range(2):
+                        batch.add(
+                            HCAStream(_hca(3000, 0.02), 0), self._path(f"{n}.mp3")
+                        )
+                    batch.flush()
+        self.assertEqual([], os.listdir(self._tmp.name))
+
+    def test_temporary_files_are_removed(self):
+        batch = FFmpegMp3Batch()
+        tempdir = batch._tempdir.name
+        with batch:
+            batch.add(HCAStream(_hca(3000, 0.02), 0), self._path("a.mp3"))
+            self.assertEqual(1, len(os.listdir(tempdir)))
+        self.assertFalse(os.path.exists(tempdir))
+
+    def test_command_maps_each_input_to_its_output(self):
+        with mock.patch.object(ffmpegbatch, "FFmpeg", FFmpeg):
+            arguments = FFmpegMp3Batch.command(
+                [("0.wav", "a.mp3"), ("1.wav", "b.mp3")]
+            ).arguments
+        self.assertEqual(["ffmpeg", "-y", "-i", "0.wav", "-i", "1.wav"], arguments[:6])
+        self.assertEqual(
+            ["-map", "1:a", "-map_metadata", "1", "-c:a", "libmp3lame", "-q:a", "2"],
+            arguments[-9:-1],
+        )
+        self.assertEqual("b.mp3", arguments[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
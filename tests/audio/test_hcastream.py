@@ -0,0 +1,94 @@
+import io
+import math
+import struct
+import unittest
+import wave
+
+from pgr_assets.audio import acb as acb_mod
+from pgr_assets.audio.hcastream import HCAStream
+from pgr_assets.cri import HCA
+
+
+def _wav(channels: int, samples: int, loop: tuple[int, int] | None = None) -> bytes:
+    """A 44.1 kHz tone with some noise, optionally with a smpl loop chunk."""
+    seed = 1
+    values = []
+    for i in range(samples):
+        for c in range(channels):
+            seed = (seed * 1103515245 + 12345) & 0x7FFFFFFF
+            noise = seed % 4000 - 2000
+            values.append(int(6000 * math.sin(i * (0.03 + 0.011 * c))) + noise)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(44100)
+        w.writeframes(struct.pack(f"<{len(values)}h", *values))
+    wav = buf.getvalue()
+    if loop is not None:
+        # One loop point; the encoder wants it ahead of the data chunk.
+        smpl = struct.pack("<4s16I", b"smpl", 60, *[0] * 7, 1, 0, 0, 0, *loop, 0, 0)
+        body = wav[12:36] + smpl + wav[36:]
+        wav = b"RIFF" + struct.pack("<I", len(body) + 4) + b"WAVE" + body
+    return wav
+
+
+def _pcm(wav: bytes) -> bytes:
+    with wave.open(io.BytesIO(wav), "rb") as w:
+        return w.readframes(w.getnframes())
+
+
+class HCAStreamTest(unittest.TestCase):
+    KEY = 0x1234_5678_9ABC
+
+    def _check(self, hca: bytes, key: int = 0):
+        expected = HCA(hca, key=key).decode()
+        for frames in (1, 3, 16, 256):
+            with self.subTest(frames=frames):
+                stream = HCAStream(hca, key)
+                pcm = b"".join(stream.pcm_chunks(frames))
+                self.assertEqual(_pcm(expected), pcm)
+                self.assertEqual(stream.samples * stream.channels * 2, len(pcm))
+
+    def test_matches_whole_file_decode(self):
+        for channels in (1, 2):
+            with self.subTest(channels=channels):
+                self._check(HCA(_wav(channels, 40000)).encode())
+
+    def test_encrypted(self):
+        hca = HCA(_wav(2, 40000), key=self.KEY).encode(encrypt=True)
+        self.assertEqual(b"\xc8\xc3\xc1\x00", hca[:4])  # masked header
+        self._check(hca, self.KEY)
+
+    def test_looping(self):
+        hca = HCA(_wav(1, 40000, loop=(10000, 30000))).encode()
+        self.assertIn("LoopStart", HCA(hca).hca)
+        self._check(hca)
+
+    def test_format(self):
+        stream = HCAStream(HCA(_wav(2, 5000)).encode(), 0)
+        self.assertEqual((2, 44100), (stream.channels, stream.sample_rate))
+
+
+@unittest.skipIf(acb_mod.lameenc is None, "needs lameenc")
+class EncodeMp3Test(unittest.TestCase):
+    def test_same_mp3_as_encoding_at_once(self):
+        hca = HCA(_wav(2, 60000)).encode()
+        wav = HCA(hca).decode()
+
+        lameenc = acb_mod.lameenc
+        enc = lameenc.Encoder()
+        enc.set_vbr(4)
+        enc.set_vbr_quality(2)
+        enc.set_in_sample_rate(44100)
+        enc.set_channels(2)
+        enc.set_quality(2)
+        expected = enc.encode(_pcm(wav)) + enc.flush()
+
+        out = io.BytesIO()
+        acb_mod._encode_mp3(HCAStream(hca, 0), out)
+        self.assertEqual(expected, out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pgr_assets.commands import diff as diff_mod
+from pgr_assets.commands import extract as extract_mod
+from pgr_assets.commands.diff import (
+    Snapshot,
+    diff_snapshots,
+    load_snapshot,
+    take_snapshot,
+    write_snapshot,
+)
+from pgr_assets.sources.source import Source
+from pgr_assets.sources.sourceset import SourceSet
+
+SHA_A = "a" * 40
+SHA_B = "b" * 40
+
+
+class IndexSource(Source):
+    def __init__(self, index):
+        self._index = index  # bundle -> (blob, sha1)
+
+    def has_blob(self, blob):
+        return True
+
+    def get_blob(self, blob):
+        raise NotImplementedError
+
+    def bundle_sha1(self, bundle):
+        return self._index.get(bundle, (None, None))[1]
+
+    def bundle_to_blob(self, bundle):
+        return self._index.get(bundle, (None, None))[0]
+
+    def version(self):
+        return None
+
+    def resources(self):
+        return {}
+
+    def bundle_names(self):
+        return list(self._index)
+
+
+def _set(index, *patches):
+    ss = SourceSet()
+    ss.sources = [IndexSource(index), *map(IndexSource, patches)]
+    return ss
+
+
+class DiffSnapshotsTest(unittest.TestCase):
+    def test_classifies_bundles(self):
+        old = Snapshot("4.3.0", {"same": SHA_A, "gone": SHA_A, "edit": SHA_A})
+        new = Snapshot("4.4.0", {"same": SHA_A, "edit": SHA_B, "new": SHA_B})
+        diff = diff_snapshots(old, new)
+        self.assertEqual(["new"], diff.added)
+        self.assertEqual(["gone"], diff.removed)
+        self.assertEqual(["edit"], diff.changed)
+        self.assertEqual({"new", "edit"}, diff.to_extract())
+
+    def test_snapshot_falls_back_to_blob_without_sha1(self):
+        snapshot = take_snapshot(
+            _set({"a.ab": ("A", SHA_A.upper()), "b.ab": ("B", None)}), "1.0.0"
+        )
+        self.assertEqual({"a.ab": SHA_A, "b.ab": "blob:B"}, snapshot.bundles)
+        moved = take_snapshot(_set({"a.ab": ("A", SHA_A), "b.ab": ("B2", None)}))
+        self.assertEqual(["b.ab"], diff_snapshots(snapshot, moved).changed)
+
+
+class SnapshotFileTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, "snapshot.json")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_round_trip(self):
+        write_snapshot(self.path, Snapshot("4.4.0", {"a.ab": SHA_A}))
+        self.assertEqual(Snapshot("4.4.0", {"a.ab": SHA_A}), load_snapshot(self.path))
+
+    def test_reads_extract_sha1_cache(self):
+        with open(self.path, "w") as f:
+            json.dump({"a.ab": SHA_A.upper()}, f)
+        self.assertEqual(Snapshot(None, {"a.ab": SHA_A}), load_snapshot(self.path))
+
+    def test_rejects_other_json(self):
+        with open(self.path, "w") as f:
+            json.dump([1, 2], f)
+        with self.assertRaises(ValueError):
+            load_snapshot(self.path)
+
+
+class ChangedSinceTest(unittest.TestCase):
+    def test_keeps_changed_bundles_and_acb_of_changed_awb(self):
+        base = Snapshot(
+            "4.3.0", {"a.ab": SHA_A, "b.ab": SHA_A, "s.acb": SHA_A, "s.awb": SHA_A}
+        )
+        ss = _set(
+            {
+                "a.ab": ("A", SHA_A),
+                "b.ab": ("B", SHA_B),
+                "s.acb": ("S", SHA_A),
+                "s.awb": ("W", SHA_B),
+                "c.ab": ("C", SHA_B),
+            }
+        )
+        state = mock.Mock(sources=ss, decrypt_key="key")
+        with (
+            mock.patch.object(extract_mod, "resolve_snapshot", return_value=base),
+            mock.patch.object(
+                extract_mod.UnityPy, "set_assetbundle_decrypt_key"
+            ) as set_key,
+        ):
+            kept = extract_mod.changed_since(
+                "4.3.0", {"a.ab", "b.ab", "s.acb", "c.ab"}, mock.Mock(), state
+            )
+        self.assertEqual({"b.ab", "s.acb", "c.ab"}, kept)
+        # The base's live index may have applied its own version's key.
+        set_key.assert_called_once_with("key")
+
+    def test_snapshot_path_is_loaded_without_building_sources(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "s.json")
+            write_snapshot(path, Snapshot("4.3.0", {}))
+            with mock.patch.object(diff_mod, "build_source_set") as build:
+                self.assertEqual("4.3.0", diff_mod.resolve_snapshot(path, None).version)
+            build.assert_not_called()
+
+
+class ResolveVersionTest(unittest.TestCase):
+    # The primary (OBB) and patch layers both differ between the two versions:
+    # p.ab only changed in the primary, q.ab only in the patch.
+    LAYERS = {
+        "4.3.0": ({"p.ab": ("P", SHA_A), "q.ab": ("Q", SHA_A)}, {"q.ab": ("Q", SHA_A)}),
+        "4.4.0": ({"p.ab": ("P", SHA_B), "q.ab": ("Q", SHA_A)}, {"q.ab": ("Q", SHA_B)}),
+    }
+
+    def _build(self, args):
+        return mock.Mock(sources=_set(*self.LAYERS[args.version]))
+
+    def test_obb_version_is_rebuilt_from_both_of_its_layers(self):
+        args = mock.Mock(preset=None, primary="obb", version="4.4.0")
+        with mock.patch.object(diff_mod, "build_source_set", self._build):
+            base = diff_mod.resolve_snapshot("4.3.0", args)
+            target = diff_mod.resolve_snapshot("4.4.0", args)
+        self.assertEqual("4.4.0", args.version)
+        self.assertEqual("4.3.0", base.version)
+        self.assertEqual(["p.ab", "q.ab"], diff_snapshots(base, target).changed)
+
+    def test_launcher_version_is_rejected(self):
+        # A launcher primary would pair today's index with 4.3.0's patch index.
+        for preset, primary in (("global", None), (None, "EN_PC"), (None, None)):
+            with self.subTest(preset=preset, primary=primary):
+                args = mock.Mock(preset=preset, primary=primary, version=None)
+                with mock.patch.object(diff_mod, "build_source_set") as build:
+                    with self.assertRaisesRegex(ValueError, "--write-snapshot"):
+                        diff_mod.resolve_snapshot("4.3.0", args)
+                build.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import concurrent.futures
+import threading
+import time
+import unittest
+from unittest import mock
+
+from pgr_assets.commands import extract as extract_mod
+
+
+class FakeCues:
+    def get_cue_sheet(self, bundle):
+        return None
+
+
+class FakeState:
+    cues = FakeCues()
+
+
+class BundleInputsTest(unittest.TestCase):
+    def test_acb_without_cue_sheet_reads_sibling_awb(self):
+        self.assertEqual(
+            ["assets/sound/a.acb", "assets/sound/a.awb"],
+            extract_mod.bundle_inputs("assets/sound/a.acb", FakeState()),
+        )
+
+    def test_awb_is_extracted_with_its_acb(self):
+        self.assertEqual(
+            [], extract_mod.bundle_inputs("assets/sound/a.awb", FakeState())
+        )
+
+    def test_regular_bundle_reads_itself(self):
+        self.assertEqual(["a/b.ab"], extract_mod.bundle_inputs("a/b.ab", FakeState()))
+
+
+class PipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.prefetched = set()
+
+    def _prefetch(self, bundle, state):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.prefetched.add(bundle)
+        time.sleep(0.001)
+
+    def _cache_keys(self, bundle, state):
+        return [bundle + "-sha1"]
+
+    def _process(self, bundle):
+        # Extraction only ever starts on a bundle whose blobs were prefetched.
+        assert bundle in self.prefetched
+        time.sleep(0.002)
+        with self.lock:
+            self.in_flight -= 1
+        return True
+
+    def _run(self, bundles, depth):
+        with (
+            mock.patch.object(extract_mod, "prefetch", self._prefetch),
+            mock.patch.object(extract_mod, "cache_keys", self._cache_keys),
+            mock.patch.object(extract_mod, "process", self._process),
+            concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor,
+        ):
+            return list(
+                extract_mod.pipeline(
+                    bundles, FakeState(), executor, download_workers=8, depth=depth
+                )
+            )
+
+    def test_every_bundle_is_extracted_once(self):
+        bundles = [f"b{i}.ab" for i in range(50)]
+        results = self._run(bundles, depth=6)
+        self.assertEqual(sorted(bundles), sorted(b for b, _, _ in results))
+        for bundle, sha1s, future in results:
+            self.assertEqual([bundle + "-sha1"], sha1s)
+            self.assertTrue(future.result())
+
+    def test_in_flight_bundles_are_bounded_by_depth(self):
+        self._run([f"b{i}.ab" for i in range(50)], depth=4)
+        self.assertLessEqual(self.max_in_flight, 4)
+
+    def test_empty_input(self):
+        self.assertEqual([], self._run([], depth=4))
+
+    def test_shared_blob_is_released_by_the_last_bundle(self):
+        # Every acb reads the same awb blob; each also has a blob of its own.
+        # All of them are in flight at once, so the awb blob has to outlive
+        # every bundle but the last.
+        self._cache_keys = lambda bundle, state: [bundle + "-sha1", "awb-sha1"]
+        results = self._run([f"b{i}.acb" for i in range(10)], depth=10)
+
+        for n, (bundle, released, _) in enumerate(results):
+            expected = {bundle + "-sha1"}
+            if n == len(results) - 1:
+                expected.add("awb-sha1")
+            self.assertEqual(expected, set(released))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pgr_assets.commands import sha1cache as sha1cache_mod
+from pgr_assets.commands.sha1cache import Sha1Cache
+
+
+def _write_many(path, prefix, count):
+    with Sha1Cache(path) as cache:
+        for i in range(count):
+            cache.record(f"{prefix}/{i}.ab", f"{i:040x}")
+
+
+class Sha1CacheTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, "sha1cache")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _lines(self):
+        with open(self.path) as f:
+            return f.read().splitlines()
+
+    def test_records_are_appended_and_reloaded(self):
+        with Sha1Cache(self.path) as cache:
+            cache.record("a.ab", "aaa")
+            cache.record("b.ab", None)
+            cache.record("a.ab", "bbb")
+        self.assertEqual(["a.ab\taaa", "b.ab\t-", "a.ab\tbbb"], self._lines())
+        self.assertEqual({"a.ab": "bbb", "b.ab": None}, Sha1Cache(self.path).entries)
+
+    def test_torn_last_line_is_ignored(self):
+        with open(self.path, "w") as f:
+            f.write("a.ab\taaa\nb.ab\tbb")
+        self.assertEqual({"a.ab": "aaa"}, Sha1Cache(self.path).entries)
+
+    def test_torn_last_line_is_cut_before_appending(self):
+        with open(self.path, "w") as f:
+            f.write("a.ab\taaa\nb.ab\tbb")
+        with Sha1Cache(self.path) as cache:
+            cache.record("x.ab", "xxx")
+        self.assertEqual(["a.ab\taaa", "x.ab\txxx"], self._lines())
+        self.assertEqual({"a.ab": "aaa", "x.ab": "xxx"}, Sha1Cache(self.path).entries)
+
+    def test_torn_only_line_is_cut_before_appending(self):
+        with open(self.path, "w") as f:
+            f.write("b.ab\t" + "b" * 5000)
+        with Sha1Cache(self.path) as cache:
+            cache.record("x.ab", "xxx")
+        self.assertEqual(["x.ab\txxx"], self._lines())
+
+    def test_legacy_json_is_converted_on_first_write(self):
+        with open(self.path, "w") as f:
+            json.dump({"a.ab": "aaa"}, f)
+        with Sha1Cache(self.path) as cache:
+            self.assertEqual("aaa", cache.get("a.ab"))
+            cache.record("b.ab", "bbb")
+        self.assertEqual(["a.ab\taaa", "b.ab\tbbb"], self._lines())
+
+    @mock.patch.object(sha1cache_mod, "_COMPACT_MIN_GARBAGE", 3)
+    def test_superseded_lines_are_compacted(self):
+        with Sha1Cache(self.path) as cache:
+            for sha1 in ("1", "2", "3", "4"):
+                cache.record("a.ab", sha1)
+            cache.record("b.ab", "5")
+        self.assertEqual(["a.ab\t4", "b.ab\t5"], self._lines())
+
+    @mock.patch.object(sha1cache_mod, "_COMPACT_MIN_GARBAGE", 3)
+    def test_compaction_keeps_other_writers_lines(self):
+        with Sha1Cache(self.path) as first, Sha1Cache(self.path) as second:
+            second.record("other.ab", "x")
+            for sha1 in ("1", "2", "3", "4"):
+                first.record("a.ab", sha1)
+            # second appends to the compacted journal, not the replaced one.
+            second.record("later.ab", "y")
+        self.assertEqual(
+            {"other.ab": "x", "a.ab": "4", "later.ab": "y"},
+            Sha1Cache(self.path).entries,
+        )
+
+    @unittest.skipUnless(
+        "fork" in multiprocessing.get_all_start_methods(), "needs fork"
+    )
+    def test_concurrent_processes(self):
+        ctx = multiprocessing.get_context("fork")
+        procs = [
+            ctx.Process(target=_write_many, args=(self.path, f"p{n}", 200))
+            for n in range(3)
+        ]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
+        self.assertEqual(600, len(Sha1Cache(self.path)))
+        self.assertEqual(600, len(self._lines()))
+
+
+if __name__ == "__main__":
+    unittest.main()
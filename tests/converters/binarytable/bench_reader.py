@@ -0,0 +1,81 @@
+"""Reader micro-benchmark: time decoding the fixture tables and list payloads.
+
+Run with ``python -m tests.converters.binarytable.bench_reader``.
+"""
+
+import io
+import timeit
+from pathlib import Path
+
+from pgr_assets.converters.binarytable.reader import Reader
+from pgr_assets.converters.binarytable.table import BinaryTable
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+TABLES = [
+    ("areastage.tab.bytes", (3, 0)),
+    ("npcanimatorlayerinfo.i32pool.tab.bytes", (4, 5)),
+    ("npcsearcher.bytes", (3, 3)),
+    ("npcsearcher.old.bytes", (3, 0)),
+    ("npcsettletime.tab.bytes", (3, 3)),
+    ("npcsettletime.old.tab.bytes", (3, 0)),
+]
+
+
+def _leb128(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte, n = n & 0x7F, n >> 7
+        if not n:
+            out.append(byte)
+            return bytes(out)
+        out.append(byte | 0x80)
+
+
+# (name, payload, Reader method, new_fixnum); every list holds 1000 values.
+LISTS = [
+    ("list_int small", _leb128(1000) + bytes(range(100)) * 10, "read_list_int", False),
+    (
+        "list_int large",
+        _leb128(1000) + b"".join(_leb128(i * 4099) for i in range(1000)),
+        "read_list_int",
+        False,
+    ),
+    (
+        "list_float",
+        _leb128(1000) + b"".join(_leb128(i * 37) for i in range(1000)),
+        "read_list_float",
+        False,
+    ),
+    (
+        "list_fix",
+        _leb128(1000) + b"".join(_leb128(i) + b"\x02" for i in range(1, 1001)),
+        "read_list_fix",
+        True,
+    ),
+    ("list_string", _leb128(1000) + b"Stage\x00" * 1000, "read_list_string", False),
+    ("list_bool", _leb128(1000) + b"\x01\x00" * 500, "read_list_bool", False),
+]
+
+
+def _time(fn, number: int) -> float:
+    # Best of five, per call, in microseconds.
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    for name, version in TABLES:
+        data = (FIXTURES / name).read_bytes()
+        us = _time(lambda: BinaryTable(io.BytesIO(data), version).rows, 200)
+        print(f"{name:42} {us:10.1f} us/table")
+
+    for name, payload, method, new_fixnum in LISTS:
+
+        def decode():
+            getattr(Reader(io.BytesIO(payload), new_fixnum), method)()
+
+        print(f"{name:42} {_time(decode, 200):10.1f} us/1000 values")
+
+
+if __name__ == "__main__":
+    main()
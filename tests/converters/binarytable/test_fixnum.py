@@ -0,0 +1,30 @@
+import unittest
+from decimal import Decimal
+
+from pgr_assets.converters.binarytable.fixnum import Fix
+
+
+class FixTest(unittest.TestCase):
+    def test_prints_like_decimal(self):
+        for mantissa in (1, 7, 10, 415, 1200, 123456789, 2147483647):
+            for scale in (0, 1, 2, 3, 6, 8, 9, 12, 20, 127):
+                for sign in (1, -1):
+                    expected = Decimal(mantissa).scaleb(-scale)
+                    if sign < 0:
+                        expected = -expected
+                    fix = Fix(sign * mantissa, scale)
+                    with self.subTest(fix=(sign * mantissa, scale)):
+                        self.assertEqual(str(expected), str(fix))
+
+    def test_equals_decimal(self):
+        self.assertEqual(Decimal("4.15"), Fix(415, 2))
+        self.assertEqual(Fix(415, 2), Fix(4150, 3))
+        self.assertEqual(Decimal("-4"), Fix(-4, 0))
+        self.assertEqual(5, Fix(5, 0))
+        self.assertNotEqual(Decimal("4.16"), Fix(415, 2))
+        self.assertNotEqual("4.15", Fix(415, 2))
+        self.assertEqual(hash(Decimal("5.5")), hash(Fix(55, 1)))
+
+    def test_repr_and_float(self):
+        self.assertEqual("Fix('-0.0012')", repr(Fix(-12, 4)))
+        self.assertEqual(-0.0012, float(Fix(-12, 4)))
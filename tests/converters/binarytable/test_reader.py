@@ -1,9 +1,22 @@
 import io
+import random
 import unittest
 from decimal import Decimal
+
+from pgr_assets.converters.binarytable.exceptions import BinaryTableError
 from pgr_assets.converters.binarytable.reader import Reader
 
 
+def _leb128(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte, n = n & 0x7F, n >> 7
+        if not n:
+            out.append(byte)
+            return bytes(out)
+        out.append(byte | 0x80)
+
+
 class ReaderTest(unittest.TestCase):
     def test_read_leb128(self):
         self.assertEqual(Reader(io.BytesIO(b"\x00")).read_leb128(), 0)
@@ -145,3 +158,62 @@ class ReaderTest(unittest.TestCase):
             ).read_list_fix_quaternion(),
             [[0, 0, 0, 0]],
         )
+
+
+class BulkListTest(unittest.TestCase):
+    """Lists are decoded in bulk; they must match decoding value by value."""
+
+    def setUp(self):
+        rng = random.Random(0)
+        # Mostly single-byte values, some up to the full u32 range.
+        self.values = [
+            rng.randrange(1 << rng.choice((7, 7, 14, 21, 32))) for _ in range(300)
+        ]
+        self.payload = _leb128(len(self.values)) + b"".join(
+            _leb128(v) for v in self.values
+        )
+
+    def _one_by_one(self, read, new_fixnum=False):
+        reader = Reader(io.BytesIO(self.payload), new_fixnum)
+        return [read(reader) for _ in range(reader.read_int())]
+
+    def test_ints_and_floats(self):
+        reader = Reader(io.BytesIO(self.payload))
+        self.assertEqual(self._one_by_one(Reader.read_int), reader.read_list_int())
+        self.assertEqual(len(self.payload), reader.pos)
+        self.assertEqual(
+            self._one_by_one(Reader.read_float),
+            Reader(io.BytesIO(self.payload)).read_list_float(),
+        )
+
+    def test_single_byte_ints(self):
+        reader = Reader(io.BytesIO(b"\x03\x00\x7f\x01\x05"))
+        self.assertEqual([0, 127, 1], reader.read_list_int())
+        self.assertEqual(4, reader.pos)
+
+    def test_fixes(self):
+        rng = random.Random(1)
+        fixes = [
+            b"\x00" if v % 5 == 0 else _leb128(v) + bytes([rng.randrange(256)])
+            for v in self.values
+        ]
+        self.payload = _leb128(len(fixes)) + b"".join(fixes)
+        self.assertEqual(
+            self._one_by_one(Reader.read_fix, new_fixnum=True),
+            Reader(io.BytesIO(self.payload), new_fixnum=True).read_list_fix(),
+        )
+
+    def test_strings(self):
+        reader = Reader(io.BytesIO(b"\x03a\x00\x00\xc3\xa9t\xc3\xa9\x00rest"))
+        self.assertEqual(["a", "", "été"], reader.read_list_string())
+        self.assertEqual(b"rest", reader.read_bytes(4))
+
+    def test_truncated_lists(self):
+        for payload, method in [
+            (b"\x03\x01\x02", "read_list_int"),
+            (b"\x02\x80", "read_list_int"),
+            (b"\x03\x01\x00", "read_list_bool"),
+            (b"\x02a\x00b", "read_list_string"),
+        ]:
+            with self.subTest(payload=payload), self.assertRaises(BinaryTableError):
+                getattr(Reader(io.BytesIO(payload)), method)()
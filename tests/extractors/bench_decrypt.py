@@ -0,0 +1,35 @@
+"""Decrypt benchmark: time decrypt against the byte-at-a-time reference on
+multi-megabyte payloads, the size of the larger encrypted lua assets.
+
+Run with ``python -m tests.extractors.bench_decrypt``.
+"""
+
+import random
+import timeit
+
+from pgr_assets.extractors.helpers import decrypt
+
+from .test_helpers import _reference_decrypt
+
+SIZES_MIB = (4, 8)
+
+
+def _time(fn, repeat: int) -> float:
+    # Best of ``repeat``, in seconds.
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def main():
+    for size in SIZES_MIB:
+        data = random.Random(size).randbytes(size << 20)
+        assert decrypt(data) == _reference_decrypt(data)
+        reference = _time(lambda: _reference_decrypt(data), 1)
+        bulk = _time(lambda: decrypt(data), 3)
+        print(
+            f"{size} MiB  reference {reference:6.2f} s  decrypt {bulk:6.2f} s"
+            f"  ({reference / bulk:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
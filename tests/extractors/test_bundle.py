@@ -0,0 +1,183 @@
+import os
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from PIL import Image
+from UnityPy.enums import ClassIDType
+
+from pgr_assets.extractors import bundle
+from pgr_assets.extractors.imagededupe import ImageDedupe
+from pgr_assets.extractors.imageprofile import ImageOutput, ImageProfile
+
+
+class FakeTexture:
+    """Stands in for a Texture2D ObjectReader; counts how often it is decoded."""
+
+    def __init__(self, color, data=None):
+        self.type = ClassIDType.Texture2D
+        self.color = color
+        self.data = data if data is not None else repr(color).encode()
+        self.decodes = 0
+
+    def read(self):
+        return _FakeTextureData(self)
+
+
+class _FakeTextureData:
+    m_TextureFormat = 4
+    m_Width = 4
+    m_Height = 4
+
+    def __init__(self, reader):
+        self._reader = reader
+
+    def get_image_data(self):
+        return self._reader.data
+
+    @property
+    def image(self):
+        self._reader.decodes += 1
+        return Image.new("RGB", (4, 4), self._reader.color)
+
+
+class ImageThreadsTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.output = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _extract(self, container, threads):
+        env = SimpleNamespace(container=container)
+        bundle.extract_bundle(env, self.output, (4, 4), image_threads=threads)
+
+    def test_encodes_every_image_on_pool_threads(self):
+        names = set()
+        save_image = bundle.save_image
+
+        def recording_save(*args):
+            names.add(threading.current_thread().name)
+            return save_image(*args)
+
+        container = {f"assets/img/{i}.png": FakeTexture(i) for i in range(20)}
+        with mock.patch.object(bundle, "save_image", recording_save):
+            self._extract(container, threads=4)
+
+        written = sorted(os.listdir(os.path.join(self.output, "assets", "img")))
+        self.assertEqual(40, len(written))
+        self.assertTrue(all(name.startswith("save-image") for name in names))
+
+    def test_same_destination_keeps_last_image(self):
+        container = {
+            "assets/img/a.png": FakeTexture((255, 0, 0)),
+            "assets/img/a.jpg": FakeTexture((0, 0, 255)),
+        }
+        self._extract(container, threads=4)
+        with Image.open(os.path.join(self.output, "assets", "img", "a.png")) as img:
+            self.assertEqual((0, 0, 255), img.getpixel((0, 0)))
+
+    def test_profile_decides_outputs(self):
+        profile = ImageProfile(
+            "test",
+            (
+                ImageOutput("webp", ".webp", {"quality": 50}),
+                ImageOutput("png", ".64.png", thumbnail=2, paths=("/thumbs/",)),
+            ),
+        )
+        env = SimpleNamespace(
+            container={
+                "assets/img/a.png": FakeTexture(1),
+                "assets/thumbs/b.png": FakeTexture(2),
+            }
+        )
+        bundle.extract_bundle(env, self.output, (4, 4), image_profile=profile)
+        self.assertEqual(
+            ["a.webp"], os.listdir(os.path.join(self.output, "assets", "img"))
+        )
+        thumbs = os.path.join(self.output, "assets", "thumbs")
+        self.assertEqual(["b.64.png", "b.webp"], sorted(os.listdir(thumbs)))
+        with Image.open(os.path.join(thumbs, "b.64.png")) as img:
+            self.assertEqual((2, 2), img.size)
+
+    def test_failed_encode_is_logged_not_raised(self):
+        container = {"assets/img/a.png": FakeTexture(1)}
+        with (
+            mock.patch.object(bundle, "save_image", side_effect=OSError("disk full")),
+            self.assertLogs(bundle.logger, "ERROR"),
+        ):
+            self._extract(container, threads=2)
+
+
+class DedupeTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.output = self._tmp.name
+        self.img = os.path.join(self.output, "assets", "img")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _extract(self, container, dedupe, threads=1):
+        env = SimpleNamespace(container=container)
+        bundle.extract_bundle(
+            env, self.output, (4, 4), image_threads=threads, dedupe=dedupe
+        )
+
+    def _inode(self, name):
+        return os.stat(os.path.join(self.img, name)).st_ino
+
+    def test_identical_texture_is_linked_without_decoding(self):
+        first, second = FakeTexture(1), FakeTexture(1)
+        dedupe = ImageDedupe()
+        self._extract({"assets/img/a.png": first}, dedupe)
+        self._extract({"assets/img/b.png": second}, dedupe)
+        self.assertEqual((1, 0), (first.decodes, second.decodes))
+        self.assertEqual(self._inode("a.png"), self._inode("b.png"))
+        self.assertEqual(self._inode("a.webp"), self._inode("b.webp"))
+
+    def test_identical_pixels_are_linked(self):
+        # Different texture data, e.g. another compression, same pixels.
+        container = {
+            "assets/img/a.png": FakeTexture(1, b"dxt"),
+            "assets/img/b.png": FakeTexture(1, b"etc"),
+        }
+        with mock.patch.object(Image.Image, "save", autospec=True) as save:
+            save.side_effect = lambda img, path, **kw: open(path, "wb").close()
+            self._extract(container, ImageDedupe())
+        self.assertEqual(2, save.call_count)
+        self.assertEqual(self._inode("a.png"), self._inode("b.png"))
+
+    def test_rewritten_output_leaves_links_intact(self):
+        dedupe = ImageDedupe()
+        self._extract(
+            {"assets/img/a.png": FakeTexture(1), "assets/img/b.png": FakeTexture(1)},
+            dedupe,
+        )
+        # a.png now holds other pixels: b.png keeps the old ones, and a.png no
+        # longer stands for them.
+        self._extract({"assets/img/a.png": FakeTexture(2)}, dedupe)
+        self.assertNotEqual(self._inode("a.png"), self._inode("b.png"))
+        with Image.open(os.path.join(self.img, "b.png")) as img:
+            self.assertEqual((1, 0, 0), img.getpixel((0, 0)))
+
+        third = FakeTexture(1)
+        self._extract({"assets/img/c.png": third}, dedupe)
+        self.assertEqual(0, third.decodes)
+        self.assertEqual(self._inode("b.png"), self._inode("c.png"))
+
+    def test_missing_output_is_encoded_again(self):
+        dedupe = ImageDedupe()
+        self._extract({"assets/img/a.png": FakeTexture(1)}, dedupe)
+        os.unlink(os.path.join(self.img, "a.webp"))
+        second = FakeTexture(1)
+        self._extract({"assets/img/b.png": second}, dedupe)
+        self.assertEqual(1, second.decodes)
+        self.assertEqual(["a.png", "b.png", "b.webp"], sorted(os.listdir(self.img)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,18 @@
+import os
+import random
 import struct
+import tempfile
 import unittest
 from pathlib import Path
 from unittest import mock
 
 from pgr_assets.extractors import bundle
 from pgr_assets.extractors.helpers import (
+    _X_CRYPTO_KEY,
     decrypt,
     is_utf8,
     rewrite_text_asset,
+    save_text_asset,
     try_convert_to_csv,
 )
 
@@ -34,6 +39,13 @@ def _nameless_table_bytes() -> bytes:
     return struct.pack("<i", len(info)) + info
 
 
+def _undecodable_table_bytes() -> bytes:
+    """A one-column string table whose only value isn't UTF-8: it indexes
+    fine, and fails once the value is decoded."""
+    info = b"\x01\x02Name\x00" + b"\x00\x00" + b"\x01\x02"
+    return struct.pack("<i", len(info)) + info + b"\xff\x00"
+
+
 class IsUtf8Test(unittest.TestCase):
     def test_valid_utf8(self):
         self.assertTrue(is_utf8("héllo".encode("utf-8")))
@@ -42,6 +54,25 @@ class IsUtf8Test(unittest.TestCase):
         self.assertFalse(is_utf8(b"\xff\xfe\xff"))
 
 
+def _reference_decrypt(content, offset=0, count=None):
+    """The original byte-at-a-time decrypt, which decrypt must match exactly."""
+    content = bytearray(content)
+    if count is None:
+        count = len(content)
+    num = count % len(_X_CRYPTO_KEY)
+    for i in reversed(range(count)):
+        num2 = i + offset
+        num3 = content[num2]
+        num4 = ((content[num2 + 1] if i + 1 < count else 0) + count) % 8
+        num3 = num3 >> 8 - num4 | num3 << num4
+        num3 ^= _X_CRYPTO_KEY[i % len(_X_CRYPTO_KEY)]
+        if num2 > offset:
+            num3 ^= content[num2 - 1]
+        num3 ^= _X_CRYPTO_KEY[num]
+        content[num2] = num3 & 0xFF
+    return content
+
+
 class DecryptTest(unittest.TestCase):
     def test_rejects_offset_count_past_end(self):
         with self.assertRaises(ValueError):
@@ -70,6 +101,24 @@ class DecryptTest(unittest.TestCase):
         self.assertEqual(data[:5], bytes(out[:5]))
         self.assertEqual(data[10:], bytes(out[10:]))
 
+    def test_matches_reference(self):
+        rng = random.Random(0)
+        for count in [0, 1, 2, 7, 8, 9, 255, 256, 257, 1000, 4099]:
+            for offset in (0, 3):
+                data = bytes(rng.randrange(256) for _ in range(offset + count + 2))
+                self.assertEqual(
+                    _reference_decrypt(data, offset, count),
+                    decrypt(data, offset, count),
+                    (offset, count),
+                )
+        for data in (bytes(300), b"\xff" * 300, bytes([0x55, 0xAA]) * 150):
+            self.assertEqual(_reference_decrypt(data), decrypt(data))
+
+    def test_matches_reference_on_large_payload(self):
+        # Timing lives in bench_decrypt; this only checks the bulk path.
+        data = random.Random(1).randbytes(64 * 1024)
+        self.assertEqual(_reference_decrypt(data), decrypt(data))
+
 
 class TryConvertToCsvTest(unittest.TestCase):
     def test_valid_table_round_trips(self):
@@ -85,6 +134,46 @@ class TryConvertToCsvTest(unittest.TestCase):
         # Parses, but columns are nameless -- a binary blob, not a real table.
         self.assertIsNone(try_convert_to_csv(_nameless_table_bytes(), (3, 0)))
 
+    def test_undecodable_value_returns_none(self):
+        self.assertIsNone(try_convert_to_csv(_undecodable_table_bytes(), (3, 0)))
+
+
+class SaveTextAssetTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.share = os.path.join(self._tmp.name, "assets", "temp", "bytes", "share")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _save(self, name, data):
+        path = os.path.join(self.share, name)
+        return save_text_asset(path, data, (3, 0), allow_binary_table_convert=True)
+
+    def test_table_is_written_as_csv(self):
+        raw = (BINARYTABLE_FIXTURES / "areastage.tab.bytes").read_bytes()
+        path = self._save("areastage.tab.bytes", raw)
+        self.assertEqual(os.path.join(self.share, "areastage.csv"), path)
+        with open(path, "rb") as f:
+            self.assertEqual(try_convert_to_csv(raw, (3, 0)), f.read())
+
+    def test_undecodable_table_is_written_raw(self):
+        data = _undecodable_table_bytes()
+        path = self._save("broken.tab.bytes", data)
+        self.assertEqual(os.path.join(self.share, "broken.tab"), path)
+        self.assertEqual(["broken.tab"], os.listdir(self.share))
+        with open(path, "rb") as f:
+            self.assertEqual(data, f.read())
+
+    def test_suffixless_non_table_leaves_no_directory(self):
+        # A table at this path would go to navmesh/navmesh.csv.
+        for data in (b"not a valid binary table at all", _undecodable_table_bytes()):
+            with self.subTest(data=data[:8]):
+                path = self._save("navmesh", data)
+                self.assertEqual(os.path.join(self.share, "navmesh"), path)
+                self.assertTrue(os.path.isfile(path))
+                os.unlink(path)
+
 
 class RewriteTextAssetTest(unittest.TestCase):
     def test_non_bytes_path_returned_unchanged(self):
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+
+from pgr_assets.extractors.imagededupe import ImageDedupe
+
+
+class ImageDedupeTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _file(self, name):
+        path = os.path.join(self._tmp.name, name)
+        open(path, "wb").close()
+        return path
+
+    def test_lookup_skips_missing_files(self):
+        dedupe = ImageDedupe()
+        a, b = self._file("a.png"), self._file("b.png")
+        dedupe.add(["k"], ".png", a)
+        dedupe.add_link(a, ".png", b)
+        os.unlink(a)
+        self.assertEqual(b, dedupe.lookup("k", ".png"))
+        self.assertIsNone(dedupe.lookup("k", ".webp"))
+
+    def test_rewritten_path_drops_every_key(self):
+        dedupe = ImageDedupe()
+        a = self._file("a.png")
+        dedupe.add(["px", "tex", None], ".png", a)
+        dedupe.add(["other"], ".png", a)
+        self.assertIsNone(dedupe.lookup("px", ".png"))
+        self.assertIsNone(dedupe.lookup("tex", ".png"))
+        self.assertEqual(a, dedupe.lookup("other", ".png"))
+
+    def test_least_recently_added_keys_are_evicted(self):
+        dedupe = ImageDedupe(max_entries=2)
+        paths = [self._file(f"{i}.png") for i in range(3)]
+        for i, path in enumerate(paths):
+            dedupe.add([str(i)], ".png", path)
+        self.assertIsNone(dedupe.lookup("0", ".png"))
+        self.assertEqual(paths[2], dedupe.lookup("2", ".png"))
+        self.assertNotIn(paths[0], dedupe._owners)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import json
+import os
+import tempfile
+import unittest
+
+from pgr_assets.extractors.imageprofile import (
+    BUILTIN_PROFILES,
+    ImageOutput,
+    load_image_profile,
+)
+
+
+class LoadImageProfileTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, "cdn.json")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _load(self, data):
+        with open(self.path, "w") as f:
+            json.dump(data, f)
+        return load_image_profile(self.path)
+
+    def test_builtin_by_name(self):
+        self.assertIs(BUILTIN_PROFILES["webp"], load_image_profile("webp"))
+
+    def test_file_profile(self):
+        profile = self._load(
+            {
+                "outputs": [
+                    {"format": "WEBP", "quality": 90, "method": 6},
+                    {"format": "webp", "thumbnail": 512, "paths": ["/rolecharacter/"]},
+                ]
+            }
+        )
+        self.assertEqual(
+            (
+                ImageOutput("webp", ".webp", {"quality": 90, "method": 6}),
+                ImageOutput("webp", ".512.webp", {}, 512, ("/rolecharacter/",)),
+            ),
+            profile.outputs,
+        )
+
+    def test_rejects_bad_profiles(self):
+        for data in (
+            {},
+            {"outputs": [{"quality": 90}]},
+            {"outputs": [{"format": "png", "colour": "red"}]},
+            {"outputs": [{"format": "png", "thumbnail": -1}]},
+            {"outputs": [{"format": "png"}, {"format": "png", "optimize": True}]},
+        ):
+            with self.assertRaises(ValueError, msg=data):
+                self._load(data)
+
+    def test_unknown_name(self):
+        with self.assertRaises(ValueError):
+            load_image_profile("jpeg-xl")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from UnityPy.enums import ClassIDType
+
+from pgr_assets.extractors import bundle
+from pgr_assets.extractors.manifest import BundleManifest, manifest_path
+
+SETTINGS = {"game_version": [4, 4], "convert_binary_tables": False}
+
+
+class FakeText:
+    """Stands in for a TextAsset ObjectReader in a bundle's container."""
+
+    def __init__(self, script, path_id=1):
+        self.type = ClassIDType.TextAsset
+        self.path_id = path_id
+        self.script = script
+        self.reads = 0
+
+    def get_raw_data(self):
+        return self.script.encode()
+
+    def read(self):
+        self.reads += 1
+        return SimpleNamespace(m_Script=self.script)
+
+
+class ExtractWithManifestTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self._tmp.name, "out")
+        self.path = manifest_path(os.path.join(self._tmp.name, "m"), "a/b.ab")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _extract(self, container, settings=SETTINGS):
+        manifest = BundleManifest(self.path, self.output, settings)
+        env = SimpleNamespace(container=container)
+        bundle.extract_bundle(env, self.output, (4, 4), manifest=manifest)
+        manifest.save()
+
+    def test_unchanged_objects_are_skipped(self):
+        self._extract({"assets/a.txt": FakeText("a"), "assets/b.txt": FakeText("b")})
+
+        same, edited = FakeText("a"), FakeText("b2")
+        self._extract({"assets/a.txt": same, "assets/b.txt": edited})
+        self.assertEqual(0, same.reads)
+        self.assertEqual(1, edited.reads)
+        with open(os.path.join(self.output, "assets", "b.txt")) as f:
+            self.assertEqual("b2", f.read())
+
+        # The manifest keeps the skipped object, so a third run skips both.
+        again, edited_again = FakeText("a"), FakeText("b2")
+        self._extract({"assets/a.txt": again, "assets/b.txt": edited_again})
+        self.assertEqual(0, again.reads + edited_again.reads)
+
+    def test_missing_output_is_rewritten(self):
+        self._extract({"assets/a.txt": FakeText("a")})
+        os.unlink(os.path.join(self.output, "assets", "a.txt"))
+        obj = FakeText("a")
+        self._extract({"assets/a.txt": obj})
+        self.assertEqual(1, obj.reads)
+        self.assertTrue(os.path.exists(os.path.join(self.output, "assets", "a.txt")))
+
+    def test_other_settings_ignore_manifest(self):
+        self._extract({"assets/a.txt": FakeText("a")})
+        obj = FakeText("a")
+        self._extract({"assets/a.txt": obj}, {**SETTINGS, "game_version": [4, 5]})
+        self.assertEqual(1, obj.reads)
+
+    def test_removed_objects_are_dropped(self):
+        self._extract({"assets/a.txt": FakeText("a"), "assets/b.txt": FakeText("b")})
+        self._extract({"assets/a.txt": FakeText("a")})
+        manifest = BundleManifest(self.path, self.output, SETTINGS)
+        self.assertEqual(["assets/a.txt"], list(manifest._previous))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import asyncio
+import io
+import unittest
+from unittest import mock
+from urllib.parse import urlsplit
+
+from pgr_assets.sources.asyncdownload import AsyncHttpClient
+from pgr_assets.sources.exceptions import BlobDownloadError
+
+BODY = bytes(range(256)) * 64
+
+
+class FakeCdn:
+    """Tiny HTTP/1.1 server on asyncio streams, serving ``BODY`` under a few
+    paths that exercise the client's framing, ranges and redirects."""
+
+    def __init__(self):
+        self.connections = 0
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self.failures = {}  # path -> statuses to answer before succeeding
+        # As a proxy: the absolute URLs / CONNECT authorities asked for, and
+        # the Proxy-Authorization sent with them.
+        self.proxied = []
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        self.base = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                method, path = request_line.decode().split()[:2]
+                if method == "CONNECT" or not path.startswith("/"):
+                    self.proxied.append((path, headers.get("proxy-authorization")))
+                if method == "CONNECT":
+                    writer.write(b"HTTP/1.1 407 Proxy Auth Required\r\n\r\n")
+                    await writer.drain()
+                    return
+                path = urlsplit(path).path
+                self.requests.append((path, headers.get("range")))
+
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+                await asyncio.sleep(0.01)
+                self.active -= 1
+                writer.write(self._respond(path, headers))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    def _respond(self, path, headers):
+        if self.failures.get(path):
+            status = self.failures[path].pop(0)
+            return f"HTTP/1.1 {status} Oops\r\nContent-Length: 0\r\n\r\n".encode()
+        if path == "/missing":
+            return b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n"
+        if path == "/moved":
+            return b"HTTP/1.1 302 Found\r\nLocation: /blob\r\nContent-Length: 0\r\n\r\n"
+        if path == "/chunked":
+            chunks = b"".join(
+                b"%x\r\n%s\r\n" % (len(BODY[i : i + 1000]), BODY[i : i + 1000])
+                for i in range(0, len(BODY), 1000)
+            )
+            return (
+                b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                + chunks
+                + b"0\r\n\r\n"
+            )
+        if path == "/blob" and headers.get("range"):
+            start = int(headers["range"][len("bytes=") : -1])
+            body = BODY[start:]
+            return (
+                f"HTTP/1.1 206 Partial Content\r\nContent-Length: {len(body)}\r\n"
+                f"Content-Range: bytes {start}-{len(BODY) - 1}/{len(BODY)}\r\n\r\n"
+            ).encode() + body
+        return f"HTTP/1.1 200 OK\r\nContent-Length: {len(BODY)}\r\n\r\n".encode() + BODY
+
+
+class AsyncHttpClientTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.cdn = await FakeCdn().__aenter__()
+        self.client = AsyncHttpClient(per_host=4, proxies={})
+
+    async def asyncTearDown(self):
+        self.client.close()
+        await self.cdn.__aexit__(None, None, None)
+
+    async def _get(self, path, offset=0, prefix=b""):
+        out = io.BytesIO(prefix)
+        out.seek(0, 2)
+        await self.client.download(self.cdn.base + path, out, "blob x", offset)
+        return out.getvalue()
+
+    async def test_content_length_body(self):
+        self.assertEqual(BODY, await self._get("/blob"))
+
+    async def test_chunked_body(self):
+        self.assertEqual(BODY, await self._get("/chunked"))
+
+    async def test_resume_with_range(self):
+        self.assertEqual(BODY, await self._get("/blob", 100, BODY[:100]))
+        self.assertEqual(("/blob", "bytes=100-"), self.cdn.requests[-1])
+
+    async def test_ignored_range_skips_prefix(self):
+        self.assertEqual(BODY, await self._get("/chunked", 100, BODY[:100]))
+
+    async def test_follows_redirect(self):
+        self.assertEqual(BODY, await self._get("/moved"))
+
+    async def test_error_status_raises(self):
+        with self.assertRaises(BlobDownloadError):
+            await self._get("/missing")
+
+    async def test_retries_transient_server_errors(self):
+        self.cdn.failures["/blob"] = [503]
+        with mock.patch("pgr_assets.sources.asyncdownload._RETRY_BACKOFF", 0):
+            self.assertEqual(BODY, await self._get("/blob"))
+
+    async def test_reuses_connections_and_respects_per_host_limit(self):
+        await asyncio.gather(*(self._get("/blob") for _ in range(20)))
+        self.assertLessEqual(self.cdn.max_active, 4)
+        self.assertLessEqual(self.cdn.connections, 4)
+        self.assertEqual(20, len(self.cdn.requests))
+
+    async def _get_via(self, proxies, url):
+        client = AsyncHttpClient(proxies=proxies)
+        try:
+            out = io.BytesIO()
+            await client.download(url, out, "blob x")
+            return out.getvalue()
+        finally:
+            client.close()
+
+    async def test_http_goes_through_proxy(self):
+        proxy = self.cdn.base.replace("http://", "http://user:pw@")
+        body = await self._get_via({"http": proxy}, "http://cdn.invalid/blob")
+        self.assertEqual(BODY, body)
+        self.assertEqual(
+            [("http://cdn.invalid/blob", "Basic dXNlcjpwdw==")], self.cdn.proxied
+        )
+
+    async def test_no_proxy_hosts_are_reached_directly(self):
+        proxies = {"http": "http://127.0.0.1:9", "no": "127.0.0.1"}
+        self.assertEqual(BODY, await self._get_via(proxies, self.cdn.base + "/blob"))
+        self.assertEqual([], self.cdn.proxied)
+
+    async def test_https_is_tunnelled_through_proxy(self):
+        # The fake proxy refuses the tunnel, which has to surface as an error.
+        with self.assertRaisesRegex(BlobDownloadError, "refused to tunnel"):
+            await self._get_via({"https": self.cdn.base}, "https://cdn.invalid/blob")
+        self.assertEqual([("cdn.invalid:443", None)], self.cdn.proxied)
+
+    async def test_unsupported_proxy_raises(self):
+        with self.assertRaisesRegex(BlobDownloadError, "--engine threads"):
+            await self._get_via({"http": "socks5://127.0.0.1:9"}, "http://a/blob")
+
+
+if __name__ == "__main__":
+    unittest.main()
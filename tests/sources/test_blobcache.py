@@ -0,0 +1,112 @@
+import hashlib
+import os
+import tempfile
+import unittest
+
+from pgr_assets.sources.blobcache import BlobCache
+
+
+def _sha1(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+class BlobCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_miss_returns_none(self):
+        self.assertIsNone(BlobCache(self.root, 1024).get(_sha1(b"x")))
+
+    def test_put_then_get_round_trips(self):
+        cache = BlobCache(self.root, 1024)
+        self.assertTrue(cache.put(_sha1(b"hello"), b"hello"))
+        self.assertEqual(b"hello", cache.get(_sha1(b"hello")))
+
+    def test_rejects_data_not_matching_sha1(self):
+        cache = BlobCache(self.root, 1024)
+        self.assertFalse(cache.put(_sha1(b"hello"), b"truncated"))
+        self.assertIsNone(cache.get(_sha1(b"hello")))
+
+    def test_rejects_non_sha1_keys(self):
+        cache = BlobCache(self.root, 1024)
+        self.assertFalse(cache.put("../../etc/passwd", b"x"))
+        self.assertIsNone(cache.get("../../etc/passwd"))
+
+    def test_no_temp_files_left_behind(self):
+        cache = BlobCache(self.root, 1024)
+        cache.put(_sha1(b"hello"), b"hello")
+        names = [n for _, _, files in os.walk(self.root) for n in files]
+        self.assertEqual([_sha1(b"hello")], names)
+
+    def test_remove(self):
+        cache = BlobCache(self.root, 1024)
+        cache.put(_sha1(b"hello"), b"hello")
+        cache.remove(_sha1(b"hello"))
+        cache.remove(_sha1(b"hello"))
+        self.assertIsNone(cache.get(_sha1(b"hello")))
+
+    def test_parked_partial_is_adopted_by_next_temp(self):
+        cache = BlobCache(self.root, 1024)
+        sha1 = _sha1(b"hello")
+        f, tmp = cache.create_temp(sha1)
+        f.write(b"hel")
+        cache.park(sha1, f, tmp)
+
+        f, tmp = cache.create_temp(sha1)
+        self.assertEqual(3, f.tell())
+        f.write(b"lo")
+        cache.commit(sha1, f, tmp).close()
+        self.assertEqual(b"hello", cache.get(sha1))
+        self.assertFalse(os.path.exists(cache.partial_path(sha1)))
+
+    def test_partial_is_adopted_only_once(self):
+        cache = BlobCache(self.root, 1024)
+        sha1 = _sha1(b"hello")
+        f, tmp = cache.create_temp(sha1)
+        f.write(b"hel")
+        cache.park(sha1, f, tmp)
+
+        first, first_tmp = cache.create_temp(sha1)
+        second, second_tmp = cache.create_temp(sha1)
+        self.assertEqual((3, 0), (first.tell(), second.tell()))
+        cache.discard(first, first_tmp)
+        cache.discard(second, second_tmp)
+
+    def test_parking_empty_temp_leaves_nothing(self):
+        cache = BlobCache(self.root, 1024)
+        sha1 = _sha1(b"hello")
+        f, tmp = cache.create_temp(sha1)
+        cache.park(sha1, f, tmp)
+        self.assertEqual([], [n for _, _, files in os.walk(self.root) for n in files])
+
+    def test_prune_evicts_least_recently_used(self):
+        cache = BlobCache(self.root, 1 << 20)
+        blobs = [bytes([i]) * 100 for i in range(3)]
+        for i, blob in enumerate(blobs):
+            cache.put(_sha1(blob), blob)
+            os.utime(cache.path(_sha1(blob)), (1000 + i, 1000 + i))
+
+        # Touch the oldest so the middle one becomes least recently used.
+        cache.get(_sha1(blobs[0]))
+        cache.max_size = 250
+        self.assertEqual(1, cache.prune())
+
+        self.assertIsNotNone(cache.get(_sha1(blobs[0])))
+        self.assertIsNone(cache.get(_sha1(blobs[1])))
+        self.assertIsNotNone(cache.get(_sha1(blobs[2])))
+
+    def test_prune_within_budget_is_noop(self):
+        cache = BlobCache(self.root, 1024)
+        cache.put(_sha1(b"hello"), b"hello")
+        self.assertEqual(0, cache.prune())
+
+    def test_prune_on_missing_root(self):
+        self.assertEqual(0, BlobCache(os.path.join(self.root, "nope"), 1).prune())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import concurrent.futures
+import hashlib
+import multiprocessing
+import os
+import pickle
+import unittest
+
+from pgr_assets.sources.compactindex import CompactIndex
+from pgr_assets.sources.exceptions import SourceIndexError
+
+
+def _sha1(i) -> str:
+    return hashlib.sha1(str(i).encode()).hexdigest()
+
+
+RAW = {
+    f"assets/product/ui/dir{i % 7}/bundle{i}.ab": [f"blob{i}", _sha1(i), i * 10]
+    for i in range(200)
+}
+RAW["top-level.ab"] = ["blobT", "NOT-A-SHA1", 1]
+RAW["assets/äöü/unicode.ab"] = ["blobU", _sha1("u").upper(), 2]
+RAW["assets/nosha1.ab"] = ["blobN", None, None]
+
+
+class CompactIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = CompactIndex.build(RAW)
+
+    def test_lookup_matches_source_mapping(self):
+        for bundle, entry in RAW.items():
+            self.assertEqual(tuple(entry), self.index[bundle])
+
+    def test_missing_keys(self):
+        self.assertNotIn("assets/product/ui/dir0/nope.ab", self.index)
+        self.assertNotIn(5, self.index)
+        self.assertIsNone(self.index.get("nope"))
+        with self.assertRaises(KeyError):
+            _ = self.index["nope"]
+
+    def test_iterates_in_sorted_order(self):
+        self.assertEqual(len(RAW), len(self.index))
+        self.assertEqual(sorted(RAW, key=str.encode), list(self.index))
+        self.assertEqual(
+            {k: tuple(v) for k, v in RAW.items()}, dict(self.index.items())
+        )
+        self.assertEqual(len(RAW), len(list(self.index.values())))
+
+    def test_round_trips_through_buffer_and_pickle(self):
+        for restored in (
+            CompactIndex(self.index.buffer),
+            CompactIndex(memoryview(bytearray(self.index.buffer))),
+            pickle.loads(pickle.dumps(self.index)),
+        ):
+            self.assertEqual(dict(self.index.items()), dict(restored.items()))
+
+    def test_smaller_than_dict_pickle(self):
+        self.assertLess(len(pickle.dumps(self.index)), len(pickle.dumps(RAW)))
+
+    def test_empty(self):
+        empty = CompactIndex.build({})
+        self.assertEqual(0, len(empty))
+        self.assertNotIn("x", empty)
+
+    def test_rejects_malformed_entries(self):
+        with self.assertRaises(SourceIndexError):
+            CompactIndex.build({"a.ab": ["blob", "sha1"]})
+        with self.assertRaises(SourceIndexError):
+            CompactIndex(b"garbage")
+
+
+def _lookup(index, bundle):
+    return index[bundle]
+
+
+class SharedCompactIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = CompactIndex.build(RAW)
+        self.index.share()
+        self.addCleanup(self.index.unshare)
+
+    def test_pickle_references_shared_file(self):
+        data = pickle.dumps(self.index)
+        self.assertLess(len(data), 200)
+        restored = pickle.loads(data)
+        self.assertEqual(dict(self.index.items()), dict(restored.items()))
+
+    def test_attached_copy_survives_unshare(self):
+        restored = pickle.loads(pickle.dumps(self.index))
+        self.index.unshare()
+        bundle = "assets/product/ui/dir3/bundle3.ab"
+        self.assertEqual(tuple(RAW[bundle]), restored[bundle])
+        # Once unshared, pickles carry the buffer again.
+        self.assertGreater(len(pickle.dumps(self.index)), len(self.index.buffer))
+
+    def test_unshare_removes_file(self):
+        path = self.index._shared_path
+        assert path is not None
+        self.assertTrue(os.path.exists(path))
+        self.index.unshare()
+        self.assertFalse(os.path.exists(path))
+
+    def test_spawned_workers_attach(self):
+        bundle = "assets/product/ui/dir3/bundle3.ab"
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=2, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            result = executor.submit(_lookup, self.index, bundle).result()
+        self.assertEqual(tuple(RAW[bundle]), result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import hashlib
+import io
+import unittest
+
+from pgr_assets.sources.download import (
+    HashingWriter,
+    copy_response,
+    is_sha1,
+    range_headers,
+)
+from pgr_assets.sources.exceptions import BlobDownloadError, BlobRangeError
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, chunks=(), headers=None):
+        self.status_code = status_code
+        self._chunks = list(chunks)
+        self.headers = headers or {}
+
+    def iter_content(self, chunk_size):
+        return iter(self._chunks)
+
+
+class HashingWriterTest(unittest.TestCase):
+    def test_hashes_and_forwards_writes(self):
+        out = io.BytesIO()
+        writer = HashingWriter(out)
+        writer.write(b"hello ")
+        writer.write(b"world")
+        self.assertEqual(b"hello world", out.getvalue())
+        self.assertEqual(hashlib.sha1(b"hello world").hexdigest(), writer.hexdigest())
+        self.assertEqual(11, writer.size)
+
+    def test_absorb_existing_hashes_resumed_prefix(self):
+        out = io.BytesIO(b"hello ")
+        writer = HashingWriter(out)
+        writer.absorb_existing()
+        writer.write(b"world")
+        self.assertEqual(b"hello world", out.getvalue())
+        self.assertEqual(hashlib.sha1(b"hello world").hexdigest(), writer.hexdigest())
+        self.assertEqual(11, writer.size)
+
+    def test_restart_discards_everything_written(self):
+        out = io.BytesIO(b"stale")
+        writer = HashingWriter(out)
+        writer.absorb_existing()
+        writer.restart()
+        writer.write(b"new")
+        self.assertEqual(b"new", out.getvalue())
+        self.assertEqual(hashlib.sha1(b"new").hexdigest(), writer.hexdigest())
+        self.assertEqual(3, writer.size)
+
+
+class CopyResponseTest(unittest.TestCase):
+    def test_copies_all_chunks(self):
+        out = io.BytesIO()
+        copy_response(FakeResponse(chunks=[b"ab", b"cd"]), out, "blob x")
+        self.assertEqual(b"abcd", out.getvalue())
+
+    def test_partial_content_is_appended(self):
+        out = io.BytesIO(b"ab")
+        out.seek(0, 2)
+        resp = FakeResponse(206, [b"cd"], {"Content-Range": "bytes 2-3/4"})
+        copy_response(resp, out, "blob x", offset=2)
+        self.assertEqual(b"abcd", out.getvalue())
+
+    def test_ignored_range_skips_bytes_already_written(self):
+        out = io.BytesIO(b"abc")
+        out.seek(0, 2)
+        copy_response(FakeResponse(200, [b"ab", b"cde"]), out, "blob x", offset=3)
+        self.assertEqual(b"abcde", out.getvalue())
+
+    def test_mismatched_content_range_raises(self):
+        resp = FakeResponse(206, [b"cd"], {"Content-Range": "bytes 0-3/4"})
+        with self.assertRaises(BlobRangeError):
+            copy_response(resp, io.BytesIO(), "blob x", offset=2)
+
+    def test_refused_range_raises(self):
+        resp = FakeResponse(416, headers={"Content-Range": "bytes */4"})
+        with self.assertRaises(BlobRangeError):
+            copy_response(resp, io.BytesIO(), "blob x", offset=4)
+        # Without a Range, a 416 is just a failed download.
+        with self.assertRaises(BlobDownloadError) as caught:
+            copy_response(FakeResponse(416), io.BytesIO(), "blob x")
+        self.assertNotIsInstance(caught.exception, BlobRangeError)
+
+    def test_range_headers(self):
+        self.assertIsNone(range_headers(0))
+        self.assertEqual({"Range": "bytes=5-"}, range_headers(5))
+
+    def test_non_200_raises(self):
+        with self.assertRaises(BlobDownloadError):
+            copy_response(FakeResponse(status_code=404), io.BytesIO(), "blob x")
+
+
+class IsSha1Test(unittest.TestCase):
+    def test_accepts_hex_digests(self):
+        self.assertTrue(is_sha1("a" * 40))
+        self.assertTrue(is_sha1("A" * 40))
+
+    def test_rejects_other_values(self):
+        self.assertFalse(is_sha1(None))
+        self.assertFalse(is_sha1(""))
+        self.assertFalse(is_sha1("g" * 40))
+        self.assertFalse(is_sha1("a" * 39))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+
+import requests
+
+from pgr_assets.sources.exceptions import BlobDownloadError
+from pgr_assets.sources.indexcache import IndexCache
+
+URL = "http://cdn/prod/client/patch/app/1.0.0/standalone/1.0.1/matrix/index"
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+
+class FakeServer:
+    """Answers conditional GETs like a CDN serving one document."""
+
+    def __init__(self, content=b"v1", etag='"v1"'):
+        self.content = content
+        self.etag = etag
+        self.requests = []
+        self.down = False
+
+    def get(self, url, headers=None):
+        headers = headers or {}
+        self.requests.append(headers)
+        if self.down:
+            raise requests.exceptions.ConnectionError("offline")
+        if self.etag and headers.get("If-None-Match") == self.etag:
+            return FakeResponse(304)
+        validators = {"ETag": self.etag} if self.etag else {}
+        return FakeResponse(200, self.content, validators)
+
+
+class IndexCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.cache = IndexCache(self._tmp.name)
+        self.server = FakeServer()
+        self.parsed = 0
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _parse(self, body):
+        self.parsed += 1
+        return {"bundle": [body.decode(), "sha1", 1]}
+
+    def _get(self):
+        return self.cache.get(URL, self._parse, request=self.server.get)
+
+    def test_unchanged_index_is_served_from_cache(self):
+        self.assertEqual({"bundle": ["v1", "sha1", 1]}, self._get())
+        self.assertEqual({"bundle": ["v1", "sha1", 1]}, self._get())
+        self.assertEqual(1, self.parsed)
+        self.assertEqual({"If-None-Match": '"v1"'}, self.server.requests[-1])
+
+    def test_changed_index_is_reparsed(self):
+        self._get()
+        self.server.content, self.server.etag = b"v2", '"v2"'
+        self.assertEqual({"bundle": ["v2", "sha1", 1]}, self._get())
+        self.assertEqual(2, self.parsed)
+
+    def test_cached_copy_used_when_offline(self):
+        self._get()
+        self.server.down = True
+        self.assertEqual({"bundle": ["v1", "sha1", 1]}, self._get())
+
+    def test_offline_without_cached_copy_raises(self):
+        self.server.down = True
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self._get()
+
+    def test_document_without_validators_is_not_cached(self):
+        self.server.etag = None
+        self._get()
+        self._get()
+        self.assertEqual(2, self.parsed)
+        self.assertEqual([], os.listdir(self._tmp.name))
+
+    def test_corrupt_entry_is_ignored(self):
+        os.makedirs(self._tmp.name, exist_ok=True)
+        with open(self.cache.path(URL), "wb") as f:
+            f.write(b"\xc1garbage")
+        self.assertEqual({"bundle": ["v1", "sha1", 1]}, self._get())
+
+    def test_error_status_raises(self):
+        with self.assertRaises(BlobDownloadError):
+            self.cache.get(URL, self._parse, request=lambda *a, **k: FakeResponse(404))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,30 @@
+import asyncio
+import hashlib
+import io
+import os
+import pickle
+import tempfile
 import unittest
-
-from pgr_assets.sources.exceptions import BlobDownloadError, BlobNotFoundException
+from typing import cast
+from unittest import mock
+
+import requests
+
+from pgr_assets.sources.asyncdownload import AsyncHttpClient
+from pgr_assets.sources.blobcache import BlobCache
+from pgr_assets.sources.compactindex import CompactIndex
+from pgr_assets.sources.download import copy_response
+from pgr_assets.sources.exceptions import (
+    BlobDownloadError,
+    BlobIntegrityError,
+    BlobNotFoundException,
+)
 from pgr_assets.sources.source import Source
+from pgr_assets.sources import sourceset
 from pgr_assets.sources.sourceset import SourceSet
 
+from .test_download import FakeResponse
+
 
 class FakeSource(Source):
     """In-memory Source backed by plain dicts for resolution-order tests."""
@@ -16,6 +37,7 @@ class FakeSource(Source):
         self._sha1s = sha1s or {}  # bundle name -> sha1
         self._version = version
         self._fail_blobs = set(fail_blobs or ())  # hosted, but get_blob raises
+        self.downloads = 0
 
     def has_blob(self, blob):
         return blob in self._blobs or blob in self._fail_blobs
@@ -23,6 +45,7 @@ class FakeSource(Source):
     def get_blob(self, blob):
         if blob in self._fail_blobs:
             raise RuntimeError("download boom")
+        self.downloads += 1
         return self._blobs[blob]
 
     def bundle_sha1(self, bundle):
@@ -41,6 +64,55 @@ class FakeSource(Source):
         return list(self._bundles.keys())
 
 
+class FlakySource(FakeSource):
+    """Fails the first ``drops`` transfers: the first after ``cut`` bytes, any
+    further ones before transferring anything."""
+
+    def __init__(self, *, cut, drops=1, **kwargs):
+        super().__init__(**kwargs)
+        self.cut = cut
+        self.drops = drops
+        self.offsets = []
+
+    def write_blob(self, blob, out, offset=0):
+        self.offsets.append(offset)
+        data = self._blobs[blob][offset:]
+        if self.drops:
+            self.drops -= 1
+            out.write(data[: self.cut])
+            self.cut = 0
+            raise requests.exceptions.ChunkedEncodingError("connection dropped")
+        out.write(data)
+
+
+class RangeSource(FakeSource):
+    """Serves write_blob like a CDN answering Range requests: 206 from the
+    offset, or 416 when the offset is at or past the end of the blob."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.offsets = []
+
+    def write_blob(self, blob, out, offset=0):
+        self.offsets.append(offset)
+        data = self._blobs[blob]
+        if not offset:
+            resp = FakeResponse(200, [data])
+        elif offset >= len(data):
+            resp = FakeResponse(416, [], {"Content-Range": f"bytes */{len(data)}"})
+        else:
+            content_range = f"bytes {offset}-{len(data) - 1}/{len(data)}"
+            resp = FakeResponse(206, [data[offset:]], {"Content-Range": content_range})
+        copy_response(resp, out, f"blob {blob}", offset)
+
+
+def _park(cache, sha1, data):
+    """Leave ``data`` behind as an interrupted download of ``sha1``."""
+    out, tmp = cache.create_temp(sha1)
+    out.write(data)
+    cache.park(sha1, out, tmp)
+
+
 def _set(*sources):
     ss = SourceSet()
     ss.sources = list(sources)
@@ -85,6 +157,27 @@ class FindBundleTest(unittest.TestCase):
         with self.assertRaises(BlobDownloadError):
             _set(src).find_bundle("b")
 
+    def test_sha1_mismatch_raises_integrity_error(self):
+        src = FakeSource(
+            bundles={"b": "X"},
+            blobs={"X": b"truncat"},
+            sha1s={"b": hashlib.sha1(b"truncated").hexdigest()},
+        )
+        with self.assertRaises(BlobDownloadError) as ctx:
+            _set(src).find_bundle("b")
+        self.assertIsInstance(ctx.exception.__cause__, BlobIntegrityError)
+
+    def test_corrupt_source_falls_through_to_next(self):
+        sha1 = hashlib.sha1(b"good").hexdigest()
+        primary = FakeSource(blobs={"X": b"bad"})
+        patch = FakeSource(bundles={"b": "X"}, blobs={"X": b"good"}, sha1s={"b": sha1})
+        self.assertEqual(b"good", _set(primary, patch).find_bundle("b"))
+
+    def test_open_bundle_returns_rewound_file(self):
+        src = FakeSource(bundles={"b": "X"}, blobs={"X": b"bytes"})
+        with _set(src).open_bundle("b") as f:
+            self.assertEqual(b"bytes", f.read())
+
     def test_blob_hosted_nowhere_raises_not_found(self):
         # Bundle resolves to a blob, but no source actually hosts that blob.
         src = FakeSource(bundles={"b": "X"})
@@ -92,6 +185,264 @@ class FindBundleTest(unittest.TestCase):
             _set(src).find_bundle("b")
 
 
+class FindBundleBlobCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.cache = BlobCache(self._tmp.name, 1 << 20)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _cached_set(self, src):
+        ss = SourceSet(blob_cache=self.cache)
+        ss.sources = [src]
+        return ss
+
+    def test_second_lookup_is_served_from_cache(self):
+        sha1 = hashlib.sha1(b"bytes").hexdigest()
+        src = FakeSource(bundles={"b": "X"}, blobs={"X": b"bytes"}, sha1s={"b": sha1})
+        ss = self._cached_set(src)
+        self.assertEqual(b"bytes", ss.find_bundle("b"))
+        self.assertEqual(b"bytes", ss.find_bundle("b"))
+        self.assertEqual(1, src.downloads)
+
+    def test_cache_shared_between_source_sets(self):
+        sha1 = hashlib.sha1(b"bytes").hexdigest()
+        src = FakeSource(bundles={"b": "X"}, blobs={"X": b"bytes"}, sha1s={"b": sha1})
+        self._cached_set(src).find_bundle("b")
+        self._cached_set(src).find_bundle("b")
+        self.assertEqual(1, src.downloads)
+
+    def test_corrupt_download_is_not_cached(self):
+        sha1 = hashlib.sha1(b"bytes").hexdigest()
+        src = FakeSource(bundles={"b": "X"}, blobs={"X": b"byte"}, sha1s={"b": sha1})
+        with self.assertRaises(BlobDownloadError):
+            self._cached_set(src).find_bundle("b")
+        self.assertIsNone(self.cache.get(sha1))
+
+    def test_prefetch_fills_cache_for_later_lookups(self):
+        sha1 = hashlib.sha1(b"bytes").hexdigest()
+        src = FakeSource(bundles={"b": "X"}, blobs={"X": b"bytes"}, sha1s={"b": sha1})
+        ss = self._cached_set(src)
+        self.assertEqual(sha1, ss.prefetch_bundle("b"))
+        self.assertEqual(b"bytes", ss.find_bundle("b"))
+        self.assertEqual(1, src.downloads)
+
+    def test_prefetch_without_sha1_is_noop(self):
+        src = FakeSource(bundles={"b": "X"}, blobs={"X": b"bytes"})
+        self.assertIsNone(self._cached_set(src).prefetch_bundle("b"))
+        self.assertEqual(0, src.downloads)
+
+    def test_bundle_without_sha1_is_not_cached(self):
+        src = FakeSource(bundles={"b": "X"}, blobs={"X": b"bytes"})
+        ss = self._cached_set(src)
+        ss.find_bundle("b")
+        ss.find_bundle("b")
+        self.assertEqual(2, src.downloads)
+
+
+@mock.patch.object(sourceset, "_RESUME_BACKOFF", 0)
+class ResumeTest(unittest.TestCase):
+    DATA = b"0123456789"
+    SHA1 = hashlib.sha1(DATA).hexdigest()
+
+    def _source(self, **kwargs):
+        return FlakySource(
+            bundles={"b": "X"}, blobs={"X": self.DATA}, sha1s={"b": self.SHA1}, **kwargs
+        )
+
+    def test_interrupted_transfer_resumes_from_offset(self):
+        src = self._source(cut=4)
+        self.assertEqual(self.DATA, _set(src).find_bundle("b"))
+        self.assertEqual([0, 4], src.offsets)
+
+    def test_gives_up_after_repeated_failures_without_progress(self):
+        src = self._source(cut=0, drops=100)
+        with self.assertRaises(BlobDownloadError):
+            _set(src).find_bundle("b")
+        self.assertEqual(sourceset._RESUME_ATTEMPTS, len(src.offsets))
+
+    def test_partial_download_is_parked_and_resumed_by_next_run(self):
+        with tempfile.TemporaryDirectory() as root:
+            cache = BlobCache(root, 1 << 20)
+            # Transfers 3 bytes, then never makes progress again.
+            first = self._source(cut=3, drops=100)
+            failing = SourceSet(blob_cache=cache)
+            failing.sources = [first]
+            with self.assertRaises(BlobDownloadError):
+                failing.find_bundle("b")
+
+            second = self._source(cut=0, drops=0)
+            resumed = SourceSet(blob_cache=cache)
+            resumed.sources = [second]
+            self.assertEqual(self.DATA, resumed.find_bundle("b"))
+            self.assertEqual([3], second.offsets)
+
+    def _cached_set(self, cache):
+        src = RangeSource(
+            bundles={"b": "X"}, blobs={"X": self.DATA}, sha1s={"b": self.SHA1}
+        )
+        ss = SourceSet(blob_cache=cache)
+        ss.sources = [src]
+        return ss, src
+
+    def test_complete_parked_download_is_committed_without_a_request(self):
+        with tempfile.TemporaryDirectory() as root:
+            cache = BlobCache(root, 1 << 20)
+            _park(cache, self.SHA1, self.DATA)
+            ss, src = self._cached_set(cache)
+            self.assertEqual(self.DATA, ss.find_bundle("b"))
+            self.assertEqual([], src.offsets)
+            self.assertEqual(self.DATA, cache.get(self.SHA1))
+
+    def test_refused_range_restarts_from_scratch(self):
+        with tempfile.TemporaryDirectory() as root:
+            cache = BlobCache(root, 1 << 20)
+            # As long as the blob, but not it: the resume gets a 416.
+            _park(cache, self.SHA1, b"x" * len(self.DATA))
+            ss, src = self._cached_set(cache)
+            self.assertEqual(self.DATA, ss.find_bundle("b"))
+            self.assertEqual([len(self.DATA), 0], src.offsets)
+            self.assertFalse(os.path.exists(cache.partial_path(self.SHA1)))
+
+
+class FetchBundleTest(unittest.TestCase):
+    """fetch_bundle with sources that have no blob URL, so the download runs
+    through write_blob on a worker thread."""
+
+    DATA = b"bytes"
+    SHA1 = hashlib.sha1(DATA).hexdigest()
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self._tmp.name, "out.ab")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _fetch(self, ss):
+        asyncio.run(ss.fetch_bundle("b", self.dest, AsyncHttpClient()))
+        with open(self.dest, "rb") as f:
+            return f.read()
+
+    def _source(self, data=DATA):
+        return FakeSource(bundles={"b": "X"}, blobs={"X": data}, sha1s={"b": self.SHA1})
+
+    def test_writes_verified_blob_to_dest(self):
+        self.assertEqual(self.DATA, self._fetch(_set(self._source())))
+        self.assertEqual(["out.ab"], os.listdir(self._tmp.name))
+
+    def test_corrupt_blob_leaves_no_file(self):
+        with self.assertRaises(BlobDownloadError):
+            self._fetch(_set(self._source(b"byte")))
+        self.assertEqual([], os.listdir(self._tmp.name))
+
+    def test_goes_through_blob_cache(self):
+        src = self._source()
+        ss = SourceSet(blob_cache=BlobCache(os.path.join(self._tmp.name, "c"), 1024))
+        ss.sources = [src]
+        self.assertEqual(self.DATA, self._fetch(ss))
+        os.unlink(self.dest)
+        self.assertEqual(self.DATA, self._fetch(ss))
+        self.assertEqual(1, src.downloads)
+
+    @mock.patch.object(sourceset, "_RESUME_BACKOFF", 0)
+    def test_interrupted_transfer_resumes_from_offset(self):
+        src = FlakySource(
+            cut=2, bundles={"b": "X"}, blobs={"X": self.DATA}, sha1s={"b": self.SHA1}
+        )
+        self.assertEqual(self.DATA, self._fetch(_set(src)))
+        self.assertEqual([0, 2], src.offsets)
+
+    def test_parked_downloads_are_committed_or_restarted(self):
+        cache = BlobCache(os.path.join(self._tmp.name, "c"), 1024)
+        src = RangeSource(
+            bundles={"b": "X"}, blobs={"X": self.DATA}, sha1s={"b": self.SHA1}
+        )
+        ss = SourceSet(blob_cache=cache)
+        ss.sources = [src]
+
+        # Complete: committed without a request.
+        _park(cache, self.SHA1, self.DATA)
+        self.assertEqual(self.DATA, self._fetch(ss))
+        self.assertEqual([], src.offsets)
+
+        # Full length but wrong: the resume gets a 416 and starts over.
+        cache.remove(self.SHA1)
+        _park(cache, self.SHA1, b"x" * len(self.DATA))
+        self.assertEqual(self.DATA, self._fetch(ss))
+        self.assertEqual([len(self.DATA), 0], src.offsets)
+
+
+class SharedIndexesTest(unittest.TestCase):
+    def test_indexes_are_shared_only_within_block(self):
+        index = CompactIndex.build({"b": ["X", None, 1]})
+        src = FakeSource()
+        src.loaded_indexes = lambda: (index,)
+        ss = _set(src)
+        with ss.shared_indexes():
+            path = index._shared_path
+            self.assertIsNotNone(path)
+            self.assertEqual(index["b"], pickle.loads(pickle.dumps(index))["b"])
+        self.assertIsNone(index._shared_path)
+        self.assertFalse(os.path.exists(cast(str, path)))
+
+
+class ResolutionTableTest(unittest.TestCase):
+    def setUp(self):
+        self.primary = FakeSource(
+            bundles={"a": "A", "b": "B-old", "c": "C"},
+            blobs={"A": b"a", "B-old": b"b", "C": b"c"},
+            sha1s={"a": "aaa", "b": "bbb"},
+        )
+        self.patch = FakeSource(
+            bundles={"b": "B", "d": "C"},
+            blobs={"B": b"b2", "C": b"c2"},
+            sha1s={"d": "ddd"},
+        )
+        self.walked = _set(self.primary, self.patch)
+        self.warmed = _set(self.primary, self.patch)
+        self.warmed.warm()
+
+    def test_matches_walking_the_sources(self):
+        self.assertEqual(self.walked.list_all_bundles(), self.warmed.list_all_bundles())
+        for bundle in ("a", "b", "c", "d", "missing"):
+            self.assertEqual(
+                self.walked.bundle_to_blob(bundle), self.warmed.bundle_to_blob(bundle)
+            )
+            self.assertEqual(
+                self.walked.bundle_sha1(bundle), self.warmed.bundle_sha1(bundle)
+            )
+
+    def test_hosts_in_source_order(self):
+        resolution = self.warmed.resolution
+        assert resolution is not None
+        self.assertEqual((0, 1), cast(tuple, resolution.get("c")).hosts)
+        self.assertEqual((1,), cast(tuple, resolution.get("b")).hosts)
+        self.assertIsNone(resolution.get("missing"))
+
+    def test_downloads_use_table(self):
+        self.assertEqual(b"c", self.warmed.find_bundle("c"))
+        self.assertEqual(b"b2", self.warmed.find_bundle("b"))
+        self.assertEqual(1, self.primary.downloads)
+
+    def test_dump(self):
+        out = io.StringIO()
+        self.warmed.dump_resolution(out, ["b", "missing"])
+        self.assertEqual(f"b\tB\tbbb\t{self.patch}\n", out.getvalue())
+        out = io.StringIO()
+        self.warmed.dump_resolution(out)
+        self.assertEqual(4, len(out.getvalue().splitlines()))
+
+    def test_pickles_and_shares_with_the_set(self):
+        resolution = self.warmed.resolution
+        assert resolution is not None
+        with self.warmed.shared_indexes():
+            self.assertIsNotNone(resolution.entries._shared_path)
+            restored = pickle.loads(pickle.dumps(resolution))
+        self.assertEqual(list(resolution), list(restored))
+
+
 class VersionTest(unittest.TestCase):
     def test_returns_first_non_none(self):
         s1 = FakeSource(version=None)